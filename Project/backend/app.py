@@ -1,37 +1,95 @@
 import os
 import json
 import sys
-import re
-from datetime import datetime
-from flask import Flask, request, jsonify
+import time
+import signal
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask import Flask, Blueprint, Response, current_app, g, request, jsonify, stream_with_context, has_request_context
 from flask_cors import CORS, cross_origin
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, inspect, text
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, inspect, insert, select, update, bindparam, text, func
+from sqlalchemy.orm import declarative_base, relationship
 
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "..", "data", "sessions.db")
-DATA_JSON_PATH = os.path.join(BASE_DIR, "..", "data", "data.json")
-DB_URL = f"sqlite:///{DB_PATH}"
+from roster_db import RosterStore, define_roster_tables
+from storage import Storage
+from tracker_store import TrackerStore, tracker_to_payload
+from conversation_manager import ConversationManager
+from response_cache import ResponseCache
+from keyword_matcher import KeywordMatcher
+from time_values import display_time, minutes_between
+from discrepancy_index import SCENARIOS, SORT_KEYS, classify_scenario
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from request_profiler import RequestProfiler
+from llm_scheduler import LLMOverloaded, PRIORITY_FIRST_TURN, PRIORITY_FOLLOW_UP
+from message_writer import MessageWriter
+from circuit_breaker import CircuitOpenError
+from session_export import iter_sessions, ndjson_lines, buffered, gzip_chunks
+from message_search import create_search_index, rebuild_search_index, optimize_search_index, search_messages
+from http_cache import BodyCache, CachedBody, cached_response
 
-os.makedirs(os.path.join(BASE_DIR, "..", "data"), exist_ok=True)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-if os.path.exists(DATA_JSON_PATH):
-    with open(DATA_JSON_PATH, "r", encoding="utf-8") as f:
-        localData = json.load(f)
-else:
-    localData = {}
+# Importing this module only defines the models, helpers and routes. The database, roster,
+# message writer and model client are set up by create_app(), once per process, and the
+# schema is brought up to date by python migrate.py rather than by whoever starts first.
+DB_PATH = None
+DATA_JSON_PATH = None
+storage = None
+engine = None
+
+def load_config(overrides=None):
+    """Settings for create_app(): the environment, with overrides on top"""
+    config = {
+        "SESSIONS_DB_PATH": os.getenv("SESSIONS_DB_PATH") or os.path.join(BASE_DIR, "..", "data", "sessions.db"),
+        "DATA_JSON_PATH": os.getenv("DATA_JSON_PATH") or os.path.join(BASE_DIR, "..", "data", "data.json"),
+        "ROSTER_CHECK_INTERVAL": float(os.getenv("ROSTER_CHECK_INTERVAL", "1.0")),
+        "ROSTER_CACHE_SIZE": int(os.getenv("ROSTER_CACHE_SIZE", "1024")),
+        "MESSAGE_WRITE_BEHIND": os.getenv("MESSAGE_WRITE_BEHIND", "0") == "1",
+        "MESSAGE_WRITE_DELAY_MS": float(os.getenv("MESSAGE_WRITE_DELAY_MS", "5")),
+        "MESSAGE_WRITE_BATCH": int(os.getenv("MESSAGE_WRITE_BATCH", "256")),
+        "TRACKER_CACHE_SIZE": int(os.getenv("TRACKER_CACHE_SIZE", "10000")),
+        "TRACKER_CACHE_TTL": float(os.getenv("TRACKER_CACHE_TTL", "3600")),
+        "PROFILE_DIR": os.getenv("PROFILE_DIR"),
+        "PROFILE_EVERY": int(os.getenv("PROFILE_EVERY", "0")),
+        "PROFILE_FLUSH_EVERY": int(os.getenv("PROFILE_FLUSH_EVERY", "20")),
+        "RESPONSE_CACHE_WARMUP": os.getenv("RESPONSE_CACHE_WARMUP", "0") == "1",
+        # load the roster in create_app() and start threads only after a fork, see create_app
+        "PRELOAD": os.getenv("APP_PRELOAD", "0") == "1"
+    }
+    config.update(overrides or {})
+    return config
+
+def init_storage(config):
+    """Open sessions.db for this process; later calls must name the same file"""
+    global DB_PATH, storage, engine
+    path = config["SESSIONS_DB_PATH"]
+    if storage is not None:
+        if os.path.abspath(path) != os.path.abspath(DB_PATH):
+            raise RuntimeError(f"sessions.db is already open at {DB_PATH}")
+        return storage
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    DB_PATH = path
+    storage = Storage(f"sqlite:///{path}")
+    engine = storage.engine
+    return storage
+
+def get_db():
+    return storage.get_db()
 
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
+roster_tables = define_roster_tables(Base.metadata)
+
 class ChatSession(Base):
     __tablename__ = "sessions"
     id = Column(Integer, primary_key=True, index=True)
     agent = Column(String(256), nullable=False)
+    agent_id = Column(Integer, ForeignKey("agents.id"), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     conversation_state = Column(Text, default="{}")
 
@@ -47,6 +105,102 @@ class ChatMessage(Base):
 
     session = relationship("ChatSession", back_populates="messages")
 
+    __table_args__ = (
+        Index("ix_messages_session_created", "session_id", "created_at"),
+    )
+
+class SessionSummary(Base):
+    """Summary and extracted facts of a completed interview, written by summarize_sessions.py"""
+    __tablename__ = "session_summaries"
+    session_id = Column(Integer, ForeignKey("sessions.id"), primary_key=True)
+    agent = Column(String(256), nullable=False)
+    agent_id = Column(Integer, ForeignKey("agents.id"))
+    summary = Column(Text, nullable=False)
+    key_points = Column(Text, default="[]")
+    established_facts = Column(Text, default="[]")
+    unresolved_issues = Column(Text, default="[]")
+    quality_score = Column(Integer, nullable=False, default=0)
+    message_count = Column(Integer, nullable=False)
+    # newest message the summary covers; a session with a later one has changed since
+    last_message_id = Column(Integer, nullable=False)
+    completed_at = Column(DateTime)
+    summarized_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_session_summaries_agent_id", "agent_id"),
+        Index("ix_session_summaries_completed_at", "completed_at"),
+        Index("ix_session_summaries_last_message_id", "last_message_id"),
+    )
+
+class SummaryRun(Base):
+    """One finished summarize_sessions.py run; the newest watermark is where the next run starts"""
+    __tablename__ = "summary_runs"
+    id = Column(Integer, primary_key=True)
+    # newest message id when the run started; it read nothing past this
+    watermark = Column(Integer, nullable=False)
+    full = Column(Integer, nullable=False, default=0)
+    sessions = Column(Integer, nullable=False, default=0)
+    summarized = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, default=datetime.utcnow)
+
+def add_sessions_agent_id(conn):
+    columns = [col["name"] for col in inspect(conn).get_columns("sessions")]
+    if "agent_id" not in columns:
+        conn.execute(text("ALTER TABLE sessions ADD COLUMN agent_id INTEGER REFERENCES agents (id)"))
+
+def create_session_summaries(conn):
+    SessionSummary.__table__.create(conn, checkfirst=True)
+
+def create_summary_runs(conn):
+    SummaryRun.__table__.create(conn, checkfirst=True)
+
+# (version, steps) applied in order; a step is SQL text or a callable taking the connection.
+# The applied version is kept in PRAGMA user_version.
+MIGRATIONS = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_created ON messages (session_id, created_at)"
+    ]),
+    (2, [
+        add_sessions_agent_id,
+        "CREATE INDEX IF NOT EXISTS ix_sessions_agent_id ON sessions (agent_id)"
+    ]),
+    # full-text index over message content, backfilled from the rows already there
+    (3, [
+        create_search_index,
+        rebuild_search_index,
+        optimize_search_index
+    ]),
+    # session_summaries, written by summarize_sessions.py
+    (4, [
+        create_session_summaries
+    ]),
+    # summarize_sessions.py watermarks; the first incremental run after this one is a full run
+    (5, [
+        create_summary_runs
+    ]),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version():
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+def run_versioned_migrations():
+    """Apply any migrations newer than the database's user_version"""
+    with engine.begin() as conn:
+        current = conn.execute(text("PRAGMA user_version")).scalar() or 0
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Applying database migration {version}...")
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+
 def check_and_update_database():
     """Check if database needs to be updated and handle migrations"""
     inspector = inspect(engine)
@@ -85,498 +239,260 @@ def check_and_update_database():
                 Base.metadata.create_all(bind=engine)
 
     Base.metadata.create_all(bind=engine)
-check_and_update_database()
-
+    run_versioned_migrations()
+
+def migrate_database(config=None):
+    """Bring sessions.db up to SCHEMA_VERSION; this is what python migrate.py runs"""
+    init_storage(load_config(config))
+    check_and_update_database()
+    return schema_version()
+
+def link_sessions_to_agents(conn):
+    """Point sessions at their roster row by agent name, and unlink ones whose agent was removed"""
+    agents = roster_tables[0]
+    sessions = ChatSession.__table__
+    conn.execute(
+        update(sessions)
+        .where(sessions.c.agent_id.is_not(None))
+        .where(sessions.c.agent_id.not_in(select(agents.c.id)))
+        .values(agent_id=None)
+    )
+    names = conn.execute(select(sessions.c.agent).where(sessions.c.agent_id.is_(None)).distinct()).scalars().all()
+    links = []
+    for name in names:
+        agent_id = conn.execute(
+            select(agents.c.id).where(agents.c.name_key == name.casefold()).order_by(agents.c.id).limit(1)
+        ).scalar()
+        if agent_id is not None:
+            links.append({"name": name, "linked_id": agent_id})
+    if links:
+        conn.execute(
+            update(sessions)
+            .where(sessions.c.agent_id.is_(None))
+            .where(sessions.c.agent == bindparam("name"))
+            .values(agent_id=bindparam("linked_id")),
+            links
+        )
 
-app = Flask(__name__)
-CORS(app) 
+# Set by create_app(). With MESSAGE_WRITE_BEHIND=1, message_writer queues message inserts and
+# session state updates for a writer thread that commits them in batches, instead of a commit
+# per request
+agent_store = None
+message_writer = None
+
+def sync_session_writes(session_id):
+    """Wait for this process's queued writes for the session so a read sees them; a no-op without write-behind.
+
+    Writes queued by another worker are not covered, see MessageWriter.
+    """
+    if message_writer is not None:
+        message_writer.flush_session(int(session_id))
+
+def store_message(db, session_id, role, content, created_at=None):
+    """Stage a chat message for the route's commit, or queue it in write-behind mode (returns a Future of its id)"""
+    created_at = created_at or datetime.utcnow()
+    if message_writer is not None:
+        return message_writer.add_message(int(session_id), role, content, created_at)
+    message = ChatMessage(session_id=session_id, role=role, content=content, created_at=created_at)
+    db.add(message)
+    return message
+
+def store_conversation_state(session, state):
+    if message_writer is not None:
+        message_writer.update_state(session.id, None, json.dumps(state))
+    else:
+        # the tracker is saved on its own, by TrackerStore.persist; keep the stored one
+        tracker = json.loads(session.conversation_state or "{}").get("tracker")
+        session.conversation_state = json.dumps(state if tracker is None else dict(state, tracker=tracker))
+
+
+api = Blueprint("api", __name__)
+
+metrics = MetricsRegistry(worker_label="worker_pid")
+http_requests = metrics.counter(
+    "backend_http_requests_total", "Requests served, by route and status", ("method", "route", "status"))
+http_latency = metrics.histogram(
+    "backend_http_request_duration_seconds", "Time to produce the response, by route", ("method", "route"))
+http_db_time = metrics.histogram(
+    "backend_http_request_db_seconds", "Time spent in SQL statements per request, by route", ("route",))
+http_in_flight = metrics.gauge("backend_http_requests_in_flight", "Requests currently being served")
+llm_latency = metrics.histogram(
+    "backend_llm_call_seconds",
+    "Time spent getting the model reply for a chat turn; fallback and degraded (shed under load) "
+    "mean the scripted question was used",
+    ("endpoint", "outcome"))
+analysis_latency = metrics.histogram(
+    "backend_conversation_analysis_seconds", "ConversationManager time per chat turn, by step", ("step",))
+
+profiler = None
+
+def request_route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+def add_phase_time(name, seconds):
+    """Add to the current request's Server-Timing phase; a no-op outside a request"""
+    if not has_request_context():
+        return
+    phases = g.get("phase_times")
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+@contextmanager
+def phase(name, histogram=None, **labels):
+    """Time a block into a Server-Timing phase and, when given, a metrics histogram"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        add_phase_time(name, elapsed)
+        if histogram is not None:
+            histogram.observe(elapsed, **labels)
+
+def server_timing_header(phases, total):
+    # phases overlap: db covers every statement, including the persist phase's commit
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+@api.before_app_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_db_token, g.metrics_db_time = storage.track_request()
+    g.phase_times = {}
+    http_in_flight.inc()
+    g.profile = profiler.start()
+
+@api.after_app_request
+def record_request_metrics(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        route = request_route()
+        elapsed = time.perf_counter() - started
+        db_time = g.metrics_db_time[0]
+        http_latency.observe(elapsed, method=request.method, route=route)
+        http_db_time.observe(db_time, route=route)
+        http_requests.inc(method=request.method, route=route, status=response.status_code)
+        response.headers["Server-Timing"] = server_timing_header(dict(db=db_time, **g.phase_times), elapsed)
+        response.headers["Timing-Allow-Origin"] = "*"
+    return response
 
-@app.after_request
+@api.teardown_app_request
+def end_request_metrics(exception=None):
+    # streamed responses reach teardown only once the stream is done, so the profile covers it
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profiler.stop(profile, request_route())
+    token = g.pop("metrics_db_token", None)
+    if token is not None:
+        storage.end_request(token)
+        http_in_flight.dec()
+
+@api.before_app_request
+def refresh_roster():
+    agent_store.maybe_reload()
+
+@api.after_app_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
+    response.headers.add('Access-Control-Expose-Headers', 'X-Next-After, X-Next-Offset, X-Total-Count, X-Search-Window, Server-Timing, ETag')
     return response
 
-try:
-    from openai_client import chat_with_gpt
-    OPENAI_AVAILABLE = True
-    print("OpenAI client imported successfully")
-except ImportError as e:
-    print(f"Could not import OpenAI client: {e}")
-    OPENAI_AVAILABLE = False
-    def chat_with_gpt(messages, model="qwen:1.8b", temperature=0.2, max_tokens=100, **kwargs):
-        return "What were you doing during this time?"
-
-class ConversationManager:
-    def __init__(self):
-        self.question_sequences = {
-            "initial": "Why did you edit your start time from {system_start} to {edited_start}?",
-            "followup_1": "You mentioned arriving early. What specific activities were you engaged in before your scheduled start time?",
-            "followup_2": "Were these activities work-related or personal?",
-            "followup_3": "Is there anyone who can verify your early arrival time?",
-            "followup_4": "I notice your phone shows {phone_start} but you mentioned {claimed_start}. Can you explain this {difference} minute difference?",
-            "followup_5": "How do you typically track your work hours when you arrive early?",
-            "verification": "To confirm: You {activity_description}. Is this complete and accurate?"
-        }
-        self.asked_questions_tracker = {}
-
-    def standardize_time_format(self, time_str):
-        """Convert many time formats to consistent h:mm:ss AM/PM or return 'unknown'."""
-        if not time_str or str(time_str).strip() == '':
-            return 'unknown'
-
-        try:
-            s = str(time_str).strip()
-            try:
-                dt = datetime.fromisoformat(s)
-                return dt.strftime("%I:%M:%S %p")
-            except Exception:
-                pass
-
-            m = re.search(r'(\d{1,2}):(\d{2})(?::(\d{2}))?\s*(AM|PM|am|pm)?', s)
-            if m:
-                hour = int(m.group(1))
-                minute = int(m.group(2))
-                second = int(m.group(3)) if m.group(3) else 0
-                period = m.group(4)
-
-                if period:
-                    period = period.upper()
-                    if period == 'PM' and hour != 12:
-                        hour += 12
-                    if period == 'AM' and hour == 12:
-                        hour = 0
-                else:
-                    if 0 <= hour <= 23:
-                        pass  
-                    else:
-                        
-                        return 'unknown'
-
-                disp_hour = hour
-                disp_period = 'AM'
-                if hour == 0:
-                    disp_hour = 12
-                    disp_period = 'AM'
-                elif hour == 12:
-                    disp_hour = 12
-                    disp_period = 'PM'
-                elif hour > 12:
-                    disp_hour = hour - 12
-                    disp_period = 'PM'
-                else:
-                    disp_period = 'AM'
-
-                return f"{disp_hour:02d}:{minute:02d}:{second:02d} {disp_period}"
-
-            m2 = re.search(r'^\d{1,4}$', s)
-            if m2:
-                val = s
-                if len(val) in (3,4):
-                    minute_part = val[-2:]
-                    hour_part = val[:-2]
-                    hour = int(hour_part)
-                    minute = int(minute_part)
-                    return self.standardize_time_format(f"{hour}:{minute}:00")
-                elif len(val) <= 2:
-                    hour = int(val)
-                    return self.standardize_time_format(f"{hour}:00:00")
-
-            return 'unknown'
-
-        except Exception as e:
-            print(f"Time standardization error: {e}")
-            return 'unknown'
-
-    def get_time_difference(self, time1_str, time2_str):
-        """Calculate time difference in minutes between two time strings. Returns int or None."""
-        if not time1_str or not time2_str:
-            return None
-
-        try:
-            def parse_time_to_minutes(time_str):
-                standardized = self.standardize_time_format(time_str)
-                if standardized == 'unknown':
-                    return None
-                parts = standardized.split(' ')
-                time_part = parts[0]
-                period = parts[1] if len(parts) > 1 else 'AM'
-
-                hours, minutes, seconds = map(int, time_part.split(':'))
-
-                if period.upper() == 'PM' and hours != 12:
-                    hours += 12
-                elif period.upper() == 'AM' and hours == 12:
-                    hours = 0
-
-                return hours * 60 + minutes
-
-            t1 = parse_time_to_minutes(time1_str)
-            t2 = parse_time_to_minutes(time2_str)
-
-            if t1 is None or t2 is None:
-                return None
-
-            return abs(t1 - t2)
-
-        except Exception as e:
-            print(f"Time difference calculation error: {e}")
-            return None
-
-    def analyze_conversation_state(self, messages, agent_context, session_id):
-        """Analyze current conversation state and determine next action"""
-        user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
-        assistant_messages = [msg["content"] for msg in messages if msg["role"] == "assistant"]
-        
-        question_count = sum(1 for msg in assistant_messages if msg.strip().endswith('?'))
-        
-        if session_id not in self.asked_questions_tracker:
-            self.asked_questions_tracker[session_id] = {
-                "asked_questions": [],
-                "established_facts": set(),
-                "unresolved_issues": set()
-            }
-        
-        tracker = self.asked_questions_tracker[session_id]
-        
-        state = {
-            "established_facts": list(tracker["established_facts"]),
-            "unresolved_issues": list(tracker["unresolved_issues"]),
-            "remaining_questions": [],
-            "conversation_stage": "initial",
-            "quality_score": 0,
-            "question_count": question_count,
-            "last_question_asked": assistant_messages[-1] if assistant_messages else "",
-            "asked_questions": tracker["asked_questions"]
-        }
-
-        recent_user_text = " ".join(user_messages[-3:]).lower() if user_messages else ""
-        all_user_text = " ".join(user_messages).lower()
-
-        if any(word in all_user_text for word in ["meeting", "training", "session", "conference", "briefing", "workshop"]):
-            tracker["established_facts"].add("was_in_activity")
-        
-        time_pattern = re.search(r'(\d{1,2}):?(\d{2})?\s*(am|pm|AM|PM)?', recent_user_text)
-        if (time_pattern or any(word in recent_user_text for word in 
-            ["arrived", "came", "reached", "started", "clocked", "entered", "early", "before"])):
-            tracker["established_facts"].add("stated_arrival_time")
-        
-        if any(word in recent_user_text for word in ["supervisor", "manager", "team lead", "organized", "lead", "headed", "colleague", "coworker"]):
-            tracker["established_facts"].add("mentioned_organizer")
-        
-        if any(word in recent_user_text for word in ["minutes", "hours", "duration", "lasted", "until", "from", "about"]):
-            tracker["established_facts"].add("provided_duration")
-        
-        if any(word in recent_user_text for word in ["topic", "about", "purpose", "discuss", "agenda", "subject", "work", "preparation"]):
-            tracker["established_facts"].add("mentioned_purpose")
-        
-        if any(word in recent_user_text for word in ["glitch", "error", "technical", "issue", "problem", "malfunction", "wrong", "incorrect", "faulty"]):
-            tracker["established_facts"].add("explained_phone_discrepancy")
-            if "phone_vs_edited_discrepancy" in tracker["unresolved_issues"]:
-                tracker["unresolved_issues"].remove("phone_vs_edited_discrepancy")
-
-        state["established_facts"] = list(tracker["established_facts"])
-        state["unresolved_issues"] = list(tracker["unresolved_issues"])
-
-        phone_time = self.standardize_time_format(agent_context.get('phone', {}).get('start_time', ''))
-        system_time = self.standardize_time_format(agent_context.get('system', {}).get('start_time', ''))
-        edited_time = self.standardize_time_format(agent_context.get('agent_disputed', {}).get('start_time', ''))
-
-        phone_edited_diff = self.get_time_difference(phone_time, edited_time)
-        if (phone_edited_diff is not None and phone_edited_diff > 0 and 
-            "explained_phone_discrepancy" not in tracker["established_facts"]):
-            tracker["unresolved_issues"].add("phone_vs_edited_discrepancy")
-
-        system_edited_diff = self.get_time_difference(system_time, edited_time)
-        if system_edited_diff is not None and system_edited_diff > 0 and "explained_system_discrepancy" not in tracker["established_facts"]:
-            tracker["unresolved_issues"].add("system_vs_edited_discrepancy")
-
-        required_facts = ["was_in_activity", "stated_arrival_time", "mentioned_organizer", "provided_duration", "mentioned_purpose"]
-        for fact in required_facts:
-            if fact not in state["established_facts"]:
-                state["remaining_questions"].append(fact)
-
-        state["quality_score"] = len(state["established_facts"]) * 20
-
-        if len(state["established_facts"]) >= 4 and len(state["unresolved_issues"]) == 0:
-            state["conversation_stage"] = "verification"
-        elif len(state["established_facts"]) >= 2:
-            state["conversation_stage"] = "investigation"
-        else:
-            state["conversation_stage"] = "initial"
-
-        return state
-
-    def build_activity_description(self, conversation_state, agent_context):
-        """Build a summary description for verification"""
-        parts = []
-
-        if "was_in_activity" in conversation_state["established_facts"]:
-            parts.append("were engaged in preparatory work activities")
-
-        edited_time = self.standardize_time_format(agent_context.get('agent_disputed', {}).get('start_time', ''))
-        if edited_time != 'unknown':
-            parts.append(f"starting at {edited_time}")
-
-        if "provided_duration" in conversation_state["established_facts"]:
-            parts.append("prior to your scheduled start time")
-
-        return " ".join(parts) if parts else "arrived early and were engaged in work activities"
-
-    def should_end_conversation(self, conversation_state, recent_user_input=""):
-        """Determine if conversation should end based on completeness"""
-        if conversation_state.get("question_count", 0) >= 5:
-            return True
-        if conversation_state["conversation_stage"] == "verification":
-            recent_lower = recent_user_input.lower()
-            if any(confirm_word in recent_lower for confirm_word in ["yes", "correct", "accurate", "confirm", "right", "true", "yeah", "yep"]):
-                return True
-
-        if conversation_state["quality_score"] >= 60 and len(conversation_state["unresolved_issues"]) == 0:
-            return True
-
-        return False
-
-    def generate_conversation_summary(self, messages, agent_context):
-        """Generate a dynamic summary based on actual conversation content"""
-        user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
-        assistant_messages = [msg["content"] for msg in messages if msg["role"] == "assistant"]
-        
-        key_points = []
-        
-        for i, (user_msg, assistant_msg) in enumerate(zip(user_messages, assistant_messages)):
-            user_lower = user_msg.lower()
-            
-            time_match = re.search(r'(\d{1,2}):?(\d{2})?\s*(am|pm|AM|PM)?', user_msg)
-            if time_match and "arrival time" not in str(key_points).lower():
-                hour = time_match.group(1)
-                minute = time_match.group(2) or '00'
-                period = (time_match.group(3) or 'AM').upper()
-                key_points.append(f"Arrival time: {hour}:{minute} {period}")
-            
-            if any(word in user_lower for word in ["meeting", "conference", "briefing"]):
-                key_points.append("Reason: Scheduled meeting")
-            elif any(word in user_lower for word in ["glitch", "error", "technical", "system wrong"]):
-                key_points.append("Reason: Technical/system issues")
-            elif any(word in user_lower for word in ["early", "before time", "arrived early"]):
-                key_points.append("Reason: Early arrival for preparation")
-            
-            if any(word in user_lower for word in ["work", "preparation", "routine", "task"]):
-                if "Activities:" not in str(key_points):
-                    key_points.append("Activities: Work-related tasks")
-            
-            if any(word in user_lower for word in ["no one", "nobody", "alone", "verify"]):
-                key_points.append("Verification: No witnesses mentioned")
-            elif any(word in user_lower for word in ["supervisor", "manager", "colleague", "team"]):
-                key_points.append("Verification: Colleagues involved")
-        
-        seen = set()
-        unique_key_points = []
-        for point in key_points:
-            if point not in seen:
-                seen.add(point)
-                unique_key_points.append(point)
-        
-        edited_start = self.standardize_time_format(agent_context.get('agent_disputed', {}).get('start_time', ''))
-        system_start = self.standardize_time_format(agent_context.get('system', {}).get('start_time', ''))
-        
-        summary_lines = ["CONVERSATION SUMMARY:"]
-        
-        if edited_start != 'unknown' and system_start != 'unknown':
-            time_diff = self.get_time_difference(edited_start, system_start)
-            if time_diff:
-                summary_lines.append(f"Time edit: {system_start} → {edited_start} ({time_diff} min difference)")
-        
-        summary_lines.extend(unique_key_points[-4:]) 
-        
-        summary_lines.append("Information recorded for review.")
-        
-        return "\n".join(summary_lines)
-
-    def generate_intelligent_question(self, conversation_state, agent_context, recent_user_input="", session_id=""):
-        """Generate contextual questions that follow the conversation flow"""
-        
-        if conversation_state["conversation_stage"] == "verification":
-            activity_desc = self.build_activity_description(conversation_state, agent_context)
-            return self.question_sequences["verification"].format(activity_description=activity_desc)
-
-        if conversation_state.get("question_count", 0) >= 5:
-            return "SUMMARY_REQUEST"
-
-        tracker = self.asked_questions_tracker.get(session_id, {"asked_questions": []})
-        
-        contextual_question = self.generate_contextual_followup(recent_user_input, tracker, agent_context)
-        
-        if contextual_question:
-            tracker["asked_questions"].append(contextual_question)
-            return contextual_question
-
-        return self.generate_fallback_question(conversation_state, agent_context, session_id)
-
-    def generate_contextual_followup(self, user_input, tracker, agent_context):
-        """Generate a question that directly follows from the user's last response"""
-        
-        if not user_input:
-            return None
-            
-        user_input_lower = user_input.lower()
-        
-        contextual_followups = {
-            "system.*wrong|phone.*wrong": [
-                "What makes you think the system and phone recordings are incorrect?",
-                "How did you determine your actual start time if both system and phone are wrong?",
-                "Do you have any other way to verify your arrival time?"
-            ],
-            "daily routine|normal routine|regular routine": [
-                "Could you describe what your daily routine involves when you first arrive?",
-                "What specific tasks are part of your morning routine at the office?",
-                "When you say 'daily routine', what work activities does that typically include?"
-            ],
-            "not specific|nothing specific|just routine": [
-                "Let me be more specific - were you checking emails, preparing equipment, or something else?",
-                "What's the first work-related task you typically complete when you arrive early?",
-                "Could you give an example of what you might do during this early arrival time?"
-            ],
-            "security|face scan|building.*enter": [
-                "Does the building security system provide any timestamp confirmation of your arrival?",
-                "If you use face scan for tracking, why do you think it didn't record your early arrival?",
-                "Can the security system logs verify your entry time?"
-            ],
-            "no one|nobody|alone": [
-                "Since no one was present, how do you typically document your early start times for record-keeping?",
-                "What process do you follow to ensure early arrivals are properly recorded when working alone?",
-                "Do you use any digital tools or apps to track your time when arriving before others?"
-            ],
-            "meeting|conference|briefing": [
-                "Who organized this meeting and what was its purpose?",
-                "Was this meeting scheduled in advance or was it impromptu?",
-                "How long did the meeting last and who else attended?"
-            ],
-            "glitch|error|technical|issue|problem": [
-                "Have you experienced similar technical issues with the time tracking system before?",
-                "Did you report this technical issue to IT or your supervisor?",
-                "What steps did you take to address the technical problem you mentioned?"
-            ],
-            "early|before.*time|arrived.*early": [
-                "What was the reason for arriving early today specifically?",
-                "Did you have any urgent tasks that required early preparation?",
-                "Is arriving early part of your regular schedule or was this unusual?"
-            ]
-        }
-        
-        for pattern, questions in contextual_followups.items():
-            if re.search(pattern, user_input_lower):
-                available_questions = []
-                for q in questions:
-                    question_already_asked = False
-                    for asked_q in tracker["asked_questions"]:
-                        if self.are_questions_similar(q, asked_q):
-                            question_already_asked = True
-                            break
-                    if not question_already_asked:
-                        available_questions.append(q)
-                
-                if available_questions:
-                    return available_questions[0]
-        
-        return None
-
-    def are_questions_similar(self, question1, question2):
-        """Check if two questions are similar in meaning"""
-        if not question1 or not question2:
-            return False
-            
-        q1_lower = question1.lower()
-        q2_lower = question2.lower()
-        
-        similar_phrases = [
-            "what.*activity", "work.*related", "personal",
-            "who.*verify", "anyone.*verify", "witness",
-            "how.*track", "track.*work", "record.*time",
-            "what.*routine", "daily.*routine", "morning.*routine",
-            "technical.*issue", "system.*wrong", "phone.*wrong"
-        ]
-        
-        for phrase in similar_phrases:
-            if re.search(phrase, q1_lower) and re.search(phrase, q2_lower):
-                return True
-        
-        return False
-
-    def generate_fallback_question(self, conversation_state, agent_context, session_id):
-        """Fallback to the original logic if no contextual question fits"""
-        tracker = self.asked_questions_tracker.get(session_id, {"asked_questions": []})
-        asked_questions = tracker["asked_questions"]
-
-        if ("phone_vs_edited_discrepancy" in conversation_state["unresolved_issues"] and
-            not any("phone shows" in q.lower() for q in asked_questions)):
-            
-            phone_time = self.standardize_time_format(agent_context.get('phone', {}).get('start_time', ''))
-            edited_time = self.standardize_time_format(agent_context.get('agent_disputed', {}).get('start_time', ''))
-            difference = self.get_time_difference(phone_time, edited_time) or 'some'
-            
-            question = self.question_sequences["followup_4"].format(
-                phone_start=phone_time,
-                claimed_start=edited_time,
-                difference=difference
-            )
-            tracker["asked_questions"].append(question)
-            return question
-
-        if (not any("why did you edit" in q.lower() for q in asked_questions) and
-            "stated_arrival_time" not in conversation_state["established_facts"]):
-            
-            system_start = self.standardize_time_format(agent_context.get('system', {}).get('start_time', ''))
-            edited_start = self.standardize_time_format(agent_context.get('agent_disputed', {}).get('start_time', ''))
-            
-            if system_start != 'unknown' and edited_start != 'unknown':
-                question = self.question_sequences["initial"].format(
-                    system_start=system_start,
-                    edited_start=edited_start
-                )
-                tracker["asked_questions"].append(question)
-                return question
-
-        question_flow = [
-            ("was_in_activity", self.question_sequences["followup_1"]),
-            ("mentioned_purpose", self.question_sequences["followup_2"]),
-            ("mentioned_organizer", self.question_sequences["followup_3"]),
-            ("provided_duration", self.question_sequences["followup_5"])
-        ]
-
-        for fact_key, question_template in question_flow:
-            if (fact_key not in conversation_state["established_facts"] and
-                not any(question_template.split('?')[0].lower() in q.lower() for q in asked_questions)):
-                
-                tracker["asked_questions"].append(question_template)
-                return question_template
-
-        return "SUMMARY_REQUEST"
+# Template stand-ins until load_model_client() swaps in openai_client, and for good if it cannot be imported
+OPENAI_AVAILABLE = False
+llm_client = None
+llm_breaker = None
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "qwen:1.8b")
+def chat_with_gpt(messages, model="qwen:1.8b", temperature=0.2, max_tokens=100, **kwargs):
+    return "What were you doing during this time?"
+def stream_chat_with_gpt(messages, model="qwen:1.8b", temperature=0.2, max_tokens=100, **kwargs):
+    yield "What were you doing during this time?"
+ask_model = chat_with_gpt
+def validate_question(response, system_prompt):
+    return response.strip()
+
+def load_model_client():
+    """Import openai_client (httpx and the model client); its event loop only starts on the first call"""
+    global OPENAI_AVAILABLE, chat_with_gpt, ask_model, stream_chat_with_gpt
+    global validate_question, llm_client, llm_breaker, DEFAULT_MODEL
+    if OPENAI_AVAILABLE:
+        return
+    try:
+        from openai_client import (
+            chat_with_gpt, ask_model, stream_chat_with_gpt,
+            validate_question, llm_client, llm_breaker, DEFAULT_MODEL
+        )
+        OPENAI_AVAILABLE = True
+        print("OpenAI client imported successfully")
+    except ImportError as e:
+        print(f"Could not import OpenAI client: {e}")
+
+SIMILAR_QUESTION_PHRASES = KeywordMatcher({phrase: [phrase] for phrase in [
+    "why did you edit", 
+    "phone shows", 
+    "explain this difference",
+    "what activities",
+    "who organized",
+    "how long",
+    "can verify",
+    "work-related"
+]})
 
 def is_similar_question(question1, question2):
     """Check if two questions are similar in meaning"""
-    key_phrases = [
-        "why did you edit", 
-        "phone shows", 
-        "explain this difference",
-        "what activities",
-        "who organized",
-        "how long",
-        "can verify",
-        "work-related"
-    ]
-    
-    q1_lower = question1.lower()
-    q2_lower = question2.lower()
-    
-    for phrase in key_phrases:
-        if phrase in q1_lower and phrase in q2_lower:
-            return True
-    return False
-
-conv_manager = ConversationManager()
+    phrases = SIMILAR_QUESTION_PHRASES
+    return not phrases.categories(question1).isdisjoint(phrases.categories(question2))
+
+def load_tracker_state(session_id):
+    """Read the persisted question tracker from ChatSession.conversation_state"""
+    sync_session_writes(session_id)
+    session = get_db().get(ChatSession, int(session_id))
+    if not session or not session.conversation_state:
+        return None
+    return json.loads(session.conversation_state).get("tracker")
+
+def save_tracker_state(session_id, payload, expected_rev):
+    """Write the tracker in the route's transaction if the stored one is still at expected_rev.
+
+    Returns False when another worker saved a newer revision first. In write-behind
+    mode the write is queued without the check: that mode runs a single worker, whose
+    threads share one cached tracker per session.
+    """
+    if message_writer is not None:
+        message_writer.update_state(int(session_id), "tracker", json.dumps(payload))
+        return True
+    db = get_db()
+    # the UPDATE below bypasses the unit of work, so pending row changes go first
+    db.flush()
+    sessions = ChatSession.__table__
+    column = sessions.c.conversation_state
+    stored_rev = func.coalesce(func.json_extract(column, "$.tracker.rev"), 0)
+    result = db.execute(
+        update(sessions)
+        .where(sessions.c.id == int(session_id), stored_rev == expected_rev)
+        .values(conversation_state=func.json_set(
+            func.coalesce(func.nullif(column, ""), "{}"), "$.tracker", func.json(json.dumps(payload))
+        ))
+    )
+    session = db.identity_map.get(db.identity_key(ChatSession, int(session_id)))
+    if session is not None:
+        # reload on next access, which is also how a lost race re-reads the winner's tracker
+        db.expire(session, ["conversation_state"])
+    return result.rowcount == 1
+
+conv_manager = None
+
+metrics.gauge("backend_tracker_sessions", "Sessions held in the asked-questions tracker cache",
+              callback=lambda: len(conv_manager.asked_questions_tracker) if conv_manager else None)
+metrics.gauge("backend_llm_requests_in_flight", "Model requests currently in flight",
+              callback=lambda: llm_client.stats()["in_flight"] if llm_client else None)
+metrics.gauge("backend_llm_requests_queued", "Model requests waiting for a scheduler slot",
+              callback=lambda: llm_client.stats()["waiting"] if llm_client else None)
+metrics.gauge("backend_llm_degradation_rate", "Share of model requests answered from the template because of load",
+              callback=lambda: llm_client.scheduler.stats()["degradation_rate"] if llm_client else None)
 
 def format_time_display(time_str):
     """Format time for display using standardized format"""
@@ -589,14 +505,17 @@ def get_time_difference(time1_str, time2_str):
 def generate_initial_question(agent_name, schedule, system_data, phone, agent_disputed):
     """Generate dynamic initial question based on time discrepancy scenario"""
     
-    scheduled_start = format_time_display(schedule.get('start_time')) if schedule else 'unknown'
-    system_start = format_time_display(system_data.get('start_time')) if system_data else 'unknown'
-    phone_start = format_time_display(phone.get('start_time')) if phone else 'unknown'
-    agent_edited_start = format_time_display(agent_disputed.get('start_time')) if agent_disputed else 'unknown'
+    system_value = conv_manager.time_value(system_data.get('start_time')) if system_data else None
+    phone_value = conv_manager.time_value(phone.get('start_time')) if phone else None
+    edited_value = conv_manager.time_value(agent_disputed.get('start_time')) if agent_disputed else None
+
+    system_start = display_time(system_value)
+    phone_start = display_time(phone_value)
+    agent_edited_start = display_time(edited_value)
     
-    start_time_diff = get_time_difference(agent_edited_start, system_start)
-    phone_system_diff = get_time_difference(phone_start, system_start)
-    phone_edited_diff = get_time_difference(phone_start, agent_edited_start)
+    start_time_diff = minutes_between(edited_value, system_value)
+    phone_system_diff = minutes_between(phone_value, system_value)
+    phone_edited_diff = minutes_between(phone_value, edited_value)
     
     scenario = analyze_time_scenario(system_start, phone_start, agent_edited_start, start_time_diff, phone_system_diff, phone_edited_diff)
     
@@ -609,32 +528,14 @@ def generate_initial_question(agent_name, schedule, system_data, phone, agent_di
 
 def analyze_time_scenario(system_start, phone_start, agent_edited_start, start_time_diff, phone_system_diff, phone_edited_diff):
     """Analyze the time discrepancy scenario"""
-    
-    if system_start == 'unknown' and agent_edited_start != 'unknown':
-        return "missing_system_time"
-    
-    if phone_start == 'unknown' and agent_edited_start != 'unknown':
-        return "missing_phone_time"
-    
-    if start_time_diff and start_time_diff > 30:
-        if phone_edited_diff and phone_edited_diff > 15:
-            return "large_discrepancy_both"
-        elif phone_system_diff and phone_system_diff < 5:
-            return "system_vs_edited_large"
-        else:
-            return "significant_edit"
-    
-    elif start_time_diff and start_time_diff > 15:
-        if phone_edited_diff and phone_edited_diff < 10:
-            return "phone_supports_edit"
-        else:
-            return "moderate_edit"
-    
-    elif phone_start != 'unknown' and phone_edited_diff and phone_edited_diff > 20:
-        return "phone_disagrees"
-    
-    else:
-        return "general_inquiry"
+    return classify_scenario(
+        system_start != 'unknown',
+        phone_start != 'unknown',
+        agent_edited_start != 'unknown',
+        start_time_diff,
+        phone_system_diff,
+        phone_edited_diff
+    )
 
 def generate_scenario_based_question(scenario, system_start, phone_start, agent_edited_start, start_time_diff, phone_edited_diff):
     """Generate question based on the specific scenario"""
@@ -711,32 +612,53 @@ def build_context_lines(agent_name, schedule, system_data, phone, agent_disputed
     
     return context_lines
 
-@app.route("/data", methods=["GET"])
+# Roster responses are built once per roster version, gzipped up front and served with
+# strong ETags, so a poll that finds nothing new is a 304 with no body
+ROSTER_HTTP_MAX_AGE = int(os.getenv("ROSTER_HTTP_MAX_AGE", "0"))
+data_json_cache = BodyCache(max_entries=1)
+roster_response_cache = BodyCache(max_entries=int(os.getenv("ROSTER_HTTP_CACHE_SIZE", "4096")))
+
+def roster_json_response(key, build_payload):
+    """Cached JSON response for the current roster generation; build_payload() runs once per generation"""
+    generation, imported_at = agent_store.version()
+    last_modified = imported_at.replace(tzinfo=timezone.utc) if imported_at else None
+    entry = roster_response_cache.get(
+        generation, key, lambda: CachedBody.build([current_app.json.response(build_payload()).get_data()], last_modified)
+    )
+    return cached_response(entry, max_age=ROSTER_HTTP_MAX_AGE)
+
+@api.route("/data", methods=["GET"])
 def get_json_data():
-    return jsonify(localData)
-
-@app.route("/create_session", methods=["POST"])
+    """data.json exactly as on disk, streamed rather than re-encoded (gzip is precomputed per file version)"""
+    signature = agent_store.file_signature()
+    if signature is None:
+        return jsonify({})
+    mtime = datetime.fromtimestamp(int(signature.split(":")[0]) / 1e9, timezone.utc)
+    entry = data_json_cache.get(
+        signature, "data", lambda: CachedBody.build(agent_store.iter_raw(), mtime, keep_body=False)
+    )
+    return cached_response(entry, max_age=ROSTER_HTTP_MAX_AGE, stream=agent_store.iter_raw)
+
+@api.route("/create_session", methods=["POST"])
 def create_session():
     body = request.get_json() or {}
     agent = body.get("agent", "unknown")
-    db = SessionLocal()
+    db = get_db()
     s = ChatSession(agent=agent)
     db.add(s)
     db.commit()
     db.refresh(s)
-    db.close()
     return jsonify({"id": s.id, "agent": s.agent, "created_at": s.created_at.isoformat()}), 201
 
-@app.route("/sessions/<int:session_id>/messages", methods=["POST"])
+@api.route("/sessions/<int:session_id>/messages", methods=["POST"])
 def add_message(session_id):
     body = request.get_json() or {}
     role = body.get("role", "user")
     content = body.get("content", "")
     ts = body.get("created_at")
-    db = SessionLocal()
+    db = get_db()
     s = db.query(ChatSession).filter(ChatSession.id == session_id).first()
     if not s:
-        db.close()
         return jsonify({"error": "session not found"}), 404
     if ts:
         try:
@@ -745,43 +667,64 @@ def add_message(session_id):
             created_at = datetime.utcnow()
     else:
         created_at = datetime.utcnow()
-    msg = ChatMessage(session_id=session_id, role=role, content=content, created_at=created_at)
-    db.add(msg)
+    msg = store_message(db, session_id, role, content, created_at)
+    if message_writer is not None:
+        # the response carries the new id, so this one waits for its batch
+        return jsonify({"message_id": msg.result(timeout=10), "session_id": session_id}), 201
     db.commit()
     db.refresh(msg)
-    db.close()
     return jsonify({"message_id": msg.id, "session_id": session_id}), 201
 
-@app.route("/sessions", methods=["GET"])
+SESSIONS_PAGE_DEFAULT = 100
+SESSIONS_PAGE_MAX = 1000
+
+@api.route("/sessions", methods=["GET"])
 def list_sessions():
-    db = SessionLocal()
+    """List sessions newest first. Pass ?after=<id> from X-Next-After to get the next page."""
+    after = request.args.get("after", type=int)
+    limit = request.args.get("limit", default=SESSIONS_PAGE_DEFAULT, type=int)
+    limit = max(1, min(limit, SESSIONS_PAGE_MAX))
+
+    db = get_db()
     try:
-        sessions = db.query(ChatSession).order_by(ChatSession.created_at.desc()).all()
-        out = []
-        for s in sessions:
-            last_msg = None
-            if s.messages:
-                last_msg = max(s.messages, key=lambda m: m.created_at).created_at.isoformat()
-            out.append({
-                "id": s.id,
-                "agent": s.agent,
-                "created_at": s.created_at.isoformat(),
-                "last_message_at": last_msg
-            })
-        db.close()
-        return jsonify(out)
+        # correlated MAX() is answered from ix_messages_session_created for each row on the page
+        last_message_at = (
+            db.query(func.max(ChatMessage.created_at))
+            .filter(ChatMessage.session_id == ChatSession.id)
+            .correlate(ChatSession)
+            .scalar_subquery()
+            .label("last_message_at")
+        )
+        query = db.query(ChatSession.id, ChatSession.agent, ChatSession.created_at, last_message_at)
+        if after is not None:
+            query = query.filter(ChatSession.id < after)
+        rows = query.order_by(ChatSession.id.desc()).limit(limit + 1).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        out = [
+            {
+                "id": row.id,
+                "agent": row.agent,
+                "created_at": row.created_at.isoformat(),
+                "last_message_at": row.last_message_at.isoformat() if row.last_message_at else None
+            } for row in rows
+        ]
+        response = jsonify(out)
+        if has_more:
+            response.headers["X-Next-After"] = str(rows[-1].id)
+        return response
     except Exception as e:
-        db.close()
         print(f"Error listing sessions: {e}")
         return jsonify({"error": "Database error occurred"}), 500
 
-@app.route("/sessions/<int:session_id>", methods=["GET"])
+@api.route("/sessions/<int:session_id>", methods=["GET"])
 def get_session(session_id):
-    db = SessionLocal()
+    db = get_db()
     try:
+        sync_session_writes(session_id)
         s = db.query(ChatSession).filter(ChatSession.id == session_id).first()
         if not s:
-            db.close()
             return jsonify({"error": "session not found"}), 404
         messages = [
             {
@@ -797,62 +740,96 @@ def get_session(session_id):
             "created_at": s.created_at.isoformat(),
             "messages": messages
         }
-        db.close()
         return jsonify(out)
     except Exception as e:
-        db.close()
         print(f"Error getting session: {e}")
         return jsonify({"error": "Database error occurred"}), 500
 
-@app.route("/chat_with_ai", methods=["POST"])
-def chat_with_ai():
-    """AI chat endpoint with STRICT conversation management"""
-    try:
-        body = request.get_json() or {}
-        messages = body.get("messages", [])
-        session_id = body.get("session_id")
-        agent_name = body.get("agent_name", "")
-
-        if not messages or not session_id:
-            return jsonify({"error": "No messages or session_id provided"}), 400
-
-        db = SessionLocal()
-        session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-        if not session:
-            db.close()
-            return jsonify({"error": "Session not found"}), 404
-
-        agents = localData.get("agents", [])
-        agent_context = next((a for a in agents if a.get("name", "").lower() == agent_name.lower()), {}) if agent_name else {}
-
-        conversation_state = conv_manager.analyze_conversation_state(messages, agent_context, session_id)
+def parse_since(value):
+    """ISO 8601 date or datetime as naive UTC, the way timestamps are stored"""
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+def export_lines(since=None):
+    """NDJSON lines, one per session with its messages in order, on a connection of their own"""
+    if message_writer is not None:
+        message_writer.flush()
+    with engine.connect() as conn:
+        yield from ndjson_lines(iter_sessions(conn, ChatSession.__table__, ChatMessage.__table__, since))
+
+@api.route("/export", methods=["GET"])
+def export_sessions():
+    """Stream every session created or written to since ?since=<ISO timestamp> as NDJSON; ?gzip=1 compresses"""
+    since = request.args.get("since")
+    if since:
+        try:
+            since = parse_since(since)
+        except ValueError:
+            return jsonify({"error": "since must be an ISO 8601 timestamp"}), 400
+    else:
+        since = None
 
-        recent_user_input = ""
-        if messages and messages[-1]["role"] == "user":
-            recent_user_input = messages[-1]["content"]
+    headers = {"Content-Disposition": 'attachment; filename="sessions.ndjson"'}
+    if request.args.get("gzip", "0").lower() in ("1", "true", "yes"):
+        body = gzip_chunks(export_lines(since))
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = buffered(export_lines(since))
+    return Response(body, mimetype="application/x-ndjson", headers=headers)
+
+SEARCH_PAGE_DEFAULT = 20
+SEARCH_PAGE_MAX = 100
+# a query with more matches than this ranks only the newest this-many (0 ranks all of them)
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "10000"))
+
+@api.route("/search", methods=["GET"])
+def search():
+    """Messages matching ?q=, best match first, with the matched terms in <mark> in each snippet.
+
+    Narrow with ?agent=<name>, ?from= and ?to= (ISO timestamps, to exclusive); page with
+    ?offset= from X-Next-Offset. X-Search-Window is set when there were too many matches
+    to rank them all and only the newest that-many were ranked.
+    """
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "q is required"}), 400
+    agent = request.args.get("agent") or None
+    offset = max(0, request.args.get("offset", default=0, type=int))
+    limit = request.args.get("limit", default=SEARCH_PAGE_DEFAULT, type=int)
+    limit = max(1, min(limit, SEARCH_PAGE_MAX))
+    bounds = {}
+    for name in ("from", "to"):
+        value = request.args.get(name)
+        try:
+            bounds[name] = parse_since(value) if value else None
+        except ValueError:
+            return jsonify({"error": f"{name} must be an ISO 8601 timestamp"}), 400
 
-        next_question = conv_manager.generate_intelligent_question(
-            conversation_state, agent_context, recent_user_input, session_id
+    db = get_db()
+    try:
+        rows, has_more, windowed = search_messages(
+            db.connection(), q, agent=agent, start=bounds["from"], end=bounds["to"],
+            offset=offset, limit=limit, window=SEARCH_RANK_WINDOW
         )
+    except Exception as e:
+        print(f"Error searching messages: {e}")
+        return jsonify({"error": "Database error occurred"}), 500
+    response = jsonify(rows)
+    if has_more:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    if windowed:
+        response.headers["X-Search-Window"] = str(SEARCH_RANK_WINDOW)
+    return response
 
-        if (next_question == "SUMMARY_REQUEST" or 
-            conv_manager.should_end_conversation(conversation_state, recent_user_input) or 
-            conversation_state.get('question_count', 0) >= 5):
-            
-            summary = conv_manager.generate_conversation_summary(messages, agent_context)
-            
-            confirmation_msg = ChatMessage(
-                session_id=session_id,
-                role="assistant",
-                content=summary,
-                created_at=datetime.utcnow()
-            )
-            db.add(confirmation_msg)
-            db.commit()
-            db.close()
-            return jsonify({"response": summary})
+CHAT_FALLBACK_RESPONSE = "Could you please provide more details about the time discrepancy?"
+LLM_TURN_OPTIONS = {"temperature": 0.1, "max_tokens": 50, "top_p": 0.2}
 
-        system_prompt = f"""You are Quartz AI conducting a professional time discrepancy investigation.
+response_cache = ResponseCache(max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "2048")))
+
+def build_turn_prompt(conversation_state, recent_user_input, next_question):
+    return f"""You are Quartz AI conducting a professional time discrepancy investigation.
 
 CONVERSATION CONTEXT:
 - Question {conversation_state.get('question_count', 1)} of maximum 5
@@ -867,74 +844,314 @@ CRITICAL INSTRUCTIONS:
 
 OUTPUT ONLY this question: {next_question}"""
 
+def response_cache_key(next_question):
+    return ResponseCache.make_key(DEFAULT_MODEL, next_question, LLM_TURN_OPTIONS["temperature"])
+
+def cache_model_reply(next_question, response):
+    # only keep replies that would survive finish_chat_turn's validation
+    if response and len(response) >= 8 and '?' in response:
+        response_cache.put(response_cache_key(next_question), response)
+
+def model_reply(turn):
+    """Model reply for the turn's question, served from the response cache when possible"""
+    cached = response_cache.get(response_cache_key(turn["next_question"]))
+    if cached is not None:
+        return cached
+    response = ask_model(turn["llm_messages"], priority=turn["priority"], **LLM_TURN_OPTIONS)
+    cache_model_reply(turn["next_question"], response)
+    return response
+
+def warm_response_cache(workers=4):
+    """Ask the model once for every static question template"""
+    empty_state = {"question_count": 1, "established_facts": []}
+
+    def warm(question):
+        messages = [{"role": "system", "content": build_turn_prompt(empty_state, "", question)}]
+        try:
+            cache_model_reply(question, ask_model(messages, **LLM_TURN_OPTIONS))
+            response_cache.warmed += 1
+        except Exception as e:
+            print(f"Response cache warm-up failed for {question!r}: {e}")
+
+    pending = [q for q in conv_manager.static_questions() if response_cache_key(q) not in response_cache]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(warm, pending))
+    print(f"Response cache warmed with {response_cache.warmed} templates")
+
+def session_agent(session):
+    """Roster record for a session, through its agent_id link or else its agent name"""
+    return agent_store.get_by_db_id(session.agent_id) or agent_store.get_by_name(session.agent)
+
+def load_session_history(db, session_id):
+    """Session messages in conversation order, in the shape the chat routes expect"""
+    sync_session_writes(session_id)
+    rows = (
+        db.query(ChatMessage.role, ChatMessage.content)
+        .filter(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.created_at, ChatMessage.id)
+        .all()
+    )
+    return [{"role": row.role, "content": row.content} for row in rows]
+
+def prepare_chat_turn(body):
+    """Run a chat turn up to the model call.
+
+    The body carries either the whole history in "messages" or, in delta mode, only the
+    new user text in "message"; the server then stores it and reads the history itself.
+
+    Returns (turn, None) when the model should be asked, or (None, (payload, status))
+    when the turn is already answered: a bad request or the closing summary.
+    """
+    messages = body.get("messages", [])
+    new_message = body.get("message")
+    session_id = body.get("session_id")
+    agent_name = body.get("agent_name", "")
+    delta_mode = new_message is not None
+
+    if delta_mode and (not isinstance(new_message, str) or not new_message.strip()):
+        return None, ({"error": "Empty message"}, 400)
+    if not session_id or (not delta_mode and not messages):
+        return None, ({"error": "No messages or session_id provided"}, 400)
+
+    db = get_db()
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    if not session:
+        return None, ({"error": "Session not found"}, 404)
+
+    if delta_mode and message_writer is not None:
+        messages = load_session_history(db, session.id)
+        store_message(db, session.id, "user", new_message)
+        messages.append({"role": "user", "content": new_message})
+    elif delta_mode:
+        store_message(db, session.id, "user", new_message)
+        # commit rather than flush: an open write transaction would hold the SQLite lock through the model call
+        db.commit()
+        messages = load_session_history(db, session.id)
+
+    if agent_name:
+        agent_context = agent_store.get_by_name(agent_name) or {}
+    else:
+        agent_context = session_agent(session) or {}
+
+    with phase("analyze", analysis_latency, step="analyze_state"):
+        conversation_state = conv_manager.analyze_conversation_state(messages, agent_context, session_id)
+
+    recent_user_input = ""
+    if messages and messages[-1]["role"] == "user":
+        recent_user_input = messages[-1]["content"]
+
+    with phase("question", analysis_latency, step="next_question"):
+        next_question = conv_manager.generate_intelligent_question(
+            conversation_state, agent_context, recent_user_input, session_id
+        )
+
+    if (next_question == "SUMMARY_REQUEST" or 
+        conv_manager.should_end_conversation(conversation_state, recent_user_input) or 
+        conversation_state.get('question_count', 0) >= 5):
+        
+        with phase("question", analysis_latency, step="summary"):
+            summary = conv_manager.generate_conversation_summary(messages, agent_context)
+        
+        with phase("persist"):
+            store_message(db, session.id, "assistant", summary)
+            conv_manager.asked_questions_tracker.persist(session_id)
+            db.commit()
+        return None, ({"response": summary}, 200)
+
+    with phase("prompt"):
+        system_prompt = build_turn_prompt(conversation_state, recent_user_input, next_question)
+
         enhanced_messages = [{"role": "system", "content": system_prompt}]
         enhanced_messages.extend(messages[-2:])  
 
+    # the first reply of an interview goes ahead of follow-ups in the LLM queue
+    user_turns = sum(1 for msg in messages if msg["role"] == "user")
+
+    return {
+        "session_id": session_id,
+        "messages": messages,
+        "next_question": next_question,
+        "llm_messages": enhanced_messages,
+        "priority": PRIORITY_FIRST_TURN if user_turns <= 1 else PRIORITY_FOLLOW_UP
+    }, None
+
+def finish_chat_turn(turn, response):
+    """Apply the repetition/validation fallback and store the assistant reply"""
+    session_id = turn["session_id"]
+    next_question = turn["next_question"]
+    response = (response or "").strip()
+
+    previous_assistant_messages = [msg["content"] for msg in turn["messages"] if msg["role"] == "assistant"]
+    is_repetitive = any(
+        prev_msg and response and 
+        (prev_msg.lower() == response.lower() or 
+         is_similar_question(prev_msg, response))
+        for prev_msg in previous_assistant_messages
+    )
+
+    if (not response or len(response) < 8 or '?' not in response or is_repetitive):
+        response = next_question
+
+    if session_id in conv_manager.asked_questions_tracker:
+        conv_manager.asked_questions_tracker[session_id]["asked_questions"].append(response)
+
+    with phase("persist"):
+        db = get_db()
+        store_message(db, session_id, "assistant", response)
+        conv_manager.asked_questions_tracker.persist(session_id)
+        db.commit()
+
+    return response
+
+@api.route("/chat_with_ai", methods=["POST"])
+def chat_with_ai():
+    """AI chat endpoint with STRICT conversation management"""
+    try:
+        turn, early = prepare_chat_turn(request.get_json() or {})
+        if early:
+            return jsonify(early[0]), early[1]
+
+        started = time.perf_counter()
+        outcome = "fallback"
         if OPENAI_AVAILABLE:
             try:
-                response = chat_with_gpt(
-                    enhanced_messages,
-                    temperature=0.1,
-                    max_tokens=50,
-                    top_p=0.2
-                )
+                response = model_reply(turn)
+                outcome = "success"
+            except LLMOverloaded:
+                response = turn["next_question"]
+                outcome = "degraded"
+            except CircuitOpenError:
+                response = turn["next_question"]
             except Exception as e:
                 print(f"OpenAI API error: {e}")
-                response = next_question
+                response = turn["next_question"]
         else:
-            response = next_question
+            response = turn["next_question"]
+        elapsed = time.perf_counter() - started
+        llm_latency.observe(elapsed, endpoint="sync", outcome=outcome)
+        add_phase_time("llm", elapsed)
 
-        response = (response or "").strip()
+        return jsonify({"response": finish_chat_turn(turn, response)})
 
-        previous_assistant_messages = [msg["content"] for msg in messages if msg["role"] == "assistant"]
-        is_repetitive = any(
-            prev_msg and response and 
-            (prev_msg.lower() == response.lower() or 
-             is_similar_question(prev_msg, response))
-            for prev_msg in previous_assistant_messages
-        )
-
-        if (not response or len(response) < 8 or '?' not in response or is_repetitive):
-            response = next_question
+    except Exception as e:
+        print(f"Error in chat_with_ai: {str(e)}")
+        return jsonify({"response": CHAT_FALLBACK_RESPONSE})
 
-        if session_id in conv_manager.asked_questions_tracker:
-            conv_manager.asked_questions_tracker[session_id]["asked_questions"].append(response)
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-        ai_msg = ChatMessage(
-            session_id=session_id,
-            role="assistant",
-            content=response,
-            created_at=datetime.utcnow()
-        )
-        db.add(ai_msg)
-        db.commit()
-        db.close()
+@api.route("/chat_with_ai/stream", methods=["POST"])
+def chat_with_ai_stream():
+    """Stream model tokens as Server-Sent Events, then send the validated reply as a done event"""
+    try:
+        turn, early = prepare_chat_turn(request.get_json() or {})
+    except Exception as e:
+        print(f"Error in chat_with_ai_stream: {str(e)}")
+        turn, early = None, ({"response": CHAT_FALLBACK_RESPONSE}, 200)
+
+    if early and early[1] != 200:
+        return jsonify(early[0]), early[1]
+
+    def generate():
+        if early:
+            yield sse_event("done", early[0])
+            return
+
+        started = time.perf_counter()
+        outcome = "fallback"
+        cached = response_cache.get(response_cache_key(turn["next_question"])) if OPENAI_AVAILABLE else None
+        if cached is not None:
+            response = cached
+            outcome = "success"
+            yield sse_event("token", {"content": cached})
+        elif OPENAI_AVAILABLE:
+            tokens = []
+            try:
+                for token in stream_chat_with_gpt(turn["llm_messages"], priority=turn["priority"], **LLM_TURN_OPTIONS):
+                    tokens.append(token)
+                    yield sse_event("token", {"content": token})
+                response = validate_question("".join(tokens), turn["llm_messages"][0]["content"])
+                cache_model_reply(turn["next_question"], response)
+                outcome = "success"
+            except LLMOverloaded:
+                response = turn["next_question"]
+                outcome = "degraded"
+            except CircuitOpenError:
+                response = turn["next_question"]
+            except Exception as e:
+                print(f"OpenAI stream error: {e}")
+                response = turn["next_question"]
+        else:
+            response = turn["next_question"]
+        elapsed = time.perf_counter() - started
+        llm_latency.observe(elapsed, endpoint="stream", outcome=outcome)
+        add_phase_time("llm", elapsed)
 
-        return jsonify({"response": response})
+        # the streamed text may still be replaced by the repetition/validation fallback
+        try:
+            response = finish_chat_turn(turn, response)
+        except Exception as e:
+            print(f"Error in chat_with_ai_stream: {str(e)}")
+            response = CHAT_FALLBACK_RESPONSE
+        yield sse_event("done", {"response": response})
 
-    except Exception as e:
-        print(f"Error in chat_with_ai: {str(e)}")
-        return jsonify({"response": "Could you please provide more details about the time discrepancy?"})
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@app.route("/agents", methods=["GET"])
+@api.route("/agents", methods=["GET"])
 def get_agents():
     """Get list of all available agents"""
-    agents = localData.get("agents", [])
-    agent_list = [{"name": agent.get("name"), "agent_id": agent.get("agent_id")} for agent in agents]
-    return jsonify(agent_list)
+    return roster_json_response("agents", lambda: [
+        {"name": name, "agent_id": agent_id} for name, agent_id in agent_store.list_agents()
+    ])
 
-@app.route("/agent/<agent_name>", methods=["GET"])
+@api.route("/agent/<agent_name>", methods=["GET"])
 def get_agent_details(agent_name):
     """Get detailed information for a specific agent"""
-    agents = localData.get("agents", [])
-    agent = next((a for a in agents if a.get("name", "").lower() == agent_name.lower()), None)
+    agent = agent_store.get_by_name(agent_name)
 
     if not agent:
         return jsonify({"error": "Agent not found"}), 404
 
-    return jsonify(agent)
+    return roster_json_response(("agent", agent.db_id), agent.to_dict)
+
+DISCREPANCIES_PAGE_DEFAULT = 100
+DISCREPANCIES_PAGE_MAX = 1000
+
+@api.route("/discrepancies", methods=["GET"])
+def list_discrepancies():
+    """Agents by start-time discrepancy, from the index built at roster load.
+
+    ?scenario=<name>&min_diff=<minutes>&sort=[-]diff|phone_diff|phone_edited_diff|name
+    (default -diff, largest first); page with ?offset= from X-Next-Offset.
+    """
+    scenario = request.args.get("scenario") or None
+    min_diff = request.args.get("min_diff", type=int)
+    sort = request.args.get("sort", "-diff")
+    offset = max(0, request.args.get("offset", default=0, type=int))
+    limit = request.args.get("limit", default=DISCREPANCIES_PAGE_DEFAULT, type=int)
+    limit = max(1, min(limit, DISCREPANCIES_PAGE_MAX))
+
+    descending = sort.startswith("-")
+    sort_key = sort.lstrip("-+")
+    if scenario is not None and scenario not in SCENARIOS:
+        return jsonify({"error": f"Unknown scenario; expected one of {', '.join(SCENARIOS)}"}), 400
+    if sort_key not in SORT_KEYS:
+        return jsonify({"error": f"Unknown sort; expected one of {', '.join(SORT_KEYS)}"}), 400
+
+    total, rows = agent_store.discrepancies.query(
+        scenario=scenario, min_diff=min_diff, sort=sort_key, descending=descending, offset=offset, limit=limit
+    )
+    response = jsonify(rows)
+    response.headers["X-Total-Count"] = str(total)
+    if offset + limit < total:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return response
 
-@app.route("/initialize_session/<int:session_id>", methods=["POST"])
+@api.route("/initialize_session/<int:session_id>", methods=["POST"])
 def initialize_session(session_id):
     """Initialize session with proper context and clear time information"""
     try:
@@ -944,8 +1161,7 @@ def initialize_session(session_id):
         if not agent_name:
             return jsonify({"error": "Agent name required"}), 400
 
-        agents = localData.get("agents", [])
-        agent_details = next((a for a in agents if a.get("name", "").lower() == agent_name.lower()), None)
+        agent_details = agent_store.get_by_name(agent_name)
 
         if not agent_details:
             return jsonify({"error": "Agent not found"}), 404
@@ -957,10 +1173,10 @@ def initialize_session(session_id):
 
         initial_question = generate_initial_question(agent_name, schedule, system_data, phone, agent_disputed)
 
-        db = SessionLocal()
+        db = get_db()
+        sync_session_writes(session_id)
         session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
         if not session:
-            db.close()
             return jsonify({"error": "Session not found"}), 404
 
         last_assistant = None
@@ -972,19 +1188,13 @@ def initialize_session(session_id):
                     break
 
         if last_assistant != initial_question:
-            ai_msg = ChatMessage(
-                session_id=session_id,
-                role="assistant",
-                content=initial_question,
-                created_at=datetime.utcnow()
-            )
-            db.add(ai_msg)
+            store_message(db, session_id, "assistant", initial_question)
 
         conversation_state = conv_manager.analyze_conversation_state([], agent_details, session_id)
-        session.conversation_state = json.dumps(conversation_state)
+        store_conversation_state(session, conversation_state)
+        conv_manager.asked_questions_tracker.persist(session_id)
 
         db.commit()
-        db.close()
 
         return jsonify({
             "success": True,
@@ -1002,7 +1212,7 @@ def initialize_session(session_id):
             "ai_response": fallback_message
         })
 
-@app.route("/initialize_session", methods=["POST", "OPTIONS"])
+@api.route("/initialize_session", methods=["POST", "OPTIONS"])
 def initialize_session_new():
     """New endpoint that matches frontend expectation - creates and initializes in one call"""
     if request.method == "OPTIONS":
@@ -1015,19 +1225,17 @@ def initialize_session_new():
         if not agent_name:
             return jsonify({"error": "Agent name required"}), 400
 
-        db = SessionLocal()
-        session = ChatSession(agent=agent_name)
+        agent_details = agent_store.get_by_name(agent_name)
+
+        db = get_db()
+        session = ChatSession(agent=agent_name, agent_id=agent_details.db_id if agent_details else None)
         db.add(session)
         db.commit()
         db.refresh(session)
         
         session_id = session.id
 
-        agents = localData.get("agents", [])
-        agent_details = next((a for a in agents if a.get("name", "").lower() == agent_name.lower()), None)
-
         if not agent_details:
-            db.close()
             return jsonify({"error": "Agent not found"}), 404
 
         schedule = agent_details.get("schedule", {})
@@ -1037,19 +1245,13 @@ def initialize_session_new():
 
         initial_question = generate_initial_question(agent_name, schedule, system_data, phone, agent_disputed)
 
-        ai_msg = ChatMessage(
-            session_id=session_id,
-            role="assistant",
-            content=initial_question,
-            created_at=datetime.utcnow()
-        )
-        db.add(ai_msg)
+        store_message(db, session_id, "assistant", initial_question)
 
         conversation_state = conv_manager.analyze_conversation_state([], agent_details, session_id)
-        session.conversation_state = json.dumps(conversation_state)
+        store_conversation_state(session, conversation_state)
+        conv_manager.asked_questions_tracker.persist(session_id)
 
         db.commit()
-        db.close()
 
         return jsonify({
             "session_id": session_id,
@@ -1061,14 +1263,100 @@ def initialize_session_new():
         print(f"Error in initialize_session: {str(e)}")
         return jsonify({"error": "Failed to initialize session"}), 500
 
-@app.route("/conversation_analysis/<int:session_id>", methods=["GET"])
+MAX_BULK_SESSIONS = int(os.getenv("MAX_BULK_SESSIONS", "10000"))
+
+@api.route("/initialize_sessions", methods=["POST"])
+def initialize_sessions_bulk():
+    """Create and initialize sessions for many agents in one transaction.
+
+    Body: {"agent_names": [...]} or {"all_with_discrepancy": true}
+    """
+    try:
+        body = request.get_json() or {}
+        agent_names = body.get("agent_names") or []
+        if not isinstance(agent_names, list) or not all(isinstance(name, str) for name in agent_names):
+            return jsonify({"error": "agent_names must be a list of strings"}), 400
+        not_found = []
+
+        if body.get("all_with_discrepancy"):
+            agents = agent_store.agents_with_discrepancy(limit=MAX_BULK_SESSIONS + 1)
+        elif agent_names:
+            agents = []
+            seen = set()
+            for name in agent_names:
+                agent = agent_store.get_by_name(name)
+                if not agent:
+                    not_found.append(name)
+                elif agent.db_id not in seen:
+                    # names that differ only in case reach the same agent, possibly as separate record objects
+                    seen.add(agent.db_id)
+                    agents.append(agent)
+        else:
+            return jsonify({"error": "agent_names or all_with_discrepancy required"}), 400
+
+        if len(agents) > MAX_BULK_SESSIONS:
+            return jsonify({"error": f"At most {MAX_BULK_SESSIONS} sessions per request"}), 400
+
+        # fresh sessions share no tracker history, so their initial state is built on a scratch manager
+        scratch = ConversationManager()
+        now = datetime.utcnow()
+        session_rows = []
+        greetings = []
+        for index, agent in enumerate(agents):
+            name = agent.get("name", "")
+            greetings.append(generate_initial_question(
+                name,
+                agent.get("schedule", {}),
+                agent.get("system", {}),
+                agent.get("phone", {}),
+                agent.get("agent_disputed", {})
+            ))
+            conversation_state = scratch.analyze_conversation_state([], agent, index)
+            tracker = tracker_to_payload(scratch.asked_questions_tracker.get(index))
+            tracker["rev"] = 1
+            conversation_state["tracker"] = tracker
+            session_rows.append({
+                "agent": name,
+                "agent_id": agent.db_id,
+                "created_at": now,
+                "conversation_state": json.dumps(conversation_state)
+            })
+
+        session_ids = []
+        if session_rows:
+            db = get_db()
+            # RETURNING order is unspecified in SQLite, but new rowids are allocated in insertion
+            # order, so the sorted ids line up with session_rows (and stay batched, unlike
+            # sort_by_parameter_order, which SQLAlchemy runs one row per statement on SQLite)
+            session_ids = sorted(db.scalars(insert(ChatSession).returning(ChatSession.id), session_rows))
+            db.execute(insert(ChatMessage), [
+                {"session_id": session_id, "role": "assistant", "content": greeting, "created_at": now}
+                for session_id, greeting in zip(session_ids, greetings)
+            ])
+            db.commit()
+
+        return jsonify({
+            "count": len(session_ids),
+            "session_ids": session_ids,
+            "sessions": [
+                {"session_id": session_id, "agent": row["agent"]}
+                for session_id, row in zip(session_ids, session_rows)
+            ],
+            "not_found": not_found
+        })
+
+    except Exception as e:
+        print(f"Error in initialize_sessions: {str(e)}")
+        return jsonify({"error": "Failed to initialize sessions"}), 500
+
+@api.route("/conversation_analysis/<int:session_id>", methods=["GET"])
 def get_conversation_analysis(session_id):
     """Get analysis of current conversation state"""
     try:
-        db = SessionLocal()
+        db = get_db()
+        sync_session_writes(session_id)
         session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
         if not session:
-            db.close()
             return jsonify({"error": "Session not found"}), 404
 
         messages = [
@@ -1080,13 +1368,10 @@ def get_conversation_analysis(session_id):
             } for m in sorted(session.messages, key=lambda mm: mm.created_at)
         ]
 
-        agents = localData.get("agents", [])
-        agent_context = next((a for a in agents if a.get("name", "").lower() == session.agent.lower()), {})
+        agent_context = session_agent(session) or {}
 
         conversation_state = conv_manager.analyze_conversation_state(messages, agent_context, session_id)
 
-        db.close()
-
         return jsonify({
             "session_id": session_id,
             "agent": session.agent,
@@ -1098,19 +1383,69 @@ def get_conversation_analysis(session_id):
         print(f"Error in conversation analysis: {str(e)}")
         return jsonify({"error": "Analysis failed"}), 500
 
-@app.route("/health", methods=["GET"])
+@api.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "agents_count": len(localData.get("agents", [])),
+        "agents_count": agent_store.count(),
         "openai_available": OPENAI_AVAILABLE,
         "database": "connected" if os.path.exists(DB_PATH) else "not_found",
-        "conversation_manager": "active"
+        "conversation_manager": "active",
+        "tracker_cache": conv_manager.asked_questions_tracker.stats(),
+        "llm_client": llm_client.stats() if llm_client else None,
+        "llm_circuit": llm_breaker.stats() if llm_breaker else None,
+        "response_cache": response_cache.stats(),
+        "roster": agent_store.stats(),
+        "roster_http_cache": roster_response_cache.stats(),
+        "storage": storage.stats(),
+        "message_writer": message_writer.stats() if message_writer else None
     })
 
-@app.route("/")
+@api.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text exposition of request, LLM, database and analysis timings.
+
+    Each worker process keeps its own metrics and this answers from whichever worker
+    accepts the scrape, labelled with its worker_pid. For complete numbers run one
+    worker per instance (WEB_CONCURRENCY=1, see gunicorn.conf.py) and scrape every
+    instance; with more, each scrape covers only one worker's share of the traffic.
+    """
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def admin_allowed():
+    """X-Admin-Token must match ADMIN_TOKEN when one is set; otherwise only local callers"""
+    if ADMIN_TOKEN:
+        return request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+@api.route("/admin/profiling", methods=["GET", "POST"])
+def admin_profiling():
+    """Profiler status; POST {"every": N, "flush_every": M, "dump": true, "reset": true} to change it"""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+
+    written = None
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        try:
+            profiler.configure(every=body.get("every"), flush_every=body.get("flush_every"))
+        except (TypeError, ValueError):
+            return jsonify({"error": "every and flush_every must be integers"}), 400
+        if body.get("dump"):
+            written = profiler.dump()
+        if body.get("reset"):
+            profiler.reset()
+
+    out = profiler.stats()
+    if written is not None:
+        out["written"] = written
+    return jsonify(out)
+
+@api.route("/")
 def home():
     return jsonify({
         "status": "Backend Running",
@@ -1120,29 +1455,138 @@ def home():
         "routes": [
             "GET / - This info",
             "GET /health - Health check",
+            "GET /metrics - Prometheus metrics",
+            "GET|POST /admin/profiling - Sampled cProfile of requests (every, flush_every, dump, reset)",
             "GET /data - View data.json",
             "GET /agents - List all agents",
             "GET /agent/<name> - Get agent details",
+            "GET /discrepancies - Agents by start-time discrepancy (scenario, min_diff, sort, offset, limit)",
             "GET /conversation_analysis/<id> - Analyze conversation state",
             "POST /create_session - Create new chat session",
             "POST /initialize_session/<id> - Initialize session with AI",
-            "GET /sessions - List all sessions",
+            "POST /initialize_sessions - Create and initialize sessions for many agents",
+            "GET /sessions?after=<id>&limit=<n> - List sessions (paginated)",
             "GET /sessions/<id> - Get session details",
+            "GET /export?since=<ts>&gzip=1 - Sessions with their messages as NDJSON",
+            "GET /search?q=<text>&agent=<name>&from=<ts>&to=<ts> - Full-text search of messages (offset, limit)",
             "POST /sessions/<id>/messages - Add message to session",
-            "POST /chat_with_ai - Chat with AI (intelligent)"
+            "POST /chat_with_ai - Chat with AI (intelligent)",
+            "POST /chat_with_ai/stream - Chat with AI, streamed as Server-Sent Events"
         ]
     })
 
+_config = None
+_default_app = None
+
+def create_app(config=None):
+    """The Flask app, with this process's database, roster and model client set up.
+
+    config overrides load_config() keys. The schema is not migrated here: a database
+    below SCHEMA_VERSION is refused until python migrate.py has run, so no worker or
+    request ever waits on a migration. With PRELOAD (gunicorn --preload) the roster and
+    its discrepancy index are loaded now, before the server forks, and the workers share
+    them; pooled connections and the writer and warm-up threads are then left to each
+    worker after the fork. Otherwise the first request starts a background roster
+    sync. These services belong to the process, so a second call returns a new app
+    sharing them.
+    """
+    global _config, DATA_JSON_PATH, agent_store, conv_manager, profiler
+    config = load_config(config)
+    init_storage(config)
+    version = schema_version()
+    if version < SCHEMA_VERSION:
+        raise RuntimeError(
+            f"{DB_PATH} is at schema version {version}, expected {SCHEMA_VERSION}; run python migrate.py"
+        )
+
+    if agent_store is None:
+        _config = config
+        DATA_JSON_PATH = config["DATA_JSON_PATH"]
+        agent_store = RosterStore(
+            storage.side_engine,
+            roster_tables,
+            DATA_JSON_PATH,
+            check_interval=config["ROSTER_CHECK_INTERVAL"],
+            cache_size=config["ROSTER_CACHE_SIZE"],
+            link_sessions=link_sessions_to_agents
+        )
+        load_model_client()
+        conv_manager = ConversationManager(TrackerStore(
+            load_tracker_state,
+            save_tracker_state,
+            max_entries=config["TRACKER_CACHE_SIZE"],
+            ttl_seconds=config["TRACKER_CACHE_TTL"]
+        ), time_source=agent_store.time_value)
+        profiler = RequestProfiler(
+            config["PROFILE_DIR"] or os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "profiles"),
+            every=config["PROFILE_EVERY"],
+            flush_every=config["PROFILE_FLUSH_EVERY"]
+        )
+        if config["PRELOAD"]:
+            agent_store.reload()
+            agent_store.discrepancies  # built on first access
+            os.register_at_fork(after_in_child=_after_fork)
+        else:
+            start_process_services()
+
+    app = Flask(__name__)
+    app.config.update(config)
+    CORS(app)
+    storage.init_app(app)
+    app.register_blueprint(api)
+    return app
+
+def start_process_services():
+    """Threads create_app() leaves to the serving process, since they do not survive a fork"""
+    global message_writer
+    if _config["MESSAGE_WRITE_BEHIND"] and message_writer is None:
+        message_writer = MessageWriter(
+            storage.side_engine,
+            ChatMessage.__table__,
+            ChatSession.__table__,
+            max_delay=_config["MESSAGE_WRITE_DELAY_MS"] / 1000,
+            max_batch=_config["MESSAGE_WRITE_BATCH"]
+        )
+    if OPENAI_AVAILABLE and _config["RESPONSE_CACHE_WARMUP"]:
+        threading.Thread(target=warm_response_cache, name="response-cache-warmup", daemon=True).start()
+
+def _after_fork():
+    # connections opened before the fork belong to the parent; drop them without closing its sockets
+    storage.engine.dispose(close=False)
+    storage.side_engine.dispose(close=False)
+    start_process_services()
+
+def __getattr__(name):
+    # app:app for servers that want an app object rather than the create_app() factory
+    global _default_app
+    if name == "app":
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
+    # the development server migrates for itself; deployments run python migrate.py first
+    migrate_database()
+    app = create_app()
+    agent_store.reload()
     print("Starting Flask server with enhanced conversation management...")
     print(f"Database path: {DB_PATH}")
     print(f"Data.json path: {DATA_JSON_PATH}")
     print(f"Data.json exists: {os.path.exists(DATA_JSON_PATH)}")
-    print(f"Agents loaded: {len(localData.get('agents', []))}")
+    print(f"Agents loaded: {agent_store.count()}")
     print(f"OpenAI client available: {OPENAI_AVAILABLE}")
     print(f"Conversation Manager: Active")
+    print(f"Message write-behind: {'on' if message_writer else 'off'}")
+
+    # exit normally on SIGTERM so atexit handlers, such as the message writer's final flush, run
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(
+        host=os.getenv("BACKEND_HOST", "0.0.0.0"),
+        port=int(os.getenv("BACKEND_PORT", "5000")),
+        debug=os.getenv("FLASK_DEBUG", "1") == "1"
+    )
     
     
     
@@ -0,0 +1,193 @@
+"""Per-turn cost of ConversationManager's keyword heuristics, before and after the compiled matcher.
+
+LegacyConversationManager keeps the original `any(word in text ...)` / uncompiled re.search
+implementations so both can be timed on the same scripted interview.
+
+    python benchmarks/analysis_microbench.py [--turns 8] [--repeat 2000]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import ConversationManager, is_similar_question
+
+AGENT_CONTEXT = {
+    "phone": {"start_time": "10/15/2025 8:10:00 AM"},
+    "system": {"start_time": "10/15/2025 9:05:00 AM"},
+    "agent_disputed": {"start_time": "10/15/2025 8:20:00 AM"}
+}
+
+USER_TURNS = [
+    "I arrived early at 8:20 because we had a team meeting",
+    "My supervisor organized it, the team lead was there too",
+    "It lasted about 40 minutes and was about the new schedule",
+    "The phone had a glitch, the system is wrong about my time",
+    "Nobody else can verify, it was just my daily routine",
+    "I was preparing my work station and checking emails",
+    "The building security face scan should show when I entered",
+    "Yes that is correct and accurate"
+]
+
+
+def legacy_is_similar_question(question1, question2):
+    key_phrases = ["why did you edit", "phone shows", "explain this difference", "what activities",
+                   "who organized", "how long", "can verify", "work-related"]
+    q1_lower = question1.lower()
+    q2_lower = question2.lower()
+    for phrase in key_phrases:
+        if phrase in q1_lower and phrase in q2_lower:
+            return True
+    return False
+
+
+class LegacyConversationManager(ConversationManager):
+    """The keyword heuristics as they were before keyword_matcher"""
+
+    def analyze_conversation_state(self, messages, agent_context, session_id):
+        user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
+        assistant_messages = [msg["content"] for msg in messages if msg["role"] == "assistant"]
+        question_count = sum(1 for msg in assistant_messages if msg.strip().endswith('?'))
+        tracker = self.asked_questions_tracker.get_or_create(session_id, refresh=True)
+        state = {
+            "established_facts": list(tracker["established_facts"]),
+            "unresolved_issues": list(tracker["unresolved_issues"]),
+            "remaining_questions": [],
+            "conversation_stage": "initial",
+            "quality_score": 0,
+            "question_count": question_count,
+            "last_question_asked": assistant_messages[-1] if assistant_messages else "",
+            "asked_questions": tracker["asked_questions"]
+        }
+        recent_user_text = " ".join(user_messages[-3:]).lower() if user_messages else ""
+        all_user_text = " ".join(user_messages).lower()
+        if any(word in all_user_text for word in ["meeting", "training", "session", "conference", "briefing", "workshop"]):
+            tracker["established_facts"].add("was_in_activity")
+        time_pattern = re.search(r'(\d{1,2}):?(\d{2})?\s*(am|pm|AM|PM)?', recent_user_text)
+        if (time_pattern or any(word in recent_user_text for word in
+                                ["arrived", "came", "reached", "started", "clocked", "entered", "early", "before"])):
+            tracker["established_facts"].add("stated_arrival_time")
+        if any(word in recent_user_text for word in ["supervisor", "manager", "team lead", "organized", "lead", "headed", "colleague", "coworker"]):
+            tracker["established_facts"].add("mentioned_organizer")
+        if any(word in recent_user_text for word in ["minutes", "hours", "duration", "lasted", "until", "from", "about"]):
+            tracker["established_facts"].add("provided_duration")
+        if any(word in recent_user_text for word in ["topic", "about", "purpose", "discuss", "agenda", "subject", "work", "preparation"]):
+            tracker["established_facts"].add("mentioned_purpose")
+        if any(word in recent_user_text for word in ["glitch", "error", "technical", "issue", "problem", "malfunction", "wrong", "incorrect", "faulty"]):
+            tracker["established_facts"].add("explained_phone_discrepancy")
+            tracker["unresolved_issues"].discard("phone_vs_edited_discrepancy")
+        state["established_facts"] = list(tracker["established_facts"])
+        state["unresolved_issues"] = list(tracker["unresolved_issues"])
+
+        phone_time = self.standardize_time_format(agent_context.get('phone', {}).get('start_time', ''))
+        system_time = self.standardize_time_format(agent_context.get('system', {}).get('start_time', ''))
+        edited_time = self.standardize_time_format(agent_context.get('agent_disputed', {}).get('start_time', ''))
+        phone_edited_diff = self.get_time_difference(phone_time, edited_time)
+        if (phone_edited_diff is not None and phone_edited_diff > 0 and
+                "explained_phone_discrepancy" not in tracker["established_facts"]):
+            tracker["unresolved_issues"].add("phone_vs_edited_discrepancy")
+        system_edited_diff = self.get_time_difference(system_time, edited_time)
+        if system_edited_diff is not None and system_edited_diff > 0 and "explained_system_discrepancy" not in tracker["established_facts"]:
+            tracker["unresolved_issues"].add("system_vs_edited_discrepancy")
+        for fact in ["was_in_activity", "stated_arrival_time", "mentioned_organizer", "provided_duration", "mentioned_purpose"]:
+            if fact not in state["established_facts"]:
+                state["remaining_questions"].append(fact)
+        state["quality_score"] = len(state["established_facts"]) * 20
+        return state
+
+    def should_end_conversation(self, conversation_state, recent_user_input=""):
+        recent_lower = recent_user_input.lower()
+        return any(word in recent_lower for word in ["yes", "correct", "accurate", "confirm", "right", "true", "yeah", "yep"])
+
+    def generate_conversation_summary(self, messages, agent_context):
+        user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
+        assistant_messages = [msg["content"] for msg in messages if msg["role"] == "assistant"]
+        key_points = []
+        for user_msg, assistant_msg in zip(user_messages, assistant_messages):
+            user_lower = user_msg.lower()
+            time_match = re.search(r'(\d{1,2}):?(\d{2})?\s*(am|pm|AM|PM)?', user_msg)
+            if time_match and "arrival time" not in str(key_points).lower():
+                key_points.append(f"Arrival time: {time_match.group(1)}:{time_match.group(2) or '00'}")
+            if any(word in user_lower for word in ["meeting", "conference", "briefing"]):
+                key_points.append("Reason: Scheduled meeting")
+            elif any(word in user_lower for word in ["glitch", "error", "technical", "system wrong"]):
+                key_points.append("Reason: Technical/system issues")
+            elif any(word in user_lower for word in ["early", "before time", "arrived early"]):
+                key_points.append("Reason: Early arrival for preparation")
+            if any(word in user_lower for word in ["work", "preparation", "routine", "task"]):
+                if "Activities:" not in str(key_points):
+                    key_points.append("Activities: Work-related tasks")
+            if any(word in user_lower for word in ["no one", "nobody", "alone", "verify"]):
+                key_points.append("Verification: No witnesses mentioned")
+            elif any(word in user_lower for word in ["supervisor", "manager", "colleague", "team"]):
+                key_points.append("Verification: Colleagues involved")
+        return "\n".join(key_points)
+
+    def generate_contextual_followup(self, user_input, tracker, agent_context):
+        if not user_input:
+            return None
+        user_input_lower = user_input.lower()
+        for pattern, questions in self.contextual_followups.items():
+            if re.search(pattern, user_input_lower):
+                for q in questions:
+                    if not any(self.are_questions_similar(q, asked_q) for asked_q in tracker["asked_questions"]):
+                        return q
+        return None
+
+    def are_questions_similar(self, question1, question2):
+        if not question1 or not question2:
+            return False
+        q1_lower = question1.lower()
+        q2_lower = question2.lower()
+        for phrase in ["what.*activity", "work.*related", "personal", "who.*verify", "anyone.*verify", "witness",
+                       "how.*track", "track.*work", "record.*time", "what.*routine", "daily.*routine",
+                       "morning.*routine", "technical.*issue", "system.*wrong", "phone.*wrong"]:
+            if re.search(phrase, q1_lower) and re.search(phrase, q2_lower):
+                return True
+        return False
+
+
+def run_interview(manager, similar, turns):
+    """One scripted interview; returns seconds spent in the heuristics"""
+    messages = [{"role": "assistant", "content": "Why did you edit your start time?"}]
+    asked = []
+    started = time.perf_counter()
+    for turn in range(turns):
+        user_text = USER_TURNS[turn % len(USER_TURNS)]
+        messages.append({"role": "user", "content": user_text})
+        state = manager.analyze_conversation_state(messages, AGENT_CONTEXT, "bench")
+        manager.should_end_conversation(state, user_text)
+        question = manager.generate_contextual_followup(user_text, {"asked_questions": asked}, AGENT_CONTEXT)
+        question = question or "What else happened?"
+        any(similar(prev["content"], question) for prev in messages if prev["role"] == "assistant")
+        asked.append(question)
+        messages.append({"role": "assistant", "content": question})
+    manager.generate_conversation_summary(messages, AGENT_CONTEXT)
+    return time.perf_counter() - started
+
+
+def measure(label, make_manager, similar, turns, repeat):
+    total = 0.0
+    for _ in range(repeat):
+        total += run_interview(make_manager(), similar, turns)
+    per_turn_us = total / (repeat * turns) * 1e6
+    print(f"{label:<28} {per_turn_us:9.2f} us/turn")
+    return per_turn_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    before = measure("before (substring scans)", LegacyConversationManager, legacy_is_similar_question, args.turns, args.repeat)
+    after = measure("after (compiled matcher)", ConversationManager, is_similar_question, args.turns, args.repeat)
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Local OpenAI-compatible /v1/chat/completions stub with configurable latency.
+
+Stands in for Ollama during load tests, so results measure the backend rather
+than the model. Replies are short questions, streamed as SSE when "stream" is set.
+
+    python benchmarks/fake_llm.py [--port 11435] [--latency-ms 300] [--jitter-ms 100] [--error-rate 0]
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLIES = [
+    "What were you doing before your scheduled start time?",
+    "Who else was present at that time and could confirm it?",
+    "How did you record your arrival time that morning?",
+    "Was that activity related to your work duties?",
+    "Can you explain why the system time differs from your edit?"
+]
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=300, jitter_ms=100, error_rate=0.0, token_delay_ms=10):
+        super().__init__(address, FakeLLMHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.token_delay_ms = token_delay_ms
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def delay(self):
+        return max(0.0, random.gauss(self.latency_ms, self.jitter_ms) / 1000) if self.jitter_ms else self.latency_ms / 1000
+
+    def count(self, failed):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(failed)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate
+        }
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            payload = {}
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        server = self.server
+        time.sleep(server.delay())
+        if random.random() < server.error_rate:
+            server.count(failed=True)
+            self._send_json(500, {"error": {"message": "injected failure"}})
+            return
+        server.count(failed=False)
+
+        reply = random.choice(REPLIES)
+        model = payload.get("model", "fake")
+        if not payload.get("stream"):
+            self._send_json(200, {
+                "id": "fake-completion",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}]
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in reply.split(" "):
+            chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}], "model": model}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(server.token_delay_ms / 1000)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def start_fake_llm(host="127.0.0.1", port=0, **options):
+    """Start the stub on a background thread; port=0 picks a free port. Returns the server."""
+    server = FakeLLMServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeLLMServer((args.host, args.port), latency_ms=args.latency_ms,
+                           jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    print(f"Fake LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
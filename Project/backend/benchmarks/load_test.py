@@ -0,0 +1,246 @@
+"""Concurrent interview load test for the backend, against a fake LLM and a throwaway database.
+
+Writes a synthetic data.json with --agents agents to a temp directory, starts
+benchmarks/fake_llm.py in-process and app.py as a subprocess pointed at both, then
+runs --interviews scripted interviews, --concurrency at a time. Each interview is
+/initialize_session, --turns delta-mode /chat_with_ai calls, /sessions and
+/sessions/<id>.
+
+Prints (or writes to --output) per-route latency percentiles, throughput and error
+rate as JSON; --compare baseline.json adds the change against an earlier run.
+
+    python benchmarks/load_test.py [--agents 2000] [--concurrency 16] [--interviews 200] [--turns 6]
+        [--llm-latency-ms 300] [--output run.json] [--compare baseline.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm import start_fake_llm
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER_TURNS = [
+    "I arrived early at 8:20 because we had a team meeting",
+    "My supervisor organized it, the team lead was there too",
+    "It lasted about 40 minutes and was about the new schedule",
+    "The phone had a glitch, the system is wrong about my time",
+    "Nobody else can verify, it was just my daily routine",
+    "I was preparing my work station and checking emails",
+    "The building security face scan should show when I entered",
+    "Yes that is correct and accurate"
+]
+
+ROUTES = ("/initialize_session", "/chat_with_ai", "/sessions", "/sessions/<id>")
+
+
+def clock(minutes):
+    hour, minute = divmod(minutes, 60)
+    period = "AM" if hour < 12 else "PM"
+    return f"10/15/2025 {(hour - 1) % 12 + 1}:{minute:02d}:00 {period}"
+
+
+def write_roster(path, count, seed=7):
+    """Synthetic data.json: 9 AM - 5 PM schedules with system, phone and disputed starts scattered around it"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write('{"agents": [\n')
+        for i in range(count):
+            start = 9 * 60
+            agent = {
+                "agent_id": f"A{i:05d}",
+                "name": f"Agent {i}",
+                "schedule": {"start_time": clock(start), "end_time": clock(17 * 60)},
+                "system": {"start_time": clock(start + rng.randint(-10, 60)), "end_time": clock(17 * 60 + 5)},
+                "phone": {"start_time": clock(start - rng.randint(0, 60)), "end_time": clock(17 * 60 + 2)},
+                "agent_disputed": {"start_time": clock(start - rng.randint(0, 45)), "end_time": clock(17 * 60)}
+            }
+            f.write(("," if i else "") + json.dumps(agent) + "\n")
+        f.write("]}\n")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(workdir, data_path, llm_url, port):
+    env = dict(
+        os.environ,
+        SESSIONS_DB_PATH=os.path.join(workdir, "sessions.db"),
+        DATA_JSON_PATH=data_path,
+        OPENAI_API_BASE=llm_url,
+        BACKEND_HOST="127.0.0.1",
+        BACKEND_PORT=str(port),
+        FLASK_DEBUG="0",
+        PYTHONUNBUFFERED="1"
+    )
+    log = open(os.path.join(workdir, "backend.log"), "w")
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"backend exited with {process.returncode}, see {log.name}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"backend did not become healthy, see {log.name}")
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {route: [] for route in ROUTES}
+        self.errors = {route: 0 for route in ROUTES}
+        self._lock = threading.Lock()
+
+    def call(self, client, route, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.samples[route].append(elapsed)
+            self.errors[route] += int(not ok)
+        return response if ok else None
+
+
+def run_interview(client, recorder, agent_name, turns):
+    response = recorder.call(client, "/initialize_session", "POST", "/initialize_session",
+                             json={"agent_name": agent_name})
+    if response is None:
+        return
+    session_id = response.json().get("session_id")
+    for text in USER_TURNS[:turns]:
+        recorder.call(client, "/chat_with_ai", "POST", "/chat_with_ai",
+                      json={"message": text, "session_id": session_id, "agent_name": agent_name})
+    recorder.call(client, "/sessions", "GET", "/sessions", params={"limit": 20})
+    recorder.call(client, "/sessions/<id>", "GET", f"/sessions/{session_id}")
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return round(ordered[index], 2)
+
+
+def summarize(samples, errors, duration):
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "p50_ms": percentile(ordered, 0.50),
+        "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99),
+        "mean_ms": round(sum(ordered) / count, 2) if count else None,
+        "max_ms": round(ordered[-1], 2) if count else None,
+        "throughput_rps": round(count / duration, 2) if duration else None
+    }
+
+
+def compare(current, baseline):
+    """Relative change per route for the latency and throughput figures; positive means larger"""
+    result = {}
+    for route, stats in current["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before:
+            continue
+        result[route] = {
+            key: round((stats[key] - before[key]) / before[key], 4)
+            for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "error_rate")
+            if stats.get(key) is not None and before.get(key)
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, default=2000, help="agents in the synthetic data.json")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--interviews", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=6, help=f"chat turns per interview (max {len(USER_TURNS)})")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60, help="per-request client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    llm = start_fake_llm(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+                         error_rate=args.llm_error_rate)
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        data_path = os.path.join(workdir, "data.json")
+        write_roster(data_path, args.agents, seed=args.seed)
+        process, base_url = start_backend(workdir, data_path, llm.base_url, free_port())
+        try:
+            rng = random.Random(args.seed)
+            names = [f"Agent {rng.randrange(args.agents)}" for _ in range(args.interviews)]
+            recorder = Recorder()
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            with httpx.Client(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                    for future in [pool.submit(run_interview, client, recorder, name, args.turns) for name in names]:
+                        future.result()
+                duration = time.perf_counter() - started
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+            llm.shutdown()
+
+    all_samples = [s for samples in recorder.samples.values() for s in samples]
+    report = {
+        "config": {
+            "agents": args.agents,
+            "concurrency": args.concurrency,
+            "interviews": args.interviews,
+            "turns": args.turns,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "llm_error_rate": args.llm_error_rate
+        },
+        "duration_s": round(duration, 3),
+        "routes": {route: summarize(recorder.samples[route], recorder.errors[route], duration) for route in ROUTES},
+        "overall": summarize(all_samples, sum(recorder.errors.values()), duration),
+        "llm": llm.stats()
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report["compared_to"] = {"path": args.compare, "change": compare(report, json.load(f))}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import time
+import threading
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker over a rolling window of recent calls.
+
+    The circuit opens once at least min_calls of the last window_size calls have
+    been recorded and the failure rate reaches failure_rate_threshold. While open,
+    allow() returns False without touching the backend. After open_seconds one
+    probe call is let through (half-open): success closes the circuit, failure
+    opens it again. neutral_exceptions say nothing about the backend's health
+    (the call was refused before reaching it) and count as neither.
+    """
+
+    def __init__(self, failure_rate_threshold=0.5, min_calls=5, window_size=20, open_seconds=30.0,
+                 neutral_exceptions=()):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.neutral_exceptions = tuple(neutral_exceptions)
+        self._results = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started = None
+        self.opened_count = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    def _failure_rate(self):
+        if not self._results:
+            return 0.0
+        return self._results.count(False) / len(self._results)
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+        self.opened_count += 1
+        print(f"LLM circuit opened (failure rate {self._failure_rate():.0%})")
+
+    def allow(self):
+        """True if a call may go to the backend now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probe_started = None
+            if self.state == HALF_OPEN:
+                # a probe that never reported back (e.g. an abandoned stream) is replaced after open_seconds
+                if self._probe_started is None or now - self._probe_started >= self.open_seconds:
+                    self._probe_started = now
+                    return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._results.append(True)
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._results.clear()
+                self._probe_started = None
+                print("LLM circuit closed")
+
+    def release_probe(self):
+        """Let another caller probe a half-open circuit when this one did not reach the backend"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._results.append(False)
+            if self.state == HALF_OPEN:
+                self._open()
+            elif (self.state == CLOSED and len(self._results) >= self.min_calls and
+                  self._failure_rate() >= self.failure_rate_threshold):
+                self._open()
+
+    def call(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError("LLM circuit is open")
+        try:
+            result = func(*args, **kwargs)
+        except self.neutral_exceptions:
+            self.release_probe()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError("LLM circuit is open")
+        try:
+            result = await func(*args, **kwargs)
+        except self.neutral_exceptions:
+            self.release_probe()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            state = self.state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN
+            return {
+                "state": state,
+                "failure_rate": round(self._failure_rate(), 4),
+                "window_calls": len(self._results),
+                "opened_count": self.opened_count,
+                "rejected": self.rejected,
+                "successes": self.successes,
+                "failures": self.failures
+            }
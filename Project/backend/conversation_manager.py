@@ -0,0 +1,387 @@
+import re
+
+from keyword_matcher import KeywordMatcher, PatternSet
+from time_values import TimeValue, parse_time, display_time, minutes_between
+from tracker_store import TrackerStore
+
+DIGIT_PATTERN = re.compile(r'\d')
+TIME_PATTERN = re.compile(r'(\d{1,2}):?(\d{2})?\s*(am|pm|AM|PM)?')
+# first line of the closing message, which marks a conversation as complete
+SUMMARY_HEADER = "CONVERSATION SUMMARY:"
+
+
+class ConversationManager:
+    # facts established from the agent's answers
+    fact_keywords = {
+        "was_in_activity": ["meeting", "training", "session", "conference", "briefing", "workshop"],
+        "stated_arrival_time": ["arrived", "came", "reached", "started", "clocked", "entered", "early", "before"],
+        "mentioned_organizer": ["supervisor", "manager", "team lead", "organized", "lead", "headed", "colleague", "coworker"],
+        "provided_duration": ["minutes", "hours", "duration", "lasted", "until", "from", "about"],
+        "mentioned_purpose": ["topic", "about", "purpose", "discuss", "agenda", "subject", "work", "preparation"],
+        "explained_phone_discrepancy": ["glitch", "error", "technical", "issue", "problem", "malfunction", "wrong", "incorrect", "faulty"]
+    }
+    # key points for the closing summary
+    summary_keywords = {
+        "reason_meeting": ["meeting", "conference", "briefing"],
+        "reason_technical": ["glitch", "error", "technical", "system wrong"],
+        "reason_early": ["early", "before time", "arrived early"],
+        "activities": ["work", "preparation", "routine", "task"],
+        "no_witness": ["no one", "nobody", "alone", "verify"],
+        "colleagues": ["supervisor", "manager", "colleague", "team"]
+    }
+    confirmation_words = ["yes", "correct", "accurate", "confirm", "right", "true", "yeah", "yep"]
+    keyword_matcher = KeywordMatcher({**fact_keywords, **summary_keywords, "confirmation": confirmation_words})
+    similar_question_patterns = PatternSet([
+        "what.*activity", "work.*related", "personal",
+        "who.*verify", "anyone.*verify", "witness",
+        "how.*track", "track.*work", "record.*time",
+        "what.*routine", "daily.*routine", "morning.*routine",
+        "technical.*issue", "system.*wrong", "phone.*wrong"
+    ])
+
+    def __init__(self, tracker_store=None, time_source=None):
+        self.time_value = time_source or parse_time
+        self.question_sequences = {
+            "initial": "Why did you edit your start time from {system_start} to {edited_start}?",
+            "followup_1": "You mentioned arriving early. What specific activities were you engaged in before your scheduled start time?",
+            "followup_2": "Were these activities work-related or personal?",
+            "followup_3": "Is there anyone who can verify your early arrival time?",
+            "followup_4": "I notice your phone shows {phone_start} but you mentioned {claimed_start}. Can you explain this {difference} minute difference?",
+            "followup_5": "How do you typically track your work hours when you arrive early?",
+            "verification": "To confirm: You {activity_description}. Is this complete and accurate?"
+        }
+        self.asked_questions_tracker = tracker_store if tracker_store is not None else TrackerStore()
+        self.contextual_followups = {
+            "system.*wrong|phone.*wrong": [
+                "What makes you think the system and phone recordings are incorrect?",
+                "How did you determine your actual start time if both system and phone are wrong?",
+                "Do you have any other way to verify your arrival time?"
+            ],
+            "daily routine|normal routine|regular routine": [
+                "Could you describe what your daily routine involves when you first arrive?",
+                "What specific tasks are part of your morning routine at the office?",
+                "When you say 'daily routine', what work activities does that typically include?"
+            ],
+            "not specific|nothing specific|just routine": [
+                "Let me be more specific - were you checking emails, preparing equipment, or something else?",
+                "What's the first work-related task you typically complete when you arrive early?",
+                "Could you give an example of what you might do during this early arrival time?"
+            ],
+            "security|face scan|building.*enter": [
+                "Does the building security system provide any timestamp confirmation of your arrival?",
+                "If you use face scan for tracking, why do you think it didn't record your early arrival?",
+                "Can the security system logs verify your entry time?"
+            ],
+            "no one|nobody|alone": [
+                "Since no one was present, how do you typically document your early start times for record-keeping?",
+                "What process do you follow to ensure early arrivals are properly recorded when working alone?",
+                "Do you use any digital tools or apps to track your time when arriving before others?"
+            ],
+            "meeting|conference|briefing": [
+                "Who organized this meeting and what was its purpose?",
+                "Was this meeting scheduled in advance or was it impromptu?",
+                "How long did the meeting last and who else attended?"
+            ],
+            "glitch|error|technical|issue|problem": [
+                "Have you experienced similar technical issues with the time tracking system before?",
+                "Did you report this technical issue to IT or your supervisor?",
+                "What steps did you take to address the technical problem you mentioned?"
+            ],
+            "early|before.*time|arrived.*early": [
+                "What was the reason for arriving early today specifically?",
+                "Did you have any urgent tasks that required early preparation?",
+                "Is arriving early part of your regular schedule or was this unusual?"
+            ]
+        }
+        self.followup_patterns = PatternSet(list(self.contextual_followups))
+
+    def static_questions(self):
+        """Questions that need no agent-specific formatting, used to warm the response cache"""
+        questions = [q for q in self.question_sequences.values() if "{" not in q]
+        for followups in self.contextual_followups.values():
+            questions.extend(followups)
+        return list(dict.fromkeys(questions))
+
+    def standardize_time_format(self, time_str):
+        """Convert many time formats to consistent h:mm:ss AM/PM or return 'unknown'."""
+        return display_time(self.time_value(time_str))
+
+    def context_time(self, agent_context, source, field="start_time"):
+        """Parsed time for one of the agent's sources ('system', 'phone', 'agent_disputed', ...)"""
+        return self.time_value(agent_context.get(source, {}).get(field, ''))
+
+    def get_time_difference(self, time1, time2):
+        """Calculate time difference in minutes between two times (TimeValues or strings). Returns int or None."""
+        if not isinstance(time1, TimeValue):
+            time1 = self.time_value(time1)
+        if not isinstance(time2, TimeValue):
+            time2 = self.time_value(time2)
+        return minutes_between(time1, time2)
+
+    def analyze_conversation_state(self, messages, agent_context, session_id):
+        """Analyze current conversation state and determine next action"""
+        user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
+        assistant_messages = [msg["content"] for msg in messages if msg["role"] == "assistant"]
+        
+        question_count = sum(1 for msg in assistant_messages if msg.strip().endswith('?'))
+        
+        tracker = self.asked_questions_tracker.get_or_create(session_id, refresh=True)
+        
+        state = {
+            "established_facts": list(tracker["established_facts"]),
+            "unresolved_issues": list(tracker["unresolved_issues"]),
+            "remaining_questions": [],
+            "conversation_stage": "initial",
+            "quality_score": 0,
+            "question_count": question_count,
+            "last_question_asked": assistant_messages[-1] if assistant_messages else "",
+            "asked_questions": tracker["asked_questions"]
+        }
+
+        # Facts are sticky, so each user message only has to be analyzed once: activity words count
+        # anywhere in the history, the other facts only within the last three user messages. The
+        # only multi-word fact keyword, "team lead", implies "lead", so matching per message equals
+        # matching the joined text.
+        offset = min(tracker.get("analyzed_messages", 0), len(user_messages))
+        new_categories = [self.keyword_matcher.categories(msg) for msg in user_messages[offset:]]
+        recent_start = max(offset, len(user_messages) - 3)
+        all_user_categories = frozenset().union(*new_categories)
+        recent_user_categories = frozenset().union(*new_categories[recent_start - offset:])
+        tracker["analyzed_messages"] = max(tracker.get("analyzed_messages", 0), len(user_messages))
+
+        if "was_in_activity" in all_user_categories:
+            tracker["established_facts"].add("was_in_activity")
+        
+        if (any(DIGIT_PATTERN.search(msg) for msg in user_messages[recent_start:]) or
+            "stated_arrival_time" in recent_user_categories):
+            tracker["established_facts"].add("stated_arrival_time")
+        
+        for fact in ("mentioned_organizer", "provided_duration", "mentioned_purpose"):
+            if fact in recent_user_categories:
+                tracker["established_facts"].add(fact)
+        
+        if "explained_phone_discrepancy" in recent_user_categories:
+            tracker["established_facts"].add("explained_phone_discrepancy")
+            tracker["unresolved_issues"].discard("phone_vs_edited_discrepancy")
+
+        state["established_facts"] = list(tracker["established_facts"])
+        state["unresolved_issues"] = list(tracker["unresolved_issues"])
+
+        phone_time = self.context_time(agent_context, 'phone')
+        system_time = self.context_time(agent_context, 'system')
+        edited_time = self.context_time(agent_context, 'agent_disputed')
+
+        phone_edited_diff = minutes_between(phone_time, edited_time)
+        if (phone_edited_diff is not None and phone_edited_diff > 0 and 
+            "explained_phone_discrepancy" not in tracker["established_facts"]):
+            tracker["unresolved_issues"].add("phone_vs_edited_discrepancy")
+
+        system_edited_diff = minutes_between(system_time, edited_time)
+        if system_edited_diff is not None and system_edited_diff > 0 and "explained_system_discrepancy" not in tracker["established_facts"]:
+            tracker["unresolved_issues"].add("system_vs_edited_discrepancy")
+
+        required_facts = ["was_in_activity", "stated_arrival_time", "mentioned_organizer", "provided_duration", "mentioned_purpose"]
+        for fact in required_facts:
+            if fact not in state["established_facts"]:
+                state["remaining_questions"].append(fact)
+
+        state["quality_score"] = len(state["established_facts"]) * 20
+
+        if len(state["established_facts"]) >= 4 and len(state["unresolved_issues"]) == 0:
+            state["conversation_stage"] = "verification"
+        elif len(state["established_facts"]) >= 2:
+            state["conversation_stage"] = "investigation"
+        else:
+            state["conversation_stage"] = "initial"
+
+        return state
+
+    def build_activity_description(self, conversation_state, agent_context):
+        """Build a summary description for verification"""
+        parts = []
+
+        if "was_in_activity" in conversation_state["established_facts"]:
+            parts.append("were engaged in preparatory work activities")
+
+        edited_time = self.context_time(agent_context, 'agent_disputed')
+        if edited_time is not None:
+            parts.append(f"starting at {edited_time.display()}")
+
+        if "provided_duration" in conversation_state["established_facts"]:
+            parts.append("prior to your scheduled start time")
+
+        return " ".join(parts) if parts else "arrived early and were engaged in work activities"
+
+    def should_end_conversation(self, conversation_state, recent_user_input=""):
+        """Determine if conversation should end based on completeness"""
+        if conversation_state.get("question_count", 0) >= 5:
+            return True
+        if conversation_state["conversation_stage"] == "verification":
+            if "confirmation" in self.keyword_matcher.categories(recent_user_input):
+                return True
+
+        if conversation_state["quality_score"] >= 60 and len(conversation_state["unresolved_issues"]) == 0:
+            return True
+
+        return False
+
+    def summary_key_points(self, messages):
+        """Key points from the agent's answers, in order of first mention"""
+        user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
+        assistant_messages = [msg["content"] for msg in messages if msg["role"] == "assistant"]
+        
+        key_points = []
+        arrival_recorded = False
+        activities_recorded = False
+        
+        for user_msg, assistant_msg in zip(user_messages, assistant_messages):
+            found = self.keyword_matcher.categories(user_msg)
+            
+            time_match = TIME_PATTERN.search(user_msg)
+            if time_match and not arrival_recorded:
+                hour = time_match.group(1)
+                minute = time_match.group(2) or '00'
+                period = (time_match.group(3) or 'AM').upper()
+                key_points.append(f"Arrival time: {hour}:{minute} {period}")
+                arrival_recorded = True
+            
+            if "reason_meeting" in found:
+                key_points.append("Reason: Scheduled meeting")
+            elif "reason_technical" in found:
+                key_points.append("Reason: Technical/system issues")
+            elif "reason_early" in found:
+                key_points.append("Reason: Early arrival for preparation")
+            
+            if "activities" in found and not activities_recorded:
+                key_points.append("Activities: Work-related tasks")
+                activities_recorded = True
+            
+            if "no_witness" in found:
+                key_points.append("Verification: No witnesses mentioned")
+            elif "colleagues" in found:
+                key_points.append("Verification: Colleagues involved")
+        
+        return list(dict.fromkeys(key_points))
+
+    def generate_conversation_summary(self, messages, agent_context):
+        """Generate a dynamic summary based on actual conversation content"""
+        unique_key_points = self.summary_key_points(messages)
+
+        edited_start = self.context_time(agent_context, 'agent_disputed')
+        system_start = self.context_time(agent_context, 'system')
+        
+        summary_lines = [SUMMARY_HEADER]
+        
+        if edited_start is not None and system_start is not None:
+            time_diff = minutes_between(edited_start, system_start)
+            if time_diff:
+                summary_lines.append(f"Time edit: {system_start.display()} → {edited_start.display()} ({time_diff} min difference)")
+        
+        summary_lines.extend(unique_key_points[-4:]) 
+        
+        summary_lines.append("Information recorded for review.")
+        
+        return "\n".join(summary_lines)
+
+    def generate_intelligent_question(self, conversation_state, agent_context, recent_user_input="", session_id=""):
+        """Generate contextual questions that follow the conversation flow"""
+        
+        if conversation_state["conversation_stage"] == "verification":
+            activity_desc = self.build_activity_description(conversation_state, agent_context)
+            return self.question_sequences["verification"].format(activity_description=activity_desc)
+
+        if conversation_state.get("question_count", 0) >= 5:
+            return "SUMMARY_REQUEST"
+
+        tracker = self.asked_questions_tracker.get(session_id, {"asked_questions": []})
+        
+        contextual_question = self.generate_contextual_followup(recent_user_input, tracker, agent_context)
+        
+        if contextual_question:
+            tracker["asked_questions"].append(contextual_question)
+            return contextual_question
+
+        return self.generate_fallback_question(conversation_state, agent_context, session_id)
+
+    def generate_contextual_followup(self, user_input, tracker, agent_context):
+        """Generate a question that directly follows from the user's last response"""
+        
+        if not user_input:
+            return None
+            
+        matched = self.followup_patterns.matches(user_input)
+        
+        for index, questions in enumerate(self.contextual_followups.values()):
+            if index in matched:
+                available_questions = []
+                for q in questions:
+                    question_already_asked = False
+                    for asked_q in tracker["asked_questions"]:
+                        if self.are_questions_similar(q, asked_q):
+                            question_already_asked = True
+                            break
+                    if not question_already_asked:
+                        available_questions.append(q)
+                
+                if available_questions:
+                    return available_questions[0]
+        
+        return None
+
+    def are_questions_similar(self, question1, question2):
+        """Check if two questions are similar in meaning"""
+        if not question1 or not question2:
+            return False
+            
+        patterns = self.similar_question_patterns
+        return not patterns.matches(question1).isdisjoint(patterns.matches(question2))
+
+    def generate_fallback_question(self, conversation_state, agent_context, session_id):
+        """Fallback to the original logic if no contextual question fits"""
+        tracker = self.asked_questions_tracker.get(session_id, {"asked_questions": []})
+        asked_questions = tracker["asked_questions"]
+
+        if ("phone_vs_edited_discrepancy" in conversation_state["unresolved_issues"] and
+            not any("phone shows" in q.lower() for q in asked_questions)):
+            
+            phone_time = self.context_time(agent_context, 'phone')
+            edited_time = self.context_time(agent_context, 'agent_disputed')
+            difference = minutes_between(phone_time, edited_time) or 'some'
+            
+            question = self.question_sequences["followup_4"].format(
+                phone_start=display_time(phone_time),
+                claimed_start=display_time(edited_time),
+                difference=difference
+            )
+            tracker["asked_questions"].append(question)
+            return question
+
+        if (not any("why did you edit" in q.lower() for q in asked_questions) and
+            "stated_arrival_time" not in conversation_state["established_facts"]):
+            
+            system_start = self.context_time(agent_context, 'system')
+            edited_start = self.context_time(agent_context, 'agent_disputed')
+            
+            if system_start is not None and edited_start is not None:
+                question = self.question_sequences["initial"].format(
+                    system_start=system_start.display(),
+                    edited_start=edited_start.display()
+                )
+                tracker["asked_questions"].append(question)
+                return question
+
+        question_flow = [
+            ("was_in_activity", self.question_sequences["followup_1"]),
+            ("mentioned_purpose", self.question_sequences["followup_2"]),
+            ("mentioned_organizer", self.question_sequences["followup_3"]),
+            ("provided_duration", self.question_sequences["followup_5"])
+        ]
+
+        for fact_key, question_template in question_flow:
+            if (fact_key not in conversation_state["established_facts"] and
+                not any(question_template.split('?')[0].lower() in q.lower() for q in asked_questions)):
+                
+                tracker["asked_questions"].append(question_template)
+                return question_template
+
+        return "SUMMARY_REQUEST"
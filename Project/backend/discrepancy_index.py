@@ -0,0 +1,242 @@
+from time_values import TimeValue, display_time
+
+# NumPy costs ~90ms to import, so it is loaded with the first index rather than with this module
+np = None
+_numpy_loaded = False
+
+
+def _load_numpy():
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        _numpy_loaded = True
+    return np
+
+SCENARIOS = (
+    "large_discrepancy_both",
+    "system_vs_edited_large",
+    "significant_edit",
+    "phone_supports_edit",
+    "moderate_edit",
+    "phone_disagrees",
+    "missing_system_time",
+    "missing_phone_time",
+    "general_inquiry",
+)
+SCENARIO_CODES = {name: code for code, name in enumerate(SCENARIOS)}
+
+SORT_KEYS = ("diff", "phone_diff", "phone_edited_diff", "name")
+
+
+def classify_scenario(system_known, phone_known, edited_known, start_time_diff, phone_system_diff, phone_edited_diff):
+    """Scenario for one agent; a zero or missing difference counts as no difference"""
+    if not system_known and edited_known:
+        return "missing_system_time"
+
+    if not phone_known and edited_known:
+        return "missing_phone_time"
+
+    if start_time_diff and start_time_diff > 30:
+        if phone_edited_diff and phone_edited_diff > 15:
+            return "large_discrepancy_both"
+        elif phone_system_diff and phone_system_diff < 5:
+            return "system_vs_edited_large"
+        else:
+            return "significant_edit"
+
+    elif start_time_diff and start_time_diff > 15:
+        if phone_edited_diff and phone_edited_diff < 10:
+            return "phone_supports_edit"
+        else:
+            return "moderate_edit"
+
+    elif phone_known and phone_edited_diff and phone_edited_diff > 20:
+        return "phone_disagrees"
+
+    else:
+        return "general_inquiry"
+
+
+class DiscrepancyIndex:
+    """Start-time differences and scenario for every agent in a roster, built once per import.
+
+    rows are (row id, system, phone, edited start seconds) in ascending row id order,
+    with None for a missing time. Only these numbers are held; describe(row_ids)
+    returns {row id: (agent_id, name)} for the agents on a page, and name_order()
+    the row ids sorted by name, both answered by the database.
+
+    Differences are in minutes; -1 marks a missing one. Columns are NumPy arrays when
+    available, lists otherwise, with one cached ordering per sort key and direction,
+    so a query is a filter over an already sorted order plus a slice.
+    """
+
+    def __init__(self, rows, describe, name_order):
+        self.describe = describe
+        self.name_order = name_order
+        self.ids = [row[0] for row in rows]
+        self.seconds = [tuple(s if s is not None else -1 for s in row[1:4]) for row in rows]
+        minutes = [[s // 60 if s >= 0 else -1 for s in row] for row in self.seconds]
+        self._orders = {}
+
+        self.vectorized = _load_numpy() is not None and bool(rows)
+        if self.vectorized:
+            self.ids = np.array(self.ids, dtype=np.int64)
+            self.seconds = np.array(self.seconds, dtype=np.int64).reshape(-1, 3)
+        if self.vectorized:
+            self._build_vectorized(minutes)
+        else:
+            self._build_python(minutes)
+        self._order("diff", True)
+
+        if self.vectorized:
+            counts = np.bincount(self.scenario, minlength=len(SCENARIOS)).tolist()
+        else:
+            counts = [self.scenario.count(code) for code in range(len(SCENARIOS))]
+        self.scenario_counts = dict(zip(SCENARIOS, counts))
+
+    def _build_vectorized(self, minutes):
+        m = np.array(minutes, dtype=np.int64).reshape(-1, 3)
+        system, phone, edited = m[:, 0], m[:, 1], m[:, 2]
+        system_known, phone_known, edited_known = system >= 0, phone >= 0, edited >= 0
+
+        def diff(a, a_known, b, b_known):
+            return np.where(a_known & b_known, np.abs(a - b), -1)
+
+        start = diff(edited, edited_known, system, system_known)
+        phone_system = diff(phone, phone_known, system, system_known)
+        phone_edited = diff(phone, phone_known, edited, edited_known)
+
+        # np.select takes the first matching condition, mirroring classify_scenario's if/elif chain
+        conditions = [
+            ~system_known & edited_known,
+            ~phone_known & edited_known,
+            (start > 30) & (phone_edited > 15),
+            (start > 30) & (phone_system > 0) & (phone_system < 5),
+            start > 30,
+            (start > 15) & (phone_edited > 0) & (phone_edited < 10),
+            start > 15,
+            phone_known & (phone_edited > 20),
+        ]
+        choices = [SCENARIO_CODES[name] for name in (
+            "missing_system_time", "missing_phone_time", "large_discrepancy_both", "system_vs_edited_large",
+            "significant_edit", "phone_supports_edit", "moderate_edit", "phone_disagrees")]
+        self.scenario = np.select(conditions, choices, default=SCENARIO_CODES["general_inquiry"])
+        self.start_diff = start
+        self.phone_system_diff = phone_system
+        self.phone_edited_diff = phone_edited
+
+    def _build_python(self, minutes):
+        def diff(a, b):
+            return abs(a - b) if a >= 0 and b >= 0 else -1
+
+        self.scenario = []
+        self.start_diff = []
+        self.phone_system_diff = []
+        self.phone_edited_diff = []
+        for system, phone, edited in minutes:
+            start, phone_system, phone_edited = diff(edited, system), diff(phone, system), diff(phone, edited)
+            self.start_diff.append(start)
+            self.phone_system_diff.append(phone_system)
+            self.phone_edited_diff.append(phone_edited)
+            self.scenario.append(SCENARIO_CODES[classify_scenario(
+                system >= 0, phone >= 0, edited >= 0,
+                start if start >= 0 else None,
+                phone_system if phone_system >= 0 else None,
+                phone_edited if phone_edited >= 0 else None,
+            )])
+
+    def _column(self, sort):
+        return {
+            "diff": self.start_diff,
+            "phone_diff": self.phone_system_diff,
+            "phone_edited_diff": self.phone_edited_diff
+        }[sort]
+
+    def _order(self, sort, descending):
+        """Row positions in sort order; ties keep roster order and missing differences go last"""
+        key = (sort, descending)
+        order = self._orders.get(key)
+        if order is not None:
+            return order
+
+        positions = range(len(self.ids))
+        if sort == "name":
+            name_ids = list(self.name_order())
+            if self.vectorized:
+                order = np.searchsorted(self.ids, np.array(name_ids, dtype=np.int64))
+            else:
+                position = {row_id: i for i, row_id in enumerate(self.ids)}
+                order = [position[row_id] for row_id in name_ids]
+            if descending:
+                order = order[::-1]
+        elif self.vectorized:
+            column = self._column(sort)
+            missing_last = np.where(column < 0, np.iinfo(np.int64).max, column)
+            order = np.argsort(-column if descending else missing_last, kind="stable")
+        else:
+            column = self._column(sort)
+            sign = -1 if descending else 1
+            order = sorted(positions, key=lambda i: (column[i] < 0, sign * column[i]))
+        self._orders[key] = order
+        return order
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, scenario=None, min_diff=None, sort="diff", descending=True, offset=0, limit=50):
+        """Return (total, rows) for agents matching the filters, in sort order.
+
+        sort is one of SORT_KEYS. min_diff applies to the edited-vs-system start
+        difference.
+        """
+        order = self._order(sort, descending)
+        code = SCENARIO_CODES[scenario] if scenario else None
+        if self.vectorized:
+            mask = np.ones(len(self.ids), dtype=bool)
+            if code is not None:
+                mask &= self.scenario == code
+            if min_diff is not None:
+                mask &= self.start_diff >= min_diff
+            selected = order[mask[order]]
+            total = int(selected.size)
+            page = selected[offset:offset + limit].tolist()
+        else:
+            selected = [
+                i for i in order
+                if (code is None or self.scenario[i] == code) and
+                (min_diff is None or self.start_diff[i] >= min_diff)
+            ]
+            total = len(selected)
+            page = selected[offset:offset + limit]
+
+        described = self.describe([int(self.ids[i]) for i in page]) if page else {}
+        return total, [self.row(i, described.get(int(self.ids[i]), (None, None))) for i in page]
+
+    def row(self, i, description):
+        system, phone, edited = (TimeValue(int(s)) if s >= 0 else None for s in self.seconds[i])
+
+        def minutes_or_none(value):
+            value = int(value)
+            return value if value >= 0 else None
+
+        return {
+            "agent_id": description[0],
+            "name": description[1],
+            "scenario": SCENARIOS[int(self.scenario[i])],
+            "start_time_diff": minutes_or_none(self.start_diff[i]),
+            "phone_system_diff": minutes_or_none(self.phone_system_diff[i]),
+            "phone_edited_diff": minutes_or_none(self.phone_edited_diff[i]),
+            "system_start": display_time(system),
+            "phone_start": display_time(phone),
+            "edited_start": display_time(edited)
+        }
+
+    def stats(self):
+        return {
+            "agents": len(self.ids),
+            "vectorized": self.vectorized,
+            "scenarios": self.scenario_counts
+        }
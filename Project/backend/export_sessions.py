@@ -0,0 +1,59 @@
+"""Write every session with its ordered messages as NDJSON, the same records GET /export streams.
+
+Reads sessions.db directly in one pass with flat memory, so it suits nightly pulls
+without the server running. An output name ending in .gz (or --gzip) is compressed.
+
+    python export_sessions.py [--since 2025-10-15T00:00:00] [--output sessions.ndjson.gz]
+"""
+import os
+import sys
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# app reports its startup on stdout, which may be where the export goes
+with contextlib.redirect_stdout(sys.stderr):
+    from app import create_app, export_lines, parse_since
+from session_export import buffered, gzip_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", help="only sessions created or written to at or after this ISO 8601 timestamp")
+    parser.add_argument("--output", help="file to write; stdout when omitted")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output (implied by a .gz output name)")
+    args = parser.parse_args()
+
+    try:
+        since = parse_since(args.since) if args.since else None
+    except ValueError:
+        parser.error("--since must be an ISO 8601 timestamp")
+
+    with contextlib.redirect_stdout(sys.stderr):
+        create_app()
+    compress = args.gzip or (args.output or "").endswith(".gz")
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    lines = 0
+
+    def counted():
+        nonlocal lines
+        for line in export_lines(since):
+            lines += 1
+            yield line
+
+    try:
+        if compress:
+            for chunk in gzip_chunks(counted()):
+                out.write(chunk)
+        else:
+            for chunk in buffered(counted()):
+                out.write(chunk.encode("utf-8"))
+    finally:
+        if args.output:
+            out.close()
+    print(f"Exported {lines} sessions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
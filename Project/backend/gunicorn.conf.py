@@ -0,0 +1,33 @@
+"""Production server settings; migrate first, then start gunicorn from this directory:
+
+    python migrate.py && gunicorn -c gunicorn.conf.py
+
+The master builds the app once with PRELOAD, so the roster and its discrepancy index are
+loaded before the fork and every worker starts with them already in memory.
+"""
+import os
+
+wsgi_app = "app:create_app({'PRELOAD': True})"
+preload_app = True
+
+bind = f"{os.getenv('BACKEND_HOST', '0.0.0.0')}:{os.getenv('BACKEND_PORT', '5000')}"
+# /metrics is per worker: a scrape only sees the worker that answered it (labelled worker_pid),
+# so set WEB_CONCURRENCY=1 and scrape each instance where complete metrics matter
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# write-behind only lets a worker read its own queued writes (see message_writer.py), and
+# workers share one socket, so a session's next turn could reach any of them: run one
+# worker, and scale out with more single-worker instances behind a session-sticky proxy
+if os.getenv("MESSAGE_WRITE_BEHIND", "0") == "1":
+    workers = 1
+
+# Every request holds a thread until it is answered, so interviews waiting on the model at
+# once are capped at workers x threads (32 by default); raise GUNICORN_THREADS for more.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+def worker_exit(server, worker):
+    # commit whatever write-behind still has queued before the worker goes away
+    import app
+    if app.message_writer is not None:
+        app.message_writer.close()
@@ -0,0 +1,129 @@
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+from werkzeug.http import http_date
+
+# bodies smaller than this go out uncompressed; gzip would barely shrink them
+GZIP_MIN_SIZE = 512
+
+
+class CachedBody:
+    """One representation precomputed for a roster version.
+
+    body is the identity bytes, or None when the route streams them from disk;
+    gzip_body is the gzip encoding (None when too small to be worth it) and etag a
+    strong validator hashed from the identity bytes, so it only moves when the
+    content does.
+    """
+    __slots__ = ("body", "gzip_body", "etag", "last_modified")
+
+    def __init__(self, body, gzip_body, etag, last_modified=None):
+        self.body = body
+        self.gzip_body = gzip_body
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def build(cls, chunks, last_modified=None, keep_body=True):
+        """Hash and gzip an iterable of byte chunks in one pass"""
+        digest = hashlib.blake2b(digest_size=16)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        compressed = []
+        parts = [] if keep_body else None
+        size = 0
+        for chunk in chunks:
+            digest.update(chunk)
+            compressed.append(compressor.compress(chunk))
+            size += len(chunk)
+            if keep_body:
+                parts.append(chunk)
+        compressed.append(compressor.flush())
+        gzip_body = b"".join(compressed) if size >= GZIP_MIN_SIZE else None
+        body = b"".join(parts) if keep_body else None
+        return cls(body, gzip_body, digest.hexdigest(), last_modified)
+
+
+class BodyCache:
+    """CachedBodies for the current version of one data source, LRU-bounded.
+
+    get(version, key, build) returns the entry for key, calling build() to make it on
+    a miss; a new version drops every entry made for the previous one.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key, build):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = build()
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def cache_control(max_age):
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+def cached_response(entry, mimetype="application/json", max_age=0, stream=None):
+    """Answer the current request from a CachedBody.
+
+    A matching If-None-Match (or, without one, an If-Modified-Since no older than the
+    entry) gets an empty 304. Otherwise clients that accept gzip get the precompressed
+    bytes; the rest get entry.body, or stream() when the body is not kept in memory.
+    The gzip variant's ETag carries a -gzip suffix, since a strong validator has to
+    differ between encodings; either one revalidates.
+    """
+    use_gzip = entry.gzip_body is not None and request.accept_encodings.quality("gzip") > 0
+    headers = {
+        "ETag": f'"{entry.etag}-gzip"' if use_gzip else f'"{entry.etag}"',
+        "Cache-Control": cache_control(max_age),
+        "Vary": "Accept-Encoding"
+    }
+    if entry.last_modified is not None:
+        headers["Last-Modified"] = http_date(entry.last_modified)
+
+    if request.if_none_match:
+        not_modified = (request.if_none_match.contains_weak(entry.etag) or
+                        request.if_none_match.contains_weak(f"{entry.etag}-gzip"))
+    else:
+        since = request.if_modified_since
+        not_modified = (since is not None and entry.last_modified is not None and
+                        entry.last_modified.replace(microsecond=0) <= since)
+    if not_modified:
+        return Response(status=304, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(entry.gzip_body, mimetype=mimetype, headers=headers)
+    return Response(entry.body if entry.body is not None else stream(), mimetype=mimetype, headers=headers)
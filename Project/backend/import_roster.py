@@ -0,0 +1,34 @@
+"""Load roster files into the agents/time_records tables of sessions.db.
+
+Agents are upserted on their agent_id, so files can be imported in batches and
+re-imported after edits. data.json itself is synced automatically by the server
+whenever it changes; use this for additional batches or to force a re-import.
+
+    python import_roster.py batch1.json [batch2.json ...] [--prune]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="roster JSON files in data.json format")
+    parser.add_argument("--prune", action="store_true",
+                        help="remove agents an earlier import of the same file brought in but this one does not")
+    args = parser.parse_args()
+
+    app.create_app()
+    agent_store = app.agent_store
+    for path in args.paths:
+        summary = agent_store.import_file(path, prune=args.prune)
+        print(f"{path}: {summary['agents']} agents imported, {summary['pruned']} removed (import {summary['id']})")
+    print(f"Roster now has {agent_store.count()} agents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import json
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from conversation_manager import ConversationManager, SUMMARY_HEADER
+from tracker_store import TrackerStore
+
+# one per worker process, made on first use; nothing here touches the database
+_manager = None
+
+
+def _conversation_manager():
+    global _manager
+    if _manager is None:
+        _manager = ConversationManager(TrackerStore(max_entries=64))
+    return _manager
+
+
+def is_summary(message):
+    return message["role"] == "assistant" and message["content"].startswith(SUMMARY_HEADER)
+
+
+def summarize_interview(job):
+    """Summary and facts for one completed interview; runs in a pool worker.
+
+    job is (session_id, messages, agent_context) with messages as role/content dicts in
+    conversation order and agent_context the roster record as a plain dict. The facts
+    are replayed a user turn at a time, the way the chat routes build them up, since a
+    single pass over the whole history would only see the last few answers.
+    """
+    session_id, messages, agent_context = job
+    manager = _conversation_manager()
+    conversation = [msg for msg in messages if not is_summary(msg)]
+    state = None
+    try:
+        for index, message in enumerate(conversation):
+            if message["role"] == "user":
+                state = manager.analyze_conversation_state(conversation[:index + 1], agent_context, session_id)
+    finally:
+        manager.asked_questions_tracker.discard(session_id)
+
+    return {
+        "session_id": session_id,
+        "summary": manager.generate_conversation_summary(conversation, agent_context),
+        "key_points": manager.summary_key_points(conversation),
+        "established_facts": sorted(state["established_facts"]) if state else [],
+        "unresolved_issues": sorted(state["unresolved_issues"]) if state else [],
+        "quality_score": state["quality_score"] if state else 0
+    }
+
+
+def message_snapshot(conn, messages):
+    """Newest message id right now. A run reads nothing past it and records it as the next
+    run's watermark, so messages written while the run is going belong to the next one."""
+    return conn.execute(select(func.max(messages.c.id))).scalar() or 0
+
+
+def summary_watermark(conn, runs):
+    """Snapshot the last finished run read up to; sessions with no later message are unchanged"""
+    return conn.execute(select(func.max(runs.c.watermark))).scalar() or 0
+
+
+def record_run(conn, runs, watermark, full, sessions, summarized, started_at):
+    conn.execute(runs.insert().values(
+        watermark=watermark, full=int(full), sessions=sessions, summarized=summarized,
+        started_at=started_at, finished_at=datetime.utcnow()
+    ))
+
+
+def changed_session_ids(conn, sessions, messages, since_message_id, snapshot):
+    """Ids of sessions with a message in (since_message_id, snapshot] (every session when since is 0)"""
+    if not since_message_id:
+        return conn.execute(select(sessions.c.id).order_by(sessions.c.id)).scalars().all()
+    return conn.execute(
+        select(messages.c.session_id)
+        .where(messages.c.id > since_message_id, messages.c.id <= snapshot)
+        .distinct().order_by(messages.c.session_id)
+    ).scalars().all()
+
+
+def load_completed(conn, sessions, messages, session_ids, snapshot):
+    """(session row, messages up to snapshot) for each of the sessions that had reached its closing summary by then"""
+    rows = conn.execute(
+        select(messages.c.id, messages.c.session_id, messages.c.role, messages.c.content, messages.c.created_at)
+        .where(messages.c.session_id.in_(session_ids), messages.c.id <= snapshot)
+        .order_by(messages.c.session_id, messages.c.created_at, messages.c.id)
+    ).all()
+    by_session = {sid: list(group) for sid, group in groupby(rows, key=lambda row: row.session_id)}
+    session_rows = conn.execute(
+        select(sessions.c.id, sessions.c.agent, sessions.c.agent_id).where(sessions.c.id.in_(list(by_session)))
+    ).all()
+    for session in session_rows:
+        history = by_session[session.id]
+        if any(row.role == "assistant" and row.content.startswith(SUMMARY_HEADER) for row in history):
+            yield session, history
+
+
+def store_summaries(conn, summaries, rows):
+    """Insert or replace summary rows (dicts keyed by column name)"""
+    if not rows:
+        return
+    upsert = sqlite_insert(summaries)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[summaries.c.session_id],
+        set_={c.name: upsert.excluded[c.name] for c in summaries.columns if c.name != "session_id"}
+    )
+    conn.execute(upsert, rows)
+
+
+def summary_row(session, history, result):
+    completed = [row.created_at for row in history if row.role == "assistant" and row.content.startswith(SUMMARY_HEADER)]
+    return {
+        "session_id": session.id,
+        "agent": session.agent,
+        "agent_id": session.agent_id,
+        "summary": result["summary"],
+        "key_points": json.dumps(result["key_points"]),
+        "established_facts": json.dumps(result["established_facts"]),
+        "unresolved_issues": json.dumps(result["unresolved_issues"]),
+        "quality_score": result["quality_score"],
+        "message_count": len(history),
+        "last_message_id": max(row.id for row in history),
+        "completed_at": completed[-1],
+        "summarized_at": datetime.utcnow()
+    }
@@ -0,0 +1,53 @@
+import re
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """Substring keyword matcher over many category tables, compiled into one regex.
+
+    categories(text) returns every category with at least one keyword occurring in
+    text, with the same substring semantics as `any(word in text for word in words)`.
+    All start positions are scanned through a lookahead alternation, longest keyword
+    first; keywords that are prefixes of the longest match at a position are folded
+    in up front, so overlapping keywords from different tables are never missed.
+    """
+
+    def __init__(self, tables, cache_size=4096):
+        keyword_categories = {}
+        for category, keywords in tables.items():
+            for keyword in keywords:
+                keyword_categories.setdefault(keyword.lower(), set()).add(category)
+
+        self._categories = {}
+        for keyword in keyword_categories:
+            found = set()
+            for other, categories in keyword_categories.items():
+                if keyword.startswith(other):
+                    found |= categories
+            self._categories[keyword] = frozenset(found)
+
+        alternation = "|".join(re.escape(k) for k in sorted(self._categories, key=len, reverse=True))
+        self._pattern = re.compile(f"(?=({alternation}))") if alternation else None
+        self.categories = lru_cache(maxsize=cache_size)(self._scan)
+
+    def _scan(self, text):
+        if not text or self._pattern is None:
+            return frozenset()
+        found = set()
+        for keyword in self._pattern.findall(text.lower()):
+            found |= self._categories[keyword]
+        return frozenset(found)
+
+
+class PatternSet:
+    """Precompiled regexes; matches(text) returns the indexes of every pattern found in text"""
+
+    def __init__(self, patterns, cache_size=4096):
+        self.patterns = [re.compile(p) for p in patterns]
+        self.matches = lru_cache(maxsize=cache_size)(self._scan)
+
+    def _scan(self, text):
+        if not text:
+            return frozenset()
+        lowered = text.lower()
+        return frozenset(i for i, pattern in enumerate(self.patterns) if pattern.search(lowered))
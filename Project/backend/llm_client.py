@@ -0,0 +1,220 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+import httpx
+
+from llm_scheduler import LLMScheduler, LLMOverloaded, PRIORITY_FOLLOW_UP
+
+_STREAM_END = object()
+
+
+class LLMTimeout(Exception):
+    """Raised when a completion misses its deadline"""
+
+
+class AsyncLLMClient:
+    """Pooled keep-alive client for an OpenAI-compatible /chat/completions endpoint.
+
+    All requests run on one background event loop that owns the httpx connection
+    pool, so any number of Flask threads can wait on completions
+    while at most max_in_flight of them are sent to the model server at once.
+    Which waiting request goes next, and which are refused outright under load,
+    is decided by an LLMScheduler (see llm_scheduler).
+    """
+
+    def __init__(self, base_url, api_key, max_in_flight=8, timeout=10.0, max_connections=None,
+                 latency_budget=None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_connections = max_connections or max_in_flight
+        self.scheduler = LLMScheduler(max_in_flight, latency_budget=latency_budget)
+
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm-client-loop", daemon=True)
+            thread.start()
+            asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+            self._thread = thread
+            self._loop = loop
+
+    async def _setup(self):
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            timeout=httpx.Timeout(self.timeout)
+        )
+
+    async def _acquire(self, priority):
+        """Wait for a scheduler slot; returns the start time to pass to _release"""
+        self._count("waiting", 1)
+        try:
+            await self.scheduler.acquire(priority, self._loop)
+        finally:
+            self._count("waiting", -1)
+        self._count("in_flight", 1)
+        return time.perf_counter()
+
+    def _release(self, started, completed):
+        self._count("in_flight", -1)
+        # only completed requests say how long the model takes to serve one
+        self.scheduler.release(time.perf_counter() - started if completed else None)
+
+    async def _post(self, path, payload, priority):
+        started = await self._acquire(priority)
+        completed = False
+        try:
+            resp = await self._client.post(path, json=payload)
+            resp.raise_for_status()
+            completed = True
+            return resp.json()
+        finally:
+            self._release(started, completed)
+
+    async def _stream_lines(self, path, payload, out, priority):
+        started = await self._acquire(priority)
+        completed = False
+        try:
+            async with self._client.stream("POST", path, json=payload) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        out.put(delta)
+            completed = True
+        finally:
+            self._release(started, completed)
+
+    async def _stream(self, payload, out, timeout, priority):
+        started = time.perf_counter()
+        shed = False
+        try:
+            await asyncio.wait_for(
+                self._stream_lines("/chat/completions", dict(payload, stream=True), out, priority), timeout)
+        except asyncio.TimeoutError:
+            self._count("timeouts", 1)
+            raise LLMTimeout(f"LLM stream exceeded {timeout}s deadline")
+        except LLMOverloaded:
+            shed = True
+            raise
+        except Exception:
+            self._count("errors", 1)
+            raise
+        finally:
+            if not shed:
+                with self._stats_lock:
+                    self.requests += 1
+                    self.total_ms += (time.perf_counter() - started) * 1000
+            out.put(_STREAM_END)
+
+    async def _complete(self, payload, timeout, priority):
+        started = time.perf_counter()
+        shed = False
+        try:
+            # the deadline covers both waiting for a slot and the request itself
+            return await asyncio.wait_for(self._post("/chat/completions", payload, priority), timeout)
+        except asyncio.TimeoutError:
+            self._count("timeouts", 1)
+            raise LLMTimeout(f"LLM call exceeded {timeout}s deadline")
+        except LLMOverloaded:
+            shed = True
+            raise
+        except Exception:
+            self._count("errors", 1)
+            raise
+        finally:
+            if not shed:
+                with self._stats_lock:
+                    self.requests += 1
+                    self.total_ms += (time.perf_counter() - started) * 1000
+
+    def _count(self, name, delta):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def submit(self, payload, timeout=None, priority=PRIORITY_FOLLOW_UP):
+        """Schedule a completion on the client loop and return a concurrent.futures.Future"""
+        self._ensure_started()
+        timeout = self.timeout if timeout is None else timeout
+        return asyncio.run_coroutine_threadsafe(self._complete(payload, timeout, priority), self._loop)
+
+    def complete(self, payload, timeout=None, priority=PRIORITY_FOLLOW_UP):
+        """Blocking completion for synchronous callers"""
+        timeout = self.timeout if timeout is None else timeout
+        return self.submit(payload, timeout, priority).result(timeout + 1)
+
+    async def acomplete(self, payload, timeout=None, priority=PRIORITY_FOLLOW_UP):
+        """Awaitable completion usable from any event loop"""
+        return await asyncio.wrap_future(self.submit(payload, timeout, priority))
+
+    def stream(self, payload, timeout=None, priority=PRIORITY_FOLLOW_UP):
+        """Yield content deltas of a streamed completion as they arrive.
+
+        Errors and deadline misses are raised once the stream ends; closing the
+        generator early cancels the request.
+        """
+        self._ensure_started()
+        timeout = self.timeout if timeout is None else timeout
+        out = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._stream(payload, out, timeout, priority), self._loop)
+        try:
+            while True:
+                item = out.get(timeout=timeout + 1)
+                if item is _STREAM_END:
+                    break
+                yield item
+            future.result()
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def close(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "requests": self.requests,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "avg_ms": round(self.total_ms / self.requests, 3) if self.requests else 0.0,
+                "scheduler": self.scheduler.stats()
+            }
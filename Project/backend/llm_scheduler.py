@@ -0,0 +1,115 @@
+import heapq
+import itertools
+import threading
+
+# lower runs first
+PRIORITY_FIRST_TURN = 0
+PRIORITY_FOLLOW_UP = 1
+
+
+class LLMOverloaded(Exception):
+    """Raised instead of queuing a completion whose projected wait is over the latency budget"""
+
+
+class LLMScheduler:
+    """Admission control for model requests on the client's event loop.
+
+    At most max_in_flight requests run at once. Others wait in a priority queue,
+    lowest priority value first and FIFO within a priority; a waiter whose
+    deadline passes (the caller's wait_for timeout) simply leaves the queue.
+
+    Before a request queues, its wait is projected from the requests ahead of it
+    and the recent average service time. When that exceeds latency_budget seconds
+    it is refused with LLMOverloaded straight away, so the caller can answer with
+    its scripted question instead of adding to the pile. latency_budget=None never
+    sheds.
+
+    acquire() and release() must run on the event loop; stats() may be called from
+    any thread.
+    """
+
+    def __init__(self, max_in_flight, latency_budget=None, smoothing=0.2):
+        self.max_in_flight = max_in_flight
+        self.latency_budget = latency_budget
+        self.smoothing = smoothing
+        self.service_seconds = None
+        self._queue = []
+        self._sequence = itertools.count()
+        self._waiting = {}
+        self._stats_lock = threading.Lock()
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.degraded = 0
+        self.degraded_by_priority = {}
+
+    def _has_free_slot(self):
+        # the heap may still hold entries of waiters that timed out, so count live ones
+        return self.in_flight < self.max_in_flight and not any(self._waiting.values())
+
+    def projected_wait(self, priority):
+        """Seconds a request of this priority would wait for a slot, by the running average"""
+        if self._has_free_slot():
+            return 0.0
+        if self.service_seconds is None:
+            return 0.0
+        ahead = sum(count for p, count in self._waiting.items() if p <= priority)
+        return (ahead + 1) / self.max_in_flight * self.service_seconds
+
+    def _count_waiting(self, priority, delta):
+        with self._stats_lock:
+            self._waiting[priority] = self._waiting.get(priority, 0) + delta
+
+    async def acquire(self, priority, loop):
+        if self.latency_budget is not None and self.projected_wait(priority) > self.latency_budget:
+            with self._stats_lock:
+                self.degraded += 1
+                self.degraded_by_priority[priority] = self.degraded_by_priority.get(priority, 0) + 1
+            raise LLMOverloaded(f"projected LLM queue wait over {self.latency_budget}s budget")
+
+        with self._stats_lock:
+            self.admitted += 1
+        if self._has_free_slot():
+            self.in_flight += 1
+            return
+
+        waiter = loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self._count_waiting(priority, 1)
+        try:
+            await waiter
+        except BaseException:
+            # cancelled by the deadline; give back a slot that was handed over meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            self._count_waiting(priority, -1)
+
+    def release(self, service_seconds=None):
+        if service_seconds is not None:
+            if self.service_seconds is None:
+                self.service_seconds = service_seconds
+            else:
+                self.service_seconds += self.smoothing * (service_seconds - self.service_seconds)
+
+        # hand the slot straight to the next live waiter
+        while self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self):
+        with self._stats_lock:
+            offered = self.admitted + self.degraded
+            return {
+                "latency_budget": self.latency_budget,
+                "service_avg_ms": round(self.service_seconds * 1000, 3) if self.service_seconds is not None else None,
+                "queued": dict(sorted((p, n) for p, n in self._waiting.items() if n)),
+                "admitted": self.admitted,
+                "degraded": self.degraded,
+                "degraded_by_priority": dict(sorted(self.degraded_by_priority.items())),
+                "degradation_rate": round(self.degraded / offered, 4) if offered else 0.0
+            }
@@ -0,0 +1,193 @@
+import re
+import html
+
+from sqlalchemy import DateTime, bindparam, text
+
+# External-content FTS5 index over message content. The text stays in messages; the index
+# reads it through messages_search, which adds the session's agent as a second column so
+# an agent filter is answered by the index instead of by joining every match. Triggers
+# keep the index in step with every insert, delete and content or agent change.
+SEARCH_INDEX_DDL = [
+    """CREATE VIEW IF NOT EXISTS messages_search AS
+        SELECT m.id AS id, m.content AS content, s.agent AS agent
+        FROM messages AS m JOIN sessions AS s ON s.id = m.session_id""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, agent, content='messages_search', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    # only the message text counts towards relevance
+    "INSERT INTO messages_fts (messages_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content, agent)
+        VALUES (new.id, new.content, (SELECT agent FROM sessions WHERE id = new.session_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content, agent)
+        VALUES ('delete', old.id, old.content, (SELECT agent FROM sessions WHERE id = old.session_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content, session_id ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content, agent)
+        VALUES ('delete', old.id, old.content, (SELECT agent FROM sessions WHERE id = old.session_id));
+        INSERT INTO messages_fts (rowid, content, agent)
+        VALUES (new.id, new.content, (SELECT agent FROM sessions WHERE id = new.session_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_session_agent AFTER UPDATE OF agent ON sessions BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content, agent)
+        SELECT 'delete', id, content, old.agent FROM messages WHERE session_id = old.id;
+        INSERT INTO messages_fts (rowid, content, agent)
+        SELECT id, content, new.agent FROM messages WHERE session_id = new.id;
+    END""",
+]
+
+# snippet() markers; private-use characters so they survive html.escape and cannot come from a message
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+
+SNIPPET_TOKENS = 16
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def create_search_index(conn):
+    for statement in SEARCH_INDEX_DDL:
+        conn.execute(text(statement))
+
+
+def rebuild_search_index(conn):
+    """Reindex every message from scratch; this is the backfill for rows written before the triggers"""
+    conn.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"))
+
+
+def optimize_search_index(conn):
+    """Merge the index b-trees into one, which keeps MATCH fast after heavy writes"""
+    conn.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')"))
+
+
+def _phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def match_expression(q):
+    """FTS5 query for free text typed by a reviewer.
+
+    Every word or "quoted phrase" must appear; a trailing * matches a prefix and a bare
+    OR between terms accepts either. Terms are quoted, so punctuation and FTS5 operators
+    in the input are searched for as text instead of failing as query syntax. Returns
+    None when q has nothing to search for.
+    """
+    parts = []
+    for match in _TERM.finditer(q or ""):
+        phrase, word = match.groups()
+        if word == "OR":
+            if parts and parts[-1] != "OR":
+                parts.append("OR")
+            continue
+        term = phrase if phrase is not None else word
+        prefix = phrase is None and term.endswith("*")
+        term = term.rstrip("*") if prefix else term
+        if not term.strip():
+            continue
+        parts.append(_phrase(term) + ("*" if prefix else ""))
+    while parts and parts[-1] == "OR":
+        parts.pop()
+    return " ".join(parts) or None
+
+
+def _matches(agent, start, end):
+    """FROM and WHERE for the matching messages; the agent phrase is matched in the index, then checked exactly"""
+    joins = "JOIN messages AS m ON m.id = messages_fts.rowid"
+    where, binds = ["messages_fts MATCH :match"], []
+    if agent is not None:
+        joins += " JOIN sessions AS s ON s.id = m.session_id"
+        where.append("s.agent = :agent COLLATE NOCASE")
+    if start is not None:
+        where.append("m.created_at >= :start")
+        binds.append(bindparam("start", type_=DateTime))
+    if end is not None:
+        where.append("m.created_at < :end")
+        binds.append(bindparam("end", type_=DateTime))
+    return f"FROM messages_fts {joins}", where, binds
+
+
+def window_query(agent=None, start=None, end=None):
+    """rowid of the window-th newest match, or no row when there are fewer matches"""
+    source, where, binds = _matches(agent, start, end)
+    return text(f"""
+        SELECT messages_fts.rowid {source}
+        WHERE {' AND '.join(where)}
+        ORDER BY messages_fts.rowid DESC
+        LIMIT 1 OFFSET :window_offset
+    """).bindparams(*binds)
+
+
+def search_query(agent=None, start=None, end=None, windowed=False):
+    """One page of matches best first (bm25, ties newest first), with snippets for that page only.
+
+    CROSS JOIN keeps the page as the outer loop, so snippet() looks up just those rowids
+    instead of SQLite walking every match to join them against the page.
+    """
+    source, where, binds = _matches(agent, start, end)
+    if windowed:
+        where.append("messages_fts.rowid >= :window_start")
+    return text(f"""
+        SELECT m.id AS message_id, m.session_id, s.agent, m.role, m.created_at,
+               snippet(messages_fts, 0, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet,
+               page.rank AS rank
+        FROM (
+            SELECT messages_fts.rowid AS id, messages_fts.rank AS rank {source}
+            WHERE {' AND '.join(where)}
+            ORDER BY messages_fts.rank, messages_fts.rowid DESC
+            LIMIT :limit OFFSET :offset
+        ) AS page
+        CROSS JOIN messages_fts ON messages_fts.rowid = page.id AND messages_fts MATCH :match
+        JOIN messages AS m ON m.id = page.id
+        JOIN sessions AS s ON s.id = m.session_id
+        ORDER BY page.rank, page.id DESC
+    """).bindparams(*binds).columns(created_at=DateTime)
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and wrap the matched terms in <mark>"""
+    return html.escape(snippet or "").replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def search_messages(conn, q, agent=None, start=None, end=None, offset=0, limit=20, window=10000):
+    """(rows, has_more, windowed) for one page of results; rows are dicts ready for JSON.
+
+    bm25 has to score every candidate before the best can be picked, which for a term
+    in most messages costs seconds. When the filters leave more than window matches,
+    only the newest window of them are ranked; windowed says that happened. window=0
+    always ranks everything.
+    """
+    match = match_expression(q)
+    if match is None:
+        return [], False, False
+    if agent is not None:
+        match = f"content : ({match}) AND agent : {_phrase(agent)}"
+    else:
+        match = f"content : ({match})"
+    params = {"match": match, "agent": agent, "start": start, "end": end}
+
+    window_start = None
+    if window:
+        window_start = conn.execute(
+            window_query(agent, start, end), dict(params, window_offset=window - 1)
+        ).scalar()
+    windowed = window_start is not None
+
+    rows = conn.execute(
+        search_query(agent, start, end, windowed),
+        dict(params, window_start=window_start, offset=offset, limit=limit + 1)
+    ).mappings().all()
+    has_more = len(rows) > limit
+    return [
+        {
+            "message_id": row["message_id"],
+            "session_id": row["session_id"],
+            "agent": row["agent"],
+            "role": row["role"],
+            "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+            "snippet": highlight(row["snippet"]),
+            "score": round(-row["rank"], 4)
+        } for row in rows[:limit]
+    ], has_more, windowed
@@ -0,0 +1,211 @@
+import time
+import queue
+import atexit
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy import bindparam, func, insert, update
+
+_STOP = object()
+
+
+class MessageWriter:
+    """Write-behind queue for chat messages and session state, committed in batches.
+
+    Routes hand their writes to add_message/update_state and move on; one writer
+    thread drains the queue and commits everything that arrived within max_delay
+    seconds of the first queued write (at most max_batch writes) in a single
+    transaction, so concurrent turns share one SQLite commit instead of paying
+    for their own. Writes are applied in submission order. Each call returns a
+    Future that resolves once its transaction commits (to the new row id for a
+    message).
+
+    flush_session(session_id) waits until everything queued for that session is
+    committed; readers call it before loading a session so they see their own
+    writes. close() drains the queue and stops the thread, and runs at interpreter
+    exit.
+
+    That guarantee is per process. Another worker has its own writer and knows
+    nothing of this queue, so it can read a session's conversation_state before
+    this worker's batch commits. Run write-behind with one worker per server
+    instance, and put a proxy that routes each session to the same instance in
+    front of several.
+
+    The writer keeps its own connection for its lifetime. Request threads hold
+    pooled connections while they wait in flush_session, so a writer that had to
+    check one out per batch could be starved by the very requests waiting on it.
+    """
+
+    def __init__(self, engine, messages, sessions, max_delay=0.005, max_batch=256):
+        self.engine = engine
+        self.messages = messages
+        self.sessions = sessions
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._conn = None
+
+        self.batches = 0
+        self.writes = 0
+        self.failures = 0
+        self.max_batch_seen = 0
+        self.commit_ms_total = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add_message(self, session_id, role, content, created_at):
+        row = {"session_id": session_id, "role": role, "content": content, "created_at": created_at}
+        return self._submit(session_id, ("message", row))
+
+    def update_state(self, session_id, key, value):
+        """Set one top-level key of the session's conversation_state to the JSON text value,
+        or replace the whole document when key is None"""
+        return self._submit(session_id, ("state", key, value))
+
+    def _submit(self, session_id, op):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("message writer is closed")
+            self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self._queue.put((session_id, op, future))
+        return future
+
+    def flush_session(self, session_id, timeout=5.0):
+        """Wait for the session's queued writes to commit; False if they did not within timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending.get(session_id), timeout)
+
+    def flush(self, timeout=5.0):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    def close(self, timeout=10.0):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    # once stopping, take what is already queued without waiting out the window
+                    if remaining > 0 and not stopping:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    # drain what is already queued, then stop
+                    stopping = True
+                    continue
+                batch.append(item)
+            self._write_batch(batch)
+        # writes queued behind the stop marker
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._write_batch(leftover)
+        if self._conn is not None:
+            self._conn.close()
+
+    def _transaction(self):
+        if self._conn is None or self._conn.invalidated:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = self.engine.connect()
+        return self._conn.begin()
+
+    def _write_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            with self._transaction():
+                results = [self._execute(self._conn, session_id, op) for session_id, op, _ in batch]
+        except Exception as e:
+            print(f"Message writer batch of {len(batch)} failed ({e}); retrying one at a time")
+            results = None
+
+        if results is None:
+            # isolate the bad write so the rest of the batch still lands
+            results = []
+            for session_id, op, _ in batch:
+                try:
+                    with self._transaction():
+                        results.append(self._execute(self._conn, session_id, op))
+                except Exception as e:
+                    print(f"Message writer dropped a write for session {session_id}: {e}")
+                    results.append(e)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        failures = 0
+        for (session_id, _, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                failures += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        with self._cond:
+            for session_id, _, _ in batch:
+                remaining = self._pending.get(session_id, 0) - 1
+                if remaining > 0:
+                    self._pending[session_id] = remaining
+                else:
+                    self._pending.pop(session_id, None)
+            self.batches += 1
+            self.writes += len(batch)
+            self.failures += failures
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.commit_ms_total += elapsed_ms
+            self._cond.notify_all()
+
+    def _execute(self, conn, session_id, op):
+        if op[0] == "message":
+            return conn.execute(insert(self.messages), op[1]).inserted_primary_key[0]
+
+        _, key, value = op
+        column = self.sessions.c.conversation_state
+        if key is None:
+            new_state = bindparam("value", value, type_=column.type)
+        else:
+            current = func.coalesce(func.nullif(column, ""), "{}")
+            new_state = func.json_set(current, f"$.{key}", func.json(bindparam("value", value)))
+        conn.execute(update(self.sessions).where(self.sessions.c.id == session_id).values(conversation_state=new_state))
+        return None
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_delay_ms": self.max_delay * 1000,
+                "max_batch": self.max_batch,
+                "queued": sum(self._pending.values()),
+                "batches": self.batches,
+                "writes": self.writes,
+                "failures": self.failures,
+                "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+                "max_batch_seen": self.max_batch_seen,
+                "commit_avg_ms": round(self.commit_ms_total / self.batches, 3) if self.batches else 0.0
+            }
@@ -0,0 +1,39 @@
+"""Create sessions.db or bring its schema up to the version this code expects.
+
+The server refuses to start on an outdated database instead of migrating it from every
+worker as they boot, so run this once per deploy, before starting the server (the
+development server, python app.py, still does it for itself).
+
+    python migrate.py [--status]
+"""
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+with contextlib.redirect_stdout(sys.stderr):
+    import app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--status", action="store_true", help="print the schema version without migrating")
+    args = parser.parse_args()
+
+    if args.status:
+        app.init_storage(app.load_config())
+        version = app.schema_version()
+        state = "up to date" if version >= app.SCHEMA_VERSION else "needs python migrate.py"
+        print(f"{app.DB_PATH}: schema version {version} of {app.SCHEMA_VERSION} ({state})")
+        return
+
+    started = time.perf_counter()
+    version = app.migrate_database()
+    print(f"{app.DB_PATH}: schema version {version} ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
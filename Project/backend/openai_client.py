@@ -1,15 +1,32 @@
-import openai
 import os
-import requests
-import json
 import re
+from llm_client import AsyncLLMClient
+from llm_scheduler import LLMOverloaded, PRIORITY_FOLLOW_UP
+from circuit_breaker import CircuitBreaker, CircuitOpenError
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "ollama")
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "http://localhost:11434/v1")
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "qwen:1.8b")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "10"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+# seconds a request may be projected to queue before it is answered from the template; 0 disables shedding
+LLM_LATENCY_BUDGET = float(os.getenv("LLM_LATENCY_BUDGET", "4"))
 
-openai.api_key = OPENAI_API_KEY
-openai.api_base = OPENAI_API_BASE
+llm_client = AsyncLLMClient(
+    OPENAI_API_BASE,
+    OPENAI_API_KEY,
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    timeout=LLM_TIMEOUT,
+    latency_budget=LLM_LATENCY_BUDGET or None
+)
+
+llm_breaker = CircuitBreaker(
+    failure_rate_threshold=float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")),
+    min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "5")),
+    window_size=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+    open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30")),
+    neutral_exceptions=(LLMOverloaded,)
+)
 
 def clean_ascii(text):
     if text is None:
@@ -19,54 +36,89 @@ def clean_ascii(text):
 def validate_question(response, system_prompt):
     """Validate that response is a proper question following the prompt"""
     response = response.strip()
-    
+
     intended_question = ""
     match = re.search(r'QUESTION TO ASK: "(.+?)"', system_prompt)
     if match:
         intended_question = match.group(1)
-    
+
     if intended_question and intended_question not in response:
         return intended_question
-    
+
     if not response.endswith('?'):
         response = response + '?'
-    
+
     return response
 
-def chat_with_gpt(messages, model=None, temperature=0.1, max_tokens=80):
+def fallback_question(messages):
+    """Question to use when the model cannot be reached"""
+    for msg in messages:
+        if msg["role"] == "system":
+            match = re.search(r'QUESTION TO ASK: "(.+?)"', msg["content"])
+            if match:
+                return match.group(1)
+    return "Can you provide more details about this?"
+
+def build_request(messages, model=None, temperature=0.1, max_tokens=80, top_p=None):
+    """Return the completion payload and the system prompt used for validation"""
+    cleaned = [{"role": m["role"], "content": clean_ascii(m["content"])} for m in messages]
+
+    system_prompt = ""
+    for msg in cleaned:
+        if msg["role"] == "system":
+            system_prompt = msg["content"]
+            break
+
+    payload = {
+        "model": model or DEFAULT_MODEL,
+        "messages": cleaned,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    if top_p is not None:
+        payload["top_p"] = top_p
+    return payload, system_prompt
+
+def read_completion(data):
+    return data["choices"][0]["message"]["content"].strip()
+
+def ask_model(messages, model=None, temperature=0.1, max_tokens=80, top_p=None, timeout=None,
+              priority=PRIORITY_FOLLOW_UP):
+    """Validated model reply; raises if the model cannot be reached, its circuit is open or it is overloaded"""
+    payload, system_prompt = build_request(messages, model, temperature, max_tokens, top_p)
+    response = read_completion(llm_breaker.call(llm_client.complete, payload, timeout=timeout, priority=priority))
+    return validate_question(response, system_prompt)
+
+def chat_with_gpt(messages, model=None, temperature=0.1, max_tokens=80, top_p=None, timeout=None,
+                  priority=PRIORITY_FOLLOW_UP):
     """
     Professional AI that follows strict conversation rules
     """
-    if model is None:
-        model = DEFAULT_MODEL
-        
-    cleaned = [{"role": m["role"], "content": clean_ascii(m["content"])} for m in messages]
-
     try:
-        system_prompt = ""
-        for msg in cleaned:
-            if msg["role"] == "system":
-                system_prompt = msg["content"]
-                break
-        
-        resp = openai.ChatCompletion.create(
-            model=model, 
-            messages=cleaned, 
-            temperature=temperature,
-            max_tokens=max_tokens,
-            timeout=10
-        )
-        response = resp.choices[0].message["content"].strip()
-        
-        validated_response = validate_question(response, system_prompt)
-        
-        return validated_response
-        
+        return ask_model(messages, model, temperature, max_tokens, top_p, timeout, priority)
+    except (CircuitOpenError, LLMOverloaded):
+        return fallback_question(messages)
     except Exception as e:
         print(f"AI service error: {e}")
-        for msg in messages:
-            if msg["role"] == "system":
-                match = re.search(r'QUESTION TO ASK: "(.+?)"', msg["content"])
-                if match:
-                    return match.group(1)
-        return "Can you provide more details about this?"
\ No newline at end of file
+        return fallback_question(messages)
+
+def stream_chat_with_gpt(messages, model=None, temperature=0.1, max_tokens=80, top_p=None, timeout=None,
+                         priority=PRIORITY_FOLLOW_UP):
+    """Yield raw response tokens; callers validate the joined text themselves"""
+    payload, _ = build_request(messages, model, temperature, max_tokens, top_p)
+    if not llm_breaker.allow():
+        raise CircuitOpenError("LLM circuit is open")
+    try:
+        yield from llm_client.stream(payload, timeout=timeout, priority=priority)
+    except GeneratorExit:
+        # the client went away mid-stream; free a half-open probe rather than leave every call
+        # rejected until it times out
+        llm_breaker.release_probe()
+        raise
+    except LLMOverloaded:
+        llm_breaker.release_probe()
+        raise
+    except Exception:
+        llm_breaker.record_failure()
+        raise
+    llm_breaker.record_success()
@@ -0,0 +1,41 @@
+"""Rebuild the full-text index behind GET /search from the messages table, then optimize it.
+
+Migration 3 builds the index once and triggers keep it current after that; run this to
+backfill rows written by something that bypassed the triggers, or after a bulk import.
+
+    python rebuild_search_index.py [--optimize-only]
+"""
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+with contextlib.redirect_stdout(sys.stderr):
+    import app
+from message_search import rebuild_search_index, optimize_search_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--optimize-only", action="store_true", help="only merge the existing index")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        app.create_app()
+    started = time.perf_counter()
+    with app.engine.begin() as conn:
+        if not args.optimize_only:
+            rebuild_search_index(conn)
+        optimize_search_index(conn)
+        indexed = conn.execute(text("SELECT count(*) FROM messages")).scalar()
+    print(f"Search index {'optimized' if args.optimize_only else 'rebuilt'} over {indexed} messages "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
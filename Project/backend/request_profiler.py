@@ -0,0 +1,112 @@
+import os
+import re
+import time
+import pstats
+import cProfile
+import threading
+
+
+class RequestProfiler:
+    """cProfile for one in every `every` requests, aggregated per route.
+
+    Stats are merged in memory and written as <route>.pstats files under output_dir
+    after every flush_every samples and on dump(); render them offline with
+    snakeviz, flameprof or gprof2dot. Only one request is profiled at a time, so a
+    sample that lands while another is running is skipped rather than queued.
+    cProfile only sees the thread that enabled it, so work a request hands to other
+    threads (the model client's event loop) shows up as time spent waiting. every=0
+    turns sampling off.
+    """
+
+    def __init__(self, output_dir, every=0, flush_every=20):
+        self.output_dir = output_dir
+        self.every = every
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        self._seen = 0
+        self._stats = {}
+        self._unflushed = 0
+        self.samples = 0
+        self.skipped = 0
+        self.last_dump = None
+
+    def configure(self, every=None, flush_every=None):
+        with self._lock:
+            if every is not None:
+                self.every = max(0, int(every))
+            if flush_every is not None:
+                self.flush_every = max(1, int(flush_every))
+
+    def start(self):
+        """Profile for this request if it is sampled, else None"""
+        every = self.every
+        if not every:
+            return None
+        with self._lock:
+            self._seen += 1
+            if self._seen % every:
+                return None
+        if not self._active.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler is already attached to the interpreter
+            self._active.release()
+            self.skipped += 1
+            return None
+        return profile
+
+    def stop(self, profile, route):
+        profile.disable()
+        self._active.release()
+        with self._lock:
+            stats = self._stats.get(route)
+            if stats is None:
+                self._stats[route] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self.samples += 1
+            self._unflushed += 1
+            flush = self._unflushed >= self.flush_every
+        if flush:
+            self.dump()
+
+    @staticmethod
+    def _filename(route):
+        return (re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root") + ".pstats"
+
+    def dump(self):
+        """Write the aggregated stats to disk; returns the paths written"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            paths = []
+            for route, stats in self._stats.items():
+                path = os.path.join(self.output_dir, self._filename(route))
+                stats.dump_stats(path)
+                paths.append(path)
+            self._unflushed = 0
+            self.last_dump = time.time()
+        return paths
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._unflushed = 0
+            self.samples = 0
+            self.skipped = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "every": self.every,
+                "flush_every": self.flush_every,
+                "output_dir": self.output_dir,
+                "samples": self.samples,
+                "skipped": self.skipped,
+                "routes": sorted(self._stats),
+                "last_dump": self.last_dump
+            }
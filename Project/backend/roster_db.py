@@ -0,0 +1,487 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import (
+    Table, Column, Integer, String, Text, DateTime, ForeignKey, Index, UniqueConstraint,
+    select, delete, func, and_
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from roster_loader import AgentRecord, SECTIONS, TIME_FIELDS, load_agents
+from time_values import parse_time
+from discrepancy_index import DiscrepancyIndex
+
+IMPORT_BATCH_SIZE = 500
+
+
+def define_roster_tables(metadata):
+    """agents, time_records and roster_imports on the given metadata"""
+    agents = Table(
+        "agents", metadata,
+        Column("id", Integer, primary_key=True),
+        # data.json agent_id, or "name:<casefolded name>" for agents without one
+        Column("agent_key", String(256), nullable=False, unique=True),
+        Column("agent_id", String(128)),
+        Column("name", String(256)),
+        Column("name_key", String(256)),
+        # original key order and any keys besides agent_id/name/time sections, as JSON
+        Column("keys", Text, nullable=False, default="[]"),
+        Column("extra", Text),
+        Column("import_id", Integer),
+        Column("updated_at", DateTime, default=datetime.utcnow),
+        Index("ix_agents_name_key", "name_key", "id"),
+        Index("ix_agents_agent_id", "agent_id")
+    )
+    time_records = Table(
+        "time_records", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("agent_id", Integer, ForeignKey("agents.id"), nullable=False),
+        Column("source", String(32), nullable=False),
+        Column("start_time", String(64)),
+        Column("end_time", String(64)),
+        # parsed time of day, NULL when the raw value is not a time
+        Column("start_seconds", Integer),
+        Column("end_seconds", Integer),
+        UniqueConstraint("agent_id", "source", name="uq_time_records_agent_source"),
+        Index("ix_time_records_source_agent", "source", "agent_id")
+    )
+    roster_imports = Table(
+        "roster_imports", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("source", String(512), nullable=False),
+        Column("signature", String(128)),
+        Column("agents", Integer, nullable=False, default=0),
+        Column("pruned", Integer, nullable=False, default=0),
+        Column("imported_at", DateTime, default=datetime.utcnow)
+    )
+    return agents, time_records, roster_imports
+
+
+def agent_key(record):
+    if record.agent_id is not None:
+        return str(record.agent_id)
+    if isinstance(record.name, str) and record.name:
+        return f"name:{record.name.casefold()}"
+    return None
+
+
+def _seconds(value):
+    parsed = parse_time(value) if isinstance(value, str) else None
+    return parsed.seconds if parsed is not None else None
+
+
+def import_roster(conn, tables, records, source, signature=None, prune=False, batch_size=IMPORT_BATCH_SIZE):
+    """Upsert AgentRecords into the roster tables inside the caller's transaction.
+
+    Agents are matched on agent_key and updated in place, so their row ids (and the
+    sessions pointing at them) survive re-imports; each agent's time records are
+    replaced by the ones in the new batch. With prune=True, agents that an earlier
+    import of the same source brought in but this one did not are removed, which is
+    what a full data.json sync wants; agents from other sources are left alone.
+    Returns the roster_imports row as a dict.
+    """
+    agents, time_records, roster_imports = tables
+    import_id = conn.execute(
+        roster_imports.insert().values(source=source, signature=signature, imported_at=datetime.utcnow())
+    ).inserted_primary_key[0]
+
+    upsert = sqlite_insert(agents)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[agents.c.agent_key],
+        set_={c: upsert.excluded[c] for c in ("agent_id", "name", "name_key", "keys", "extra", "import_id", "updated_at")}
+    )
+    now = datetime.utcnow()
+    imported = 0
+    batch = []
+    seen = set()
+
+    def flush():
+        rows = {}
+        for record in batch:
+            key = agent_key(record)
+            if key is None or key in seen:
+                # same first-match-wins rule the name/id lookups have always used
+                continue
+            seen.add(key)
+            extra = record.extra
+            rows[key] = (record, {
+                "agent_key": key,
+                "agent_id": str(record.agent_id) if record.agent_id is not None else None,
+                "name": record.name if isinstance(record.name, str) else None,
+                "name_key": record.name.casefold() if isinstance(record.name, str) else None,
+                "keys": json.dumps(list(record.keys())),
+                "extra": json.dumps(extra) if extra else None,
+                "import_id": import_id,
+                "updated_at": now
+            })
+        batch.clear()
+        if not rows:
+            return 0
+
+        conn.execute(upsert, [row for _, row in rows.values()])
+        ids = dict(conn.execute(
+            select(agents.c.agent_key, agents.c.id).where(agents.c.agent_key.in_(list(rows)))
+        ).all())
+        conn.execute(delete(time_records).where(time_records.c.agent_id.in_(list(ids.values()))))
+
+        time_rows = []
+        for key, (record, _) in rows.items():
+            for section in SECTIONS:
+                if section not in record or (record.extra and section in record.extra):
+                    continue
+                times = record.get(section)
+                start, end = times.get(TIME_FIELDS[0]), times.get(TIME_FIELDS[1])
+                time_rows.append({
+                    "agent_id": ids[key],
+                    "source": section,
+                    "start_time": start,
+                    "end_time": end,
+                    "start_seconds": _seconds(start),
+                    "end_seconds": _seconds(end)
+                })
+        if time_rows:
+            conn.execute(time_records.insert(), time_rows)
+        return len(rows)
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            imported += flush()
+    imported += flush()
+
+    pruned = 0
+    if prune:
+        earlier_imports = select(roster_imports.c.id).where(
+            roster_imports.c.source == source, roster_imports.c.id != import_id
+        )
+        stale = select(agents.c.id).where(agents.c.import_id.in_(earlier_imports))
+        conn.execute(delete(time_records).where(time_records.c.agent_id.in_(stale)))
+        pruned = conn.execute(delete(agents).where(agents.c.import_id.in_(earlier_imports))).rowcount
+
+    conn.execute(roster_imports.update().where(roster_imports.c.id == import_id).values(agents=imported, pruned=pruned))
+    return {"id": import_id, "source": source, "agents": imported, "pruned": pruned}
+
+
+class RosterStore:
+    """Agent roster served from the agents/time_records tables.
+
+    data.json stays the place people edit: when its signature differs from the last
+    import recorded for it, the file is streamed into the tables with upsert
+    semantics. Lookups are indexed queries with a small per-worker LRU in front,
+    dropped whenever any worker records a new import. link_sessions(conn) fills
+    sessions.agent_id for sessions that only carry an agent name.
+    """
+
+    def __init__(self, engine, tables, path=None, check_interval=1.0, cache_size=1024, link_sessions=None):
+        self.engine = engine
+        self.tables = tables
+        self.path = path
+        self.check_interval = check_interval
+        self.cache_size = cache_size
+        self.link_sessions = link_sessions
+        self.reload_count = 0
+        self.reload_errors = 0
+        self.last_reload_ms = None
+        self.last_reload_at = None
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._generation = None
+        self._generation_at = None
+        self._discrepancies = None
+        self._lock = threading.RLock()
+        self._last_check = 0.0
+        # one reload at a time per worker; held for the whole import, which _lock must never be
+        self._import_lock = threading.Lock()
+        self._reload_thread = None
+        # data.json signature the last reload found imported (by this worker or another)
+        self._synced_signature = None
+        # signature of a file that failed to import; it is not retried until the file changes
+        self._failed_signature = None
+
+    def file_signature(self):
+        """mtime and size of data.json, which change whenever the file does; None if it is missing"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def _current_generation(self, conn):
+        """(id, imported_at) of the newest import, or (None, None) before the first one"""
+        roster_imports = self.tables[2]
+        row = conn.execute(
+            select(roster_imports.c.id, roster_imports.c.imported_at).order_by(roster_imports.c.id.desc()).limit(1)
+        ).first()
+        return tuple(row) if row else (None, None)
+
+    def _imported_signature(self, conn):
+        roster_imports = self.tables[2]
+        return conn.execute(
+            select(roster_imports.c.signature)
+            .where(roster_imports.c.source == os.path.abspath(self.path))
+            .order_by(roster_imports.c.id.desc())
+            .limit(1)
+        ).scalar()
+
+    def import_file(self, path=None, prune=True, only_if_changed=False):
+        """Stream a roster file into the tables. Returns the import summary.
+
+        The transaction starts with BEGIN IMMEDIATE, so imports from several workers
+        queue for the write lock; with only_if_changed the one that gets it second sees
+        the signature the first recorded and returns None instead of importing again.
+        """
+        path = os.path.abspath(path or self.path)
+        signature = self.file_signature() if path == os.path.abspath(self.path or "") else None
+        with open(path, "r", encoding="utf-8") as f, self.engine.begin() as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            if only_if_changed and self._imported_signature(conn) == signature:
+                return None
+            summary = import_roster(conn, self.tables, load_agents(f), path, signature=signature, prune=prune)
+            if self.link_sessions is not None:
+                self.link_sessions(conn)
+        return summary
+
+    def reload(self):
+        """Import data.json if it changed since its last recorded import. Returns True on success.
+
+        Lookups do not wait for it: they keep answering from the current generation
+        until the import commits and _check_generation swaps the new one in.
+        """
+        with self._import_lock:
+            started = time.perf_counter()
+            signature = self.file_signature()
+            try:
+                with self.engine.connect() as conn:
+                    unchanged = signature is None or self._imported_signature(conn) == signature
+                summary = None if unchanged else self.import_file(only_if_changed=True)
+                if summary is not None:
+                    print(f"Imported {summary['agents']} agents from {self.path} ({summary['pruned']} removed)")
+                    self.reload_count += 1
+                    self.last_reload_ms = round((time.perf_counter() - started) * 1000, 3)
+                    self.last_reload_at = time.time()
+                self._synced_signature = signature
+                self._failed_signature = None
+            except Exception as e:
+                # keep serving the roster already in the database if the file is half-written or invalid
+                self.reload_errors += 1
+                self._failed_signature = signature
+                print(f"Agent roster import failed: {e}")
+                return False
+        self._check_generation()
+        return True
+
+    def _check_generation(self):
+        with self.engine.connect() as conn:
+            generation, imported_at = self._current_generation(conn)
+        with self._lock:
+            if generation != self._generation:
+                self._generation = generation
+                self._generation_at = imported_at
+                self._cache.clear()
+                self._discrepancies = None
+
+    def version(self):
+        """(generation, imported_at) of the roster this worker is serving; both change with every import"""
+        with self._lock:
+            return self._generation, self._generation_at
+
+    def _start_reload(self):
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(target=self.reload, name="roster-reload", daemon=True)
+            self._reload_thread.start()
+
+    def maybe_reload(self):
+        """Sync with data.json and with imports made by other workers, at most once per check_interval.
+
+        Called from the request path, so a changed data.json is only handed to a
+        background reload here; this request and the ones after it are served from the
+        current generation until the import has committed.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        started = False
+        if self.path is not None and self.file_signature() not in (self._synced_signature, self._failed_signature):
+            self._start_reload()
+            started = True
+        self._check_generation()
+        return started
+
+    def _load_records(self, conn, where, limit=None):
+        agents, time_records, _ = self.tables
+        query = select(agents).where(where).order_by(agents.c.id)
+        if limit is not None:
+            query = query.limit(limit)
+        rows = conn.execute(query).all()
+        if not rows:
+            return []
+        times = {}
+        for t in conn.execute(select(time_records).where(time_records.c.agent_id.in_([r.id for r in rows]))):
+            times.setdefault(t.agent_id, {})[t.source] = t
+        return [self._record(row, times.get(row.id, {})) for row in rows]
+
+    @staticmethod
+    def _record(row, times):
+        extra = json.loads(row.extra) if row.extra else {}
+        agent = {}
+        for key in json.loads(row.keys):
+            if key in extra:
+                agent[key] = extra[key]
+            elif key == "agent_id":
+                agent[key] = row.agent_id
+            elif key == "name":
+                agent[key] = row.name
+            elif key in times:
+                t = times[key]
+                agent[key] = {
+                    field: value
+                    for field, value in zip(TIME_FIELDS, (t.start_time, t.end_time)) if value is not None
+                }
+            else:
+                agent[key] = {}
+        record = AgentRecord(agent)
+        record.db_id = row.id
+        return record
+
+    def _lookup(self, cache_key, where):
+        with self._lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                return self._cache[cache_key]
+            generation = self._generation
+        with self.engine.connect() as conn:
+            records = self._load_records(conn, where, limit=1)
+        record = records[0] if records else None
+        with self._lock:
+            self.misses += 1
+            if generation != self._generation:
+                # read across a generation swap; it may be the old roster's row, so do not cache it
+                return record
+            self._cache[cache_key] = record
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return record
+
+    def get_by_name(self, name):
+        if not name:
+            return None
+        name_key = name.casefold()
+        return self._lookup(("name", name_key), self.tables[0].c.name_key == name_key)
+
+    def get_by_id(self, agent_id):
+        if agent_id is None:
+            return None
+        return self._lookup(("id", str(agent_id)), self.tables[0].c.agent_id == str(agent_id))
+
+    def get_by_db_id(self, db_id):
+        if db_id is None:
+            return None
+        return self._lookup(("db", db_id), self.tables[0].c.id == db_id)
+
+    def list_agents(self):
+        """(name, agent_id) for every agent in roster order, without building records"""
+        agents = self.tables[0]
+        with self.engine.connect() as conn:
+            return conn.execute(select(agents.c.name, agents.c.agent_id).order_by(agents.c.id)).all()
+
+    def agents_with_discrepancy(self, limit=None):
+        """Agents whose edited start minute differs from the system start minute, in roster order"""
+        agents, time_records, _ = self.tables
+        system = time_records.alias("system_times")
+        edited = time_records.alias("edited_times")
+        matching = (
+            select(system.c.agent_id)
+            .join(edited, and_(edited.c.agent_id == system.c.agent_id, edited.c.source == "agent_disputed"))
+            .where(system.c.source == "system")
+            .where(system.c.start_seconds / 60 != edited.c.start_seconds / 60)
+        )
+        with self.engine.connect() as conn:
+            return self._load_records(conn, agents.c.id.in_(matching), limit=limit)
+
+    def count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(self.tables[0])).scalar()
+
+    @property
+    def discrepancies(self):
+        """DiscrepancyIndex over the current roster, rebuilt after each import"""
+        with self._lock:
+            if self._discrepancies is not None:
+                return self._discrepancies
+            generation = self._generation
+        agents, time_records, _ = self.tables
+        starts = {
+            source: time_records.alias(f"{source}_times")
+            for source in ("system", "phone", "agent_disputed")
+        }
+        joined = agents
+        for source, times in starts.items():
+            joined = joined.outerjoin(times, and_(times.c.agent_id == agents.c.id, times.c.source == source))
+        query = (
+            select(agents.c.id, *(times.c.start_seconds for times in starts.values()))
+            .select_from(joined)
+            .order_by(agents.c.id)
+        )
+        with self.engine.connect() as conn:
+            index = DiscrepancyIndex(conn.execute(query).all(), self._describe, self._name_order)
+        with self._lock:
+            # built across a generation swap, it may hold the old roster: serve it, do not keep it
+            if generation == self._generation:
+                self._discrepancies = index
+        return index
+
+    def _describe(self, row_ids):
+        agents = self.tables[0]
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(agents.c.id, agents.c.agent_id, agents.c.name).where(agents.c.id.in_(row_ids)))
+            return {row.id: (row.agent_id, row.name) for row in rows}
+
+    def _name_order(self):
+        agents = self.tables[0]
+        with self.engine.connect() as conn:
+            return conn.execute(select(agents.c.id).order_by(agents.c.name_key, agents.c.id)).scalars().all()
+
+    def time_value(self, value):
+        return parse_time(value)
+
+    def iter_raw(self, chunk_size=64 * 1024):
+        """data.json as stored on disk, in byte chunks; None if the file is missing"""
+        try:
+            f = open(self.path, "rb")
+        except (OSError, TypeError):
+            return None
+
+        def chunks():
+            with f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return chunks()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "agents_count": self.count(),
+            "generation": self._generation,
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "reload_count": self.reload_count,
+            "reload_errors": self.reload_errors,
+            "last_reload_ms": self.last_reload_ms,
+            "last_reload_at": datetime.utcfromtimestamp(self.last_reload_at).isoformat() if self.last_reload_at else None
+        }
+
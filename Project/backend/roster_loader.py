@@ -0,0 +1,192 @@
+import re
+import sys
+import json
+
+
+SECTIONS = ("schedule", "system", "phone", "agent_disputed")
+TIME_FIELDS = ("start_time", "end_time")
+MISSING = object()
+_SLOTS = {
+    section: {field: i * len(TIME_FIELDS) + j for j, field in enumerate(TIME_FIELDS)}
+    for i, section in enumerate(SECTIONS)
+}
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# characters that can continue a number: "-0." decodes as -0 until the next chunk brings "5"
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*")
+
+
+class AgentRecord:
+    """One roster agent, stored compactly.
+
+    The schedule/system/phone/agent_disputed start and end times live in one flat
+    tuple of interned strings (rosters repeat the same timestamps across thousands
+    of agents); keys of any other shape are kept as-is in extra. The record reads
+    like the original dict through get/[]/in, and to_dict() rebuilds it. db_id is
+    the row id in the agents table once the record has been stored there.
+    """
+    __slots__ = ("agent_id", "name", "times", "extra", "keys_", "db_id")
+
+    _shapes = {}
+
+    def __init__(self, agent):
+        self.db_id = None
+        self.agent_id = None
+        self.name = None
+        self.extra = None
+        times = [MISSING] * (len(SECTIONS) * len(TIME_FIELDS))
+        intern = sys.intern
+        for key, value in agent.items():
+            slots = _SLOTS.get(key)
+            if slots is not None and type(value) is dict:
+                for field, v in value.items():
+                    i = slots.get(field)
+                    if i is None or not (type(v) is str or v is None):
+                        break
+                    times[i] = intern(v) if v is not None else None
+                else:
+                    continue
+                # unexpected field or value: keep this section verbatim instead
+                for i in slots.values():
+                    times[i] = MISSING
+            if key == "agent_id":
+                self.agent_id = value
+            elif key == "name":
+                self.name = intern(value) if isinstance(value, str) else value
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+        self.times = tuple(times)
+        keys = tuple(agent)
+        # one shared key tuple per distinct layout
+        self.keys_ = self._shapes.setdefault(keys, keys)
+
+    def _section(self, key):
+        return {field: self.times[i] for field, i in _SLOTS[key].items() if self.times[i] is not MISSING}
+
+    def get(self, key, default=None):
+        if key not in self.keys_:
+            return default
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        if key == "agent_id":
+            return self.agent_id
+        if key == "name":
+            return self.name
+        return self._section(key)
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self.keys_
+
+    def keys(self):
+        return self.keys_
+
+    def time_strings(self):
+        return [value for value in self.times if isinstance(value, str)]
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys_}
+
+
+class JsonStream:
+    """Incremental JSON reader: decodes one value at a time from a sliding window of the file"""
+
+    def __init__(self, f, chunk_size=1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at end of input"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in roster JSON")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            # a number running up to the window edge may continue in the next chunk
+            if not self.eof and _NUMBER_TAIL.fullmatch(self.buf, end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def load_agents(f):
+    """Read the top-level "agents" array of a roster file one agent at a time into AgentRecords.
+
+    Other top-level keys are parsed and dropped; only the agents are kept in memory.
+    """
+    stream = JsonStream(f)
+    agents = []
+    if stream.peek() != "{":
+        stream.value()
+    else:
+        stream.expect("{")
+        if stream.peek() == "}":
+            stream.pos += 1
+        else:
+            while True:
+                key = stream.value()
+                stream.expect(":")
+                if key == "agents" and stream.peek() == "[":
+                    # a repeated key replaces the earlier value, as with json.load
+                    agents = []
+                    stream.expect("[")
+                    if stream.peek() == "]":
+                        stream.pos += 1
+                    else:
+                        while True:
+                            agent = stream.value()
+                            if isinstance(agent, dict):
+                                agents.append(AgentRecord(agent))
+                            if stream.peek() == ",":
+                                stream.pos += 1
+                                continue
+                            stream.expect("]")
+                            break
+                else:
+                    stream.value()
+                    if key == "agents":
+                        agents = []
+                if stream.peek() == ",":
+                    stream.pos += 1
+                    continue
+                stream.expect("}")
+                break
+    if stream.peek() != "":
+        raise ValueError("Extra data after roster JSON")
+    return agents
@@ -0,0 +1,106 @@
+import json
+import zlib
+
+from sqlalchemy import and_, exists, or_, select
+
+
+def export_query(sessions, messages, since=None):
+    """Sessions left-joined to their messages, in session then conversation order.
+
+    The ordering matches ix_messages_session_created (with the rowid as tie-break),
+    so SQLite walks sessions by primary key and each session's messages through the
+    index without sorting. since keeps sessions created or written to at or after it.
+    """
+    query = (
+        select(
+            sessions.c.id, sessions.c.agent, sessions.c.agent_id, sessions.c.created_at,
+            messages.c.id.label("message_id"), messages.c.role, messages.c.content,
+            messages.c.created_at.label("message_created_at")
+        )
+        .select_from(sessions.outerjoin(messages, messages.c.session_id == sessions.c.id))
+        .order_by(sessions.c.id, messages.c.created_at, messages.c.id)
+    )
+    if since is not None:
+        recent = messages.alias("recent")
+        recent_message = (
+            exists()
+            .where(and_(recent.c.session_id == sessions.c.id, recent.c.created_at >= since))
+            .correlate(sessions)
+        )
+        query = query.where(or_(sessions.c.created_at >= since, recent_message))
+    return query
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def iter_sessions(conn, sessions, messages, since=None, batch_size=1000):
+    """Yield one dict per session with its ordered messages.
+
+    Rows are read from a server-side cursor batch_size at a time and only the
+    current session is held in memory, so memory stays flat however large the
+    export.
+    """
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+        export_query(sessions, messages, since))
+    current = None
+    for rows in result.partitions():
+        for row in rows:
+            if current is None or current["id"] != row.id:
+                if current is not None:
+                    yield current
+                current = {
+                    "id": row.id,
+                    "agent": row.agent,
+                    "agent_id": row.agent_id,
+                    "created_at": _isoformat(row.created_at),
+                    "messages": []
+                }
+            if row.message_id is not None:
+                current["messages"].append({
+                    "id": row.message_id,
+                    "role": row.role,
+                    "content": row.content,
+                    "created_at": _isoformat(row.message_created_at)
+                })
+    if current is not None:
+        yield current
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def buffered(lines, chunk_size=64 * 1024):
+    """Join lines into chunks of about chunk_size so a stream is not written a line at a time"""
+    pending = []
+    size = 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending)
+
+
+def gzip_chunks(lines, level=6, chunk_size=64 * 1024):
+    """gzip-compress an iterable of str, yielding compressed chunks of about chunk_size"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            out = compressor.compress(b"".join(pending))
+            pending, size = [], 0
+            if out:
+                yield out
+    out = compressor.compress(b"".join(pending)) + compressor.flush()
+    if out:
+        yield out
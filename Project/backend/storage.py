@@ -0,0 +1,140 @@
+import os
+import time
+import threading
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+# Applied on every new SQLite connection. WAL lets readers run alongside the single writer,
+# and busy_timeout makes writers wait for the lock instead of failing straight away.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY"
+}
+
+# statements at least this slow are counted in slow_statements; the time includes any wait for
+# the write lock (busy_timeout), so a rise under write load usually means lock contention
+SLOW_STATEMENT_MS = float(os.getenv("SQLITE_SLOW_STATEMENT_MS", "50"))
+
+
+class Storage:
+    """SQLite engine with tuned pragmas, request-scoped sessions and timing counters.
+
+    side_engine is a second pool on the same database for lookups a request makes
+    while its session already holds a connection (roster reads). Drawing those from
+    the session pool would deadlock it once every connection belongs to a request
+    waiting for a second one.
+    """
+
+    def __init__(self, db_url, pragmas=None, pool_size=5, max_overflow=10):
+        self.db_url = db_url
+        self.pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+        self.engine = self._create_engine(pool_size, max_overflow)
+        self.side_engine = self._create_engine(pool_size, max_overflow)
+        self.SessionLocal = sessionmaker(bind=self.engine)
+        self.db_session = scoped_session(self.SessionLocal)
+
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.statement_ms_total = 0.0
+        self.statement_ms_max = 0.0
+        self.slow_statements = 0
+        self.slow_statement_ms_total = 0.0
+        self.lock_errors = 0
+        # [seconds] for the request being served, see track_request
+        self._request_db_time = ContextVar("request_db_time", default=None)
+
+    def _create_engine(self, pool_size, max_overflow):
+        engine = create_engine(
+            self.db_url,
+            connect_args={"check_same_thread": False},
+            pool_size=pool_size,
+            max_overflow=max_overflow
+        )
+        event.listen(engine, "connect", self._apply_pragmas)
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "handle_error", self._on_error)
+        return engine
+
+    def _apply_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        request_time = self._request_db_time.get()
+        if request_time is not None:
+            request_time[0] += elapsed_ms / 1000
+        with self._lock:
+            self.statements += 1
+            self.statement_ms_total += elapsed_ms
+            if elapsed_ms > self.statement_ms_max:
+                self.statement_ms_max = elapsed_ms
+            if elapsed_ms >= SLOW_STATEMENT_MS:
+                self.slow_statements += 1
+                self.slow_statement_ms_total += elapsed_ms
+
+    def _on_error(self, exception_context):
+        starts = exception_context.connection.info.get("query_start") if exception_context.connection is not None else None
+        if starts:
+            starts.pop()
+        if "database is locked" in str(exception_context.original_exception):
+            with self._lock:
+                self.lock_errors += 1
+
+    def get_db(self):
+        """Session for the current request, closed by the teardown hook"""
+        return self.db_session()
+
+    def track_request(self):
+        """Start summing statement time for the current request.
+
+        Returns (token, [seconds]); the list keeps growing while statements run in this
+        context until end_request(token).
+        """
+        request_time = [0.0]
+        return self._request_db_time.set(request_time), request_time
+
+    def end_request(self, token):
+        self._request_db_time.reset(token)
+
+    def init_app(self, app):
+        @app.teardown_appcontext
+        def remove_db_session(exception=None):
+            self.db_session.remove()
+
+    @staticmethod
+    def _pool_stats(pool):
+        return {
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+            "status": pool.status()
+        }
+
+    def stats(self):
+        with self._lock:
+            statements = self.statements
+            return {
+                "journal_mode": self.pragmas.get("journal_mode"),
+                "pool": self._pool_stats(self.engine.pool),
+                "side_pool": self._pool_stats(self.side_engine.pool),
+                "statements": statements,
+                "statement_avg_ms": round(self.statement_ms_total / statements, 3) if statements else 0.0,
+                "statement_max_ms": round(self.statement_ms_max, 3),
+                "slow_statements": self.slow_statements,
+                "slow_statement_ms_total": round(self.slow_statement_ms_total, 3),
+                "lock_errors": self.lock_errors
+            }
@@ -0,0 +1,91 @@
+"""Summarize completed interviews into session_summaries, in parallel across CPU cores.
+
+A run only looks at sessions with a message newer than the snapshot of messages the
+last finished run read up to (kept in summary_runs), so re-running it picks up just
+the interviews that finished or changed since; --full redoes every session. The summaries and facts are the ones the chat routes derive.
+
+    python summarize_sessions.py [--full] [--workers N] [--chunk-size 500]
+"""
+import os
+import sys
+import time
+import argparse
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# workers are spawned and import this file, so app (database, roster, model client) is
+# only imported in main(); the workers need nothing but interview_summaries
+from interview_summaries import (
+    summarize_interview, message_snapshot, summary_watermark, record_run, changed_session_ids, load_completed,
+    store_summaries, summary_row
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="summarize every completed session, not just changed ones")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="sessions read and written per batch")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        import app
+        app.create_app()
+    sessions = app.ChatSession.__table__
+    messages = app.ChatMessage.__table__
+    summaries = app.SessionSummary.__table__
+    runs = app.SummaryRun.__table__
+
+    def agent_context(session):
+        record = app.session_agent(session)
+        return record.to_dict() if record else {}
+
+    def write(completed, results):
+        rows = [summary_row(session, history, result) for (session, history), result in zip(completed, results)]
+        with app.engine.begin() as conn:
+            store_summaries(conn, summaries, rows)
+        return len(rows)
+
+    started = time.perf_counter()
+    started_at = datetime.utcnow()
+    with app.engine.connect() as conn:
+        # taken first: the run reads up to it, and only a run that finishes records it
+        snapshot = message_snapshot(conn, messages)
+        since = 0 if args.full else summary_watermark(conn, runs)
+        session_ids = changed_session_ids(conn, sessions, messages, since, snapshot)
+
+    summarized = 0
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # read and submit the next chunk while the workers are still busy with the previous one
+        pending = None
+        for start in range(0, len(session_ids), args.chunk_size):
+            with app.engine.connect() as conn:
+                completed = list(load_completed(
+                    conn, sessions, messages, session_ids[start:start + args.chunk_size], snapshot
+                ))
+            jobs = [
+                (session.id, [{"role": row.role, "content": row.content} for row in history], agent_context(session))
+                for session, history in completed
+            ]
+            results = pool.map(summarize_interview, jobs, chunksize=max(1, len(jobs) // (args.workers * 4)))
+            if pending is not None:
+                summarized += write(*pending)
+            pending = (completed, results)
+        if pending is not None:
+            summarized += write(*pending)
+
+    with app.engine.begin() as conn:
+        record_run(conn, runs, snapshot, args.full, len(session_ids), summarized, started_at)
+
+    elapsed = time.perf_counter() - started
+    rate = summarized / elapsed if elapsed else 0.0
+    print(f"Summarized {summarized} completed of {len(session_ids)} {'' if args.full else 'changed '}sessions "
+          f"in {elapsed:.1f}s ({rate:.0f} sessions/s, {args.workers} workers)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, OPEN, HALF_OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Neutral(Exception):
+    pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def breaker(**kwargs):
+    options = dict(failure_rate_threshold=0.5, min_calls=4, window_size=4, open_seconds=30.0,
+                   neutral_exceptions=(Neutral,))
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def fail(cb, times=1):
+    for _ in range(times):
+        cb.record_failure()
+
+
+def open_breaker(cb):
+    fail(cb, cb.min_calls)
+    assert cb.state == OPEN
+
+
+def test_stays_closed_until_min_calls(clock):
+    cb = breaker()
+    fail(cb, 3)
+    assert cb.state == CLOSED and cb.allow()
+    cb.record_failure()
+    assert cb.state == OPEN
+    assert cb.opened_count == 1
+
+
+def test_failure_rate_below_threshold_stays_closed(clock):
+    cb = breaker(failure_rate_threshold=0.75)
+    cb.record_success()
+    fail(cb, 2)
+    cb.record_success()
+    assert cb.state == CLOSED
+    # the window rolls: the oldest success drops out and the rate reaches 3/4
+    cb.record_failure()
+    assert cb.state == OPEN
+
+
+def test_open_rejects_until_open_seconds(clock):
+    cb = breaker()
+    open_breaker(cb)
+    assert not cb.allow()
+    clock[0] += 29.9
+    assert not cb.allow()
+    assert cb.rejected == 2
+    assert cb.stats()["state"] == OPEN
+    clock[0] += 0.1
+    assert cb.stats()["state"] == HALF_OPEN
+
+
+def test_half_open_lets_one_probe_through(clock):
+    cb = breaker()
+    open_breaker(cb)
+    clock[0] += 30
+    assert cb.allow()
+    assert cb.state == HALF_OPEN
+    assert not cb.allow()
+
+
+def test_probe_success_closes_and_clears_the_window(clock):
+    cb = breaker()
+    open_breaker(cb)
+    clock[0] += 30
+    assert cb.allow()
+    cb.record_success()
+    assert cb.state == CLOSED
+    assert cb.stats()["window_calls"] == 0
+    # old failures do not reopen it on the next one
+    cb.record_failure()
+    assert cb.state == CLOSED
+
+
+def test_probe_failure_reopens(clock):
+    cb = breaker()
+    open_breaker(cb)
+    clock[0] += 30
+    assert cb.allow()
+    cb.record_failure()
+    assert cb.state == OPEN
+    assert cb.opened_count == 2
+    assert not cb.allow()
+
+
+def test_released_probe_lets_the_next_caller_probe(clock):
+    cb = breaker()
+    open_breaker(cb)
+    clock[0] += 30
+    assert cb.allow()
+    cb.release_probe()
+    assert cb.allow()
+
+
+def test_abandoned_probe_is_replaced_after_open_seconds(clock):
+    cb = breaker()
+    open_breaker(cb)
+    clock[0] += 30
+    assert cb.allow()
+    clock[0] += 29
+    assert not cb.allow()
+    clock[0] += 1
+    assert cb.allow()
+
+
+def test_call_records_outcomes(clock):
+    cb = breaker()
+    assert cb.call(lambda: "ok") == "ok"
+
+    def boom():
+        raise ValueError("down")
+
+    with pytest.raises(ValueError):
+        cb.call(boom)
+    assert (cb.successes, cb.failures) == (1, 1)
+
+
+def test_call_raises_circuit_open_without_calling(clock):
+    cb = breaker()
+    open_breaker(cb)
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        cb.call(lambda: calls.append(1))
+    assert calls == []
+
+
+def test_neutral_exception_counts_as_neither_and_frees_the_probe(clock):
+    cb = breaker()
+    open_breaker(cb)
+    clock[0] += 30
+
+    def refused():
+        raise Neutral()
+
+    with pytest.raises(Neutral):
+        cb.call(refused)
+    assert cb.state == HALF_OPEN
+    assert cb.failures == cb.min_calls and cb.successes == 0
+    assert cb.allow()
+
+
+def test_acall_follows_the_same_rules(clock):
+    cb = breaker()
+
+    async def ok():
+        return "ok"
+
+    async def boom():
+        raise ValueError("down")
+
+    assert asyncio.run(cb.acall(ok)) == "ok"
+    # with the success still in the window, three failures make 3/4
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            asyncio.run(cb.acall(boom))
+    assert cb.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(cb.acall(ok))
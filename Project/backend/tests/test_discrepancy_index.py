@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+import discrepancy_index
+from discrepancy_index import SCENARIOS, SORT_KEYS, DiscrepancyIndex, classify_scenario
+
+
+def roster(count, seed=7):
+    """(row id, system, phone, edited start seconds) rows with gaps in the ids and some missing times"""
+    rng = random.Random(seed)
+    rows, names = [], {}
+    row_id = 0
+    for _ in range(count):
+        row_id += rng.randint(1, 3)
+        base = rng.randint(7 * 3600, 10 * 3600)
+
+        def near():
+            if rng.random() < 0.1:
+                return None
+            return max(0, base + rng.choice([0, 1, 4, 9, 12, 16, 25, 40, 90]) * rng.choice([-60, 60]) + rng.randint(0, 59))
+
+        rows.append((row_id, near(), near(), near()))
+        names[row_id] = (f"A{row_id:05d}", rng.choice(["Ada", "Bea", "Cy", "Di", "Ed"]) + f" {rng.randint(0, 99)}")
+    return rows, names
+
+
+def build(rows, names):
+    def describe(row_ids):
+        return {row_id: names[row_id] for row_id in row_ids}
+
+    def name_order():
+        return sorted(names, key=lambda row_id: (names[row_id][1], row_id))
+
+    return DiscrepancyIndex(rows, describe, name_order)
+
+
+@pytest.fixture
+def indexes(monkeypatch):
+    pytest.importorskip("numpy")
+    rows, names = roster(500)
+    vectorized = build(rows, names)
+    monkeypatch.setattr(discrepancy_index, "_load_numpy", lambda: None)
+    python = build(rows, names)
+    assert vectorized.vectorized and not python.vectorized
+    return rows, vectorized, python
+
+
+def test_python_path_matches_classify_scenario():
+    rows, names = roster(300, seed=3)
+    index = build(rows, names)
+    for i, (_, *seconds) in enumerate(rows):
+        system, phone, edited = (s // 60 if s is not None else None for s in seconds)
+
+        def diff(a, b):
+            return abs(a - b) if a is not None and b is not None else None
+
+        expected = classify_scenario(
+            system is not None, phone is not None, edited is not None,
+            diff(edited, system), diff(phone, system), diff(phone, edited))
+        assert SCENARIOS[int(index.scenario[i])] == expected
+
+
+def test_columns_and_counts_match(indexes):
+    _, vectorized, python = indexes
+    assert vectorized.scenario.tolist() == python.scenario
+    assert vectorized.start_diff.tolist() == python.start_diff
+    assert vectorized.phone_system_diff.tolist() == python.phone_system_diff
+    assert vectorized.phone_edited_diff.tolist() == python.phone_edited_diff
+    assert vectorized.scenario_counts == python.scenario_counts
+    assert sum(python.scenario_counts.values()) == len(python)
+    # the sample reaches every branch of the classification but system_vs_edited_large: with the
+    # phone under 5 minutes from the system start and the edit over 30, phone vs edit is over 25
+    # minutes, which large_discrepancy_both takes first
+    reached = {name for name, count in python.scenario_counts.items() if count}
+    assert reached == set(SCENARIOS) - {"system_vs_edited_large"}
+
+
+@pytest.mark.parametrize("sort", SORT_KEYS)
+@pytest.mark.parametrize("descending", [True, False])
+def test_queries_match(indexes, sort, descending):
+    _, vectorized, python = indexes
+    for scenario in (None,) + SCENARIOS:
+        for min_diff in (None, 0, 16, 31):
+            for offset, limit in ((0, 50), (20, 7), (490, 50)):
+                options = dict(scenario=scenario, min_diff=min_diff, sort=sort, descending=descending,
+                               offset=offset, limit=limit)
+                assert vectorized.query(**options) == python.query(**options), options
+
+
+def test_missing_differences_sort_last_both_ways(indexes):
+    _, vectorized, python = indexes
+    for index in (vectorized, python):
+        for descending in (True, False):
+            total, rows = index.query(sort="phone_diff", descending=descending, limit=len(index))
+            diffs = [row["phone_system_diff"] for row in rows]
+            known = [d for d in diffs if d is not None]
+            assert diffs == known + [None] * (total - len(known))
+            assert known == sorted(known, reverse=descending)
+
+
+def test_empty_roster_uses_the_python_path():
+    index = build([], {})
+    assert not index.vectorized
+    assert index.query() == (0, [])
+    assert set(index.scenario_counts.values()) == {0}
@@ -0,0 +1,166 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask
+from werkzeug.http import http_date
+
+from http_cache import GZIP_MIN_SIZE, BodyCache, CachedBody, cache_control, cached_response
+
+MODIFIED = datetime(2025, 10, 15, 9, 30, 15, 123456, tzinfo=timezone.utc)
+LARGE = json.dumps({"agents": [{"name": f"Agent {i}", "agent_id": f"A{i:05d}"} for i in range(50)]}).encode()
+SMALL = b'{"name": "Agent 1"}'
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    entries = {
+        "large": CachedBody.build([LARGE[:100], LARGE[100:]], last_modified=MODIFIED),
+        "small": CachedBody.build([SMALL], last_modified=MODIFIED),
+        "streamed": CachedBody.build([LARGE], keep_body=False),
+    }
+
+    @app.route("/<name>")
+    def serve(name):
+        return cached_response(entries[name], max_age=60, stream=lambda: iter([LARGE]))
+
+    app.entries = entries
+    return app.test_client()
+
+
+def test_build_hashes_and_compresses_in_one_pass():
+    whole = CachedBody.build([LARGE])
+    chunked = CachedBody.build([LARGE[i:i + 7] for i in range(0, len(LARGE), 7)])
+    assert chunked.etag == whole.etag
+    assert chunked.body == LARGE
+    assert gzip.decompress(chunked.gzip_body) == LARGE
+    assert CachedBody.build([b"x" * (GZIP_MIN_SIZE - 1)]).gzip_body is None
+    assert CachedBody.build([LARGE], keep_body=False).body is None
+
+
+def test_identity_without_accept_encoding(client):
+    response = client.get("/large")
+    etag = client.application.entries["large"].etag
+    assert response.status_code == 200
+    assert response.data == LARGE
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == f'"{etag}"'
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["Cache-Control"] == "public, max-age=60"
+    assert response.headers["Last-Modified"] == http_date(MODIFIED)
+
+
+@pytest.mark.parametrize("accept", ["gzip", "gzip, deflate, br", "br;q=1.0, gzip;q=0.5", "*"])
+def test_gzip_when_accepted(client, accept):
+    response = client.get("/large", headers={"Accept-Encoding": accept})
+    etag = client.application.entries["large"].etag
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == f'"{etag}-gzip"'
+    assert gzip.decompress(response.data) == LARGE
+
+
+@pytest.mark.parametrize("accept", ["gzip;q=0", "deflate", "identity"])
+def test_identity_when_gzip_is_refused(client, accept):
+    response = client.get("/large", headers={"Accept-Encoding": accept})
+    assert "Content-Encoding" not in response.headers
+    assert response.data == LARGE
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.data == SMALL
+
+
+def test_streamed_entry_serves_from_stream_or_gzip(client):
+    assert client.get("/streamed").data == LARGE
+    response = client.get("/streamed", headers={"Accept-Encoding": "gzip"})
+    assert gzip.decompress(response.data) == LARGE
+    assert "Last-Modified" not in response.headers
+
+
+@pytest.mark.parametrize("gzip_etag, accept", [(False, None), (True, "gzip"), (True, None), (False, "gzip")])
+def test_either_etag_revalidates_either_encoding(client, gzip_etag, accept):
+    etag = client.application.entries["large"].etag + ("-gzip" if gzip_etag else "")
+    headers = {"If-None-Match": f'"{etag}"'}
+    if accept:
+        headers["Accept-Encoding"] = accept
+    response = client.get("/large", headers=headers)
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"].endswith('-gzip"') == (accept == "gzip")
+    assert response.headers["Cache-Control"] == "public, max-age=60"
+
+
+def test_weak_and_listed_etags_revalidate(client):
+    etag = client.application.entries["large"].etag
+    assert client.get("/large", headers={"If-None-Match": f'W/"{etag}"'}).status_code == 304
+    assert client.get("/large", headers={"If-None-Match": f'"other", "{etag}"'}).status_code == 304
+    assert client.get("/large", headers={"If-None-Match": "*"}).status_code == 304
+
+
+def test_stale_etag_gets_the_body(client):
+    response = client.get("/large", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.data == LARGE
+
+
+def test_if_modified_since(client):
+    # Last-Modified has whole seconds, so the exact value it sent back must revalidate
+    assert client.get("/large", headers={"If-Modified-Since": http_date(MODIFIED)}).status_code == 304
+    later = http_date(MODIFIED + timedelta(hours=1))
+    assert client.get("/large", headers={"If-Modified-Since": later}).status_code == 304
+    earlier = http_date(MODIFIED - timedelta(seconds=1))
+    assert client.get("/large", headers={"If-Modified-Since": earlier}).status_code == 200
+    # no Last-Modified to compare against
+    assert client.get("/streamed", headers={"If-Modified-Since": later}).status_code == 200
+
+
+def test_if_none_match_wins_over_if_modified_since(client):
+    headers = {"If-None-Match": '"stale"', "If-Modified-Since": http_date(MODIFIED + timedelta(hours=1))}
+    assert client.get("/large", headers=headers).status_code == 200
+
+
+def test_cache_control():
+    assert cache_control(0) == "no-cache"
+    assert cache_control(30) == "public, max-age=30"
+
+
+def test_body_cache_is_per_version_and_bounded():
+    cache = BodyCache(max_entries=2)
+    built = []
+
+    def build(key):
+        def make():
+            built.append(key)
+            return CachedBody.build([key.encode()])
+        return make
+
+    first = cache.get(1, "a", build("a"))
+    assert cache.get(1, "a", build("a")) is first
+    cache.get(1, "b", build("b"))
+    cache.get(1, "c", build("c"))
+    # "a" was least recently used
+    cache.get(1, "a", build("a"))
+    assert built == ["a", "b", "c", "a"]
+
+    # a new version drops the old entries
+    assert cache.get(2, "c", build("c")) is not None
+    assert built[-1] == "c"
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 5
+
+
+def test_body_cache_does_not_keep_an_entry_built_for_an_old_version():
+    cache = BodyCache()
+
+    def build():
+        # the version moves on while this entry is being built
+        cache.get(2, "other", lambda: CachedBody.build([b"new"]))
+        return CachedBody.build([b"old"])
+
+    cache.get(1, "key", build)
+    assert cache.stats()["entries"] == 1
+    assert cache.get(2, "key", lambda: CachedBody.build([b"new"])).body == b"new"
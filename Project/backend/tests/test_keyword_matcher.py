@@ -0,0 +1,61 @@
+import random
+
+from conversation_manager import ConversationManager
+from keyword_matcher import KeywordMatcher, PatternSet
+
+TABLES = {
+    **ConversationManager.fact_keywords,
+    **ConversationManager.summary_keywords,
+    "confirmation": ConversationManager.confirmation_words,
+}
+
+
+def substring_categories(tables, text):
+    """The checks KeywordMatcher replaced: `any(word in text for word in words)` per table"""
+    lowered = text.lower()
+    return frozenset(category for category, words in tables.items() if any(word in lowered for word in words))
+
+
+def test_overlapping_keywords_match_every_table():
+    matcher = KeywordMatcher({"a": ["team lead"], "b": ["team"], "c": ["lead"], "d": ["arrived early"], "e": ["early"]})
+    assert matcher.categories("my team lead") == {"a", "b", "c"}
+    assert matcher.categories("I arrived early") == {"d", "e"}
+    # substrings count, as with `in`
+    assert matcher.categories("the leader") == {"c"}
+    assert matcher.categories("Team meeting") == {"b"}
+
+
+def test_no_match_empty_text_and_empty_tables():
+    matcher = KeywordMatcher({"a": ["meeting"]})
+    assert matcher.categories("nothing here") == frozenset()
+    assert matcher.categories("") == frozenset()
+    assert matcher.categories(None) == frozenset()
+    assert KeywordMatcher({}).categories("meeting") == frozenset()
+
+
+def test_keywords_with_regex_characters_are_literal():
+    matcher = KeywordMatcher({"a": ["9 a.m."], "b": ["(ok)"]})
+    assert matcher.categories("at 9 a.m. sharp") == {"a"}
+    assert matcher.categories("at 9 amm") == frozenset()
+    assert matcher.categories("that's (ok) then") == {"b"}
+
+
+def test_same_categories_as_substring_checks_on_random_text():
+    rng = random.Random(1234)
+    matcher = KeywordMatcher(TABLES)
+    words = [word for keywords in TABLES.values() for word in keywords]
+    filler = ["i", "was", "at", "the", "office", "x", "lea", "tea", "confirm", "9:00", "AM", "no", "one"]
+    for _ in range(2000):
+        pieces = [rng.choice(words if rng.random() < 0.3 else filler) for _ in range(rng.randint(0, 12))]
+        # join some pieces without a space so keywords also appear inside and across words
+        text = "".join(piece + rng.choice([" ", " ", ""]) for piece in pieces)
+        if rng.random() < 0.5:
+            text = text.upper()
+        assert matcher.categories(text) == substring_categories(TABLES, text), text
+
+
+def test_pattern_set_returns_indexes_of_matching_patterns():
+    patterns = PatternSet(["what.*activity", "witness", "phone.*wrong"])
+    assert patterns.matches("What ACTIVITY and any witness?") == {0, 1}
+    assert patterns.matches("the phone was wrong") == {2}
+    assert patterns.matches("") == frozenset()
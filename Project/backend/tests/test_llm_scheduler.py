@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+from llm_scheduler import LLMOverloaded, LLMScheduler, PRIORITY_FIRST_TURN, PRIORITY_FOLLOW_UP
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_free_slots_are_taken_without_queuing():
+    async def main():
+        loop = asyncio.get_running_loop()
+        scheduler = LLMScheduler(max_in_flight=2)
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        assert scheduler.in_flight == 2
+        scheduler.release()
+        scheduler.release()
+        assert scheduler.in_flight == 0
+        assert scheduler.stats()["admitted"] == 2
+
+    run(main())
+
+
+def test_waiters_run_by_priority_then_fifo():
+    async def main():
+        loop = asyncio.get_running_loop()
+        scheduler = LLMScheduler(max_in_flight=1)
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        order = []
+
+        async def wait(name, priority):
+            await scheduler.acquire(priority, loop)
+            order.append(name)
+
+        tasks = [
+            asyncio.create_task(wait("follow-up 1", PRIORITY_FOLLOW_UP)),
+            asyncio.create_task(wait("follow-up 2", PRIORITY_FOLLOW_UP)),
+            asyncio.create_task(wait("first turn", PRIORITY_FIRST_TURN)),
+        ]
+        await settle()
+        assert scheduler.stats()["queued"] == {PRIORITY_FIRST_TURN: 1, PRIORITY_FOLLOW_UP: 2}
+
+        for _ in tasks:
+            scheduler.release()
+            await settle()
+        assert order == ["first turn", "follow-up 1", "follow-up 2"]
+        # each release handed its slot straight over
+        assert scheduler.in_flight == 1
+        scheduler.release()
+        assert scheduler.in_flight == 0
+        assert scheduler.stats()["queued"] == {}
+
+    run(main())
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    async def main():
+        loop = asyncio.get_running_loop()
+        scheduler = LLMScheduler(max_in_flight=1)
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire(PRIORITY_FOLLOW_UP, loop), 0.01)
+        assert scheduler.stats()["queued"] == {}
+
+        # the dead heap entry is skipped and the slot comes back
+        scheduler.release()
+        assert scheduler.in_flight == 0
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        assert scheduler.in_flight == 1
+
+    run(main())
+
+
+def test_cancelled_after_handover_gives_the_slot_back():
+    async def main():
+        loop = asyncio.get_running_loop()
+        scheduler = LLMScheduler(max_in_flight=1)
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        waiter = asyncio.create_task(scheduler.acquire(PRIORITY_FOLLOW_UP, loop))
+        await settle()
+
+        scheduler.release()  # hands the slot to the waiter...
+        waiter.cancel()  # ...which is cancelled before it gets to use it
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.in_flight == 0
+
+    run(main())
+
+
+def test_projected_wait_over_budget_is_refused():
+    async def main():
+        loop = asyncio.get_running_loop()
+        scheduler = LLMScheduler(max_in_flight=1, latency_budget=1.5)
+        # no service time measured yet: never shed
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        scheduler.release(service_seconds=1.0)
+        assert scheduler.projected_wait(PRIORITY_FOLLOW_UP) == 0.0
+
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        queued = asyncio.create_task(scheduler.acquire(PRIORITY_FOLLOW_UP, loop))
+        await settle()
+        # one follow-up ahead: a follow-up would wait 2s, a first turn 1s
+        assert scheduler.projected_wait(PRIORITY_FOLLOW_UP) == pytest.approx(2.0)
+        assert scheduler.projected_wait(PRIORITY_FIRST_TURN) == pytest.approx(1.0)
+        with pytest.raises(LLMOverloaded):
+            await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        first_turn = asyncio.create_task(scheduler.acquire(PRIORITY_FIRST_TURN, loop))
+        await settle()
+
+        stats = scheduler.stats()
+        assert stats["degraded"] == 1
+        assert stats["degraded_by_priority"] == {PRIORITY_FOLLOW_UP: 1}
+        assert stats["degradation_rate"] == pytest.approx(1 / 5)
+
+        for _ in range(3):
+            scheduler.release()
+            await settle()
+        await asyncio.gather(queued, first_turn)
+        assert scheduler.in_flight == 0
+
+    run(main())
+
+
+def test_service_time_is_a_moving_average():
+    scheduler = LLMScheduler(max_in_flight=1, smoothing=0.5)
+    scheduler.in_flight = 1
+    scheduler.release(service_seconds=2.0)
+    assert scheduler.service_seconds == 2.0
+    scheduler.in_flight = 1
+    scheduler.release(service_seconds=4.0)
+    assert scheduler.service_seconds == pytest.approx(3.0)
+    assert scheduler.stats()["service_avg_ms"] == pytest.approx(3000.0)
+
+
+def test_no_budget_never_sheds():
+    async def main():
+        loop = asyncio.get_running_loop()
+        scheduler = LLMScheduler(max_in_flight=1)
+        scheduler.service_seconds = 100.0
+        await scheduler.acquire(PRIORITY_FOLLOW_UP, loop)
+        waiter = asyncio.create_task(scheduler.acquire(PRIORITY_FOLLOW_UP, loop))
+        await settle()
+        scheduler.release()
+        await waiter
+        scheduler.release()
+        assert scheduler.stats()["degraded"] == 0
+
+    run(main())
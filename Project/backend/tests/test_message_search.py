@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from message_search import create_search_index, match_expression, search_messages
+
+MESSAGES = [
+    (1, "Alice", "I was in a meeting with my supervisor"),
+    (1, "Alice", 'She said "near enough" and left'),
+    (2, "Bob", "NEAR(meeting supervisor) is what I typed"),
+    (2, "Bob", "The phone glitch, or maybe an error"),
+    (2, "Bob", "I arrived early for training"),
+]
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("meeting", '"meeting"'),
+    ("meeting supervisor", '"meeting" "supervisor"'),
+    ('"team lead"', '"team lead"'),
+    # a quote inside a term is doubled, an unbalanced one is kept as text
+    ('say"what', '"say""what"'),
+    ('"unclosed phrase', '"""unclosed" "phrase"'),
+    # a trailing * is a prefix query, anywhere else it is text
+    ("train*", '"train"*'),
+    ("train**", '"train"*'),
+    ("*", None),
+    ("a*b", '"a*b"'),
+    ('"train*"', '"train*"'),
+    # FTS5 operators and syntax are searched for as words
+    ("NEAR(meeting supervisor)", '"NEAR(meeting" "supervisor)"'),
+    ("meeting AND NOT supervisor", '"meeting" "AND" "NOT" "supervisor"'),
+    ("content:meeting", '"content:meeting"'),
+    ("^start", '"^start"'),
+    # a bare upper-case OR joins terms; leading, trailing and repeated ones are dropped
+    ("glitch OR error", '"glitch" OR "error"'),
+    ("OR glitch OR OR error OR", '"glitch" OR "error"'),
+    ("glitch or error", '"glitch" "or" "error"'),
+    ("OR", None),
+    ('"" "  "', None),
+    ("", None),
+    (None, None),
+])
+def test_match_expression(q, expected):
+    assert match_expression(q) == expected
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sessions (id INTEGER PRIMARY KEY, agent TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY, session_id INTEGER, role TEXT, content TEXT, created_at DATETIME)"
+        ))
+        create_search_index(conn)
+        for session_id, agent in {(s, a) for s, a, _ in MESSAGES}:
+            conn.execute(text("INSERT INTO sessions (id, agent) VALUES (:id, :agent)"), {"id": session_id, "agent": agent})
+        for session_id, _, content in MESSAGES:
+            conn.execute(
+                text("INSERT INTO messages (session_id, role, content, created_at) VALUES (:s, 'user', :c, :t)"),
+                {"s": session_id, "c": content, "t": datetime(2025, 10, 15, 9)}
+            )
+    with engine.connect() as conn:
+        yield conn
+    engine.dispose()
+
+
+def found(conn, q, **filters):
+    rows, _, _ = search_messages(conn, q, **filters)
+    return sorted(row["message_id"] for row in rows)
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("meeting supervisor", [1, 3]),
+    # the words of a term are one phrase: "near meeting" is only in message 3
+    ("NEAR(meeting supervisor)", [3]),
+    ('"near enough"', [2]),
+    ('said"near', [2]),
+    ('"near enough', [2]),
+    ("glitch OR training", [4, 5]),
+    ("glitch or error", [4]),
+    ("train*", [5]),
+    ("meeting AND NOT supervisor", []),
+    ("content:meeting", []),
+    ("*", []),
+])
+def test_hostile_queries_run_as_text(conn, q, expected):
+    assert found(conn, q) == expected
+
+
+def test_agent_filter_is_quoted_too(conn):
+    assert found(conn, "meeting", agent="Alice") == [1]
+    assert found(conn, "meeting", agent='Bob" OR "Alice') == []
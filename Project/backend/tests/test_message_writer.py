@@ -0,0 +1,204 @@
+import json
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, DateTime, create_engine, select
+
+import message_writer
+from message_writer import MessageWriter
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'writer.db'}", connect_args={"check_same_thread": False})
+    metadata = MetaData()
+    sessions = Table(
+        "sessions", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("conversation_state", Text, default="{}")
+    )
+    messages = Table(
+        "messages", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("session_id", Integer, nullable=False),
+        Column("role", String(32), nullable=False),
+        Column("content", Text, nullable=False),
+        Column("created_at", DateTime)
+    )
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(sessions.insert(), [{"id": 1, "conversation_state": "{}"}, {"id": 2, "conversation_state": "{}"}])
+    yield engine, messages, sessions
+    engine.dispose()
+
+
+@pytest.fixture
+def make_writer(db):
+    engine, messages, sessions = db
+    writers = []
+
+    def make(**kwargs):
+        writer = MessageWriter(engine, messages, sessions, **kwargs)
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.close()
+
+
+def contents(db):
+    engine, messages, _ = db
+    with engine.connect() as conn:
+        return conn.execute(select(messages.c.session_id, messages.c.content).order_by(messages.c.id)).all()
+
+
+def state(db, session_id):
+    engine, _, sessions = db
+    with engine.connect() as conn:
+        return json.loads(conn.execute(
+            select(sessions.c.conversation_state).where(sessions.c.id == session_id)
+        ).scalar())
+
+
+def test_writes_arriving_together_share_one_batch(db, make_writer):
+    writer = make_writer(max_delay=0.2, max_batch=50)
+    futures = [writer.add_message(1, "user", f"m{i}", datetime.utcnow()) for i in range(5)]
+    futures.append(writer.update_state(1, "tracker", json.dumps({"asked": ["q1"]})))
+
+    ids = [future.result(timeout=5) for future in futures[:5]]
+    assert futures[5].result(timeout=5) is None
+    assert ids == sorted(ids) and len(set(ids)) == 5
+    assert [row.content for row in contents(db)] == [f"m{i}" for i in range(5)]
+    assert state(db, 1) == {"tracker": {"asked": ["q1"]}}
+    stats = writer.stats()
+    assert stats["batches"] == 1 and stats["writes"] == 6 and stats["max_batch_seen"] == 6
+
+
+def test_max_batch_splits_a_burst(make_writer):
+    writer = make_writer(max_delay=0.2, max_batch=2)
+    futures = [writer.add_message(1, "user", f"m{i}", datetime.utcnow()) for i in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+    assert writer.stats()["max_batch_seen"] <= 2
+    assert writer.stats()["batches"] >= 3
+
+
+def test_failed_batch_falls_back_to_single_writes(db, make_writer):
+    writer = make_writer(max_delay=0.2, max_batch=50)
+    good = writer.add_message(1, "user", "before", datetime.utcnow())
+    bad = writer.add_message(1, "user", None, datetime.utcnow())  # content is NOT NULL
+    later = writer.add_message(2, "user", "after", datetime.utcnow())
+
+    assert good.result(timeout=5) is not None
+    assert later.result(timeout=5) is not None
+    with pytest.raises(Exception):
+        bad.result(timeout=5)
+    assert [tuple(row) for row in contents(db)] == [(1, "before"), (2, "after")]
+    assert writer.stats()["failures"] == 1
+    # the failed write still counts as done, so nobody waits on it forever
+    assert writer.flush_session(1, timeout=1)
+
+
+def test_pending_counts_are_per_session(make_writer):
+    writer = make_writer(max_delay=0.5, max_batch=50)
+    writer.add_message(1, "user", "a", datetime.utcnow())
+    writer.add_message(1, "assistant", "b", datetime.utcnow())
+    last = writer.add_message(2, "user", "c", datetime.utcnow())
+
+    with writer._cond:
+        assert writer._pending == {1: 2, 2: 1}
+    assert writer.stats()["queued"] == 3
+
+    assert writer.flush_session(2, timeout=5)
+    assert last.done()
+    with writer._cond:
+        assert writer._pending == {}
+    # nothing queued for a session: returns straight away
+    assert writer.flush_session(3, timeout=0)
+
+
+def test_flush_session_times_out_while_writes_are_queued(make_writer):
+    writer = make_writer(max_delay=1.0, max_batch=50)
+    writer.add_message(1, "user", "slow", datetime.utcnow())
+    assert not writer.flush_session(1, timeout=0.05)
+    assert writer.flush_session(1, timeout=5)
+
+
+def test_close_drains_the_queue(db, make_writer):
+    writer = make_writer(max_delay=5.0, max_batch=50)
+    futures = [writer.add_message(1, "user", f"m{i}", datetime.utcnow()) for i in range(3)]
+    writer.close()
+
+    assert all(future.done() for future in futures)
+    assert len(contents(db)) == 3
+    with pytest.raises(RuntimeError):
+        writer.add_message(1, "user", "late", datetime.utcnow())
+    writer.close()  # a second close is a no-op
+
+
+def test_stop_marker_inside_a_batch_window_does_not_wait_it_out(db, make_writer):
+    writer = make_writer(max_delay=30.0, max_batch=50)
+    first = writer.add_message(1, "user", "first", datetime.utcnow())
+    # a submit that passed the closed check just before close() lands after the marker
+    writer._queue.put(message_writer._STOP)
+    behind = writer.add_message(2, "user", "behind", datetime.utcnow())
+    writer._thread.join(5)
+
+    assert not writer._thread.is_alive()
+    assert first.result(timeout=0) is not None
+    assert behind.result(timeout=0) is not None
+    assert [tuple(row) for row in contents(db)] == [(1, "first"), (2, "behind")]
+
+
+def test_writes_queued_behind_the_stop_marker_are_committed(db, make_writer):
+    writer = make_writer(max_delay=0.001, max_batch=50)
+    in_batch, release = threading.Event(), threading.Event()
+    write_batch = writer._write_batch
+
+    def held_write_batch(batch):
+        in_batch.set()
+        release.wait(5)
+        write_batch(batch)
+
+    writer._write_batch = held_write_batch
+    first = writer.add_message(1, "user", "first", datetime.utcnow())
+    assert in_batch.wait(5)
+    # the marker is next in the queue, with a write behind it
+    writer._queue.put(message_writer._STOP)
+    behind = writer.add_message(2, "user", "behind", datetime.utcnow())
+    release.set()
+    writer._thread.join(5)
+
+    assert not writer._thread.is_alive()
+    assert first.result(timeout=0) is not None
+    assert behind.result(timeout=0) is not None
+    assert [tuple(row) for row in contents(db)] == [(1, "first"), (2, "behind")]
+    assert writer.flush(timeout=0)
+
+
+def test_concurrent_submitters_all_land(db, make_writer):
+    writer = make_writer(max_delay=0.01, max_batch=16)
+    futures = []
+    lock = threading.Lock()
+
+    def submit(session_id):
+        for i in range(20):
+            future = writer.add_message(session_id, "user", f"{session_id}-{i}", datetime.utcnow())
+            with lock:
+                futures.append(future)
+
+    threads = [threading.Thread(target=submit, args=(sid,)) for sid in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        future.result(timeout=5)
+
+    rows = contents(db)
+    assert len(rows) == 40
+    # submission order is kept within a session
+    for sid in (1, 2):
+        assert [row.content for row in rows if row.session_id == sid] == [f"{sid}-{i}" for i in range(20)]
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from metrics import MetricsRegistry
+
+
+def registry(**kwargs):
+    registry = MetricsRegistry(**kwargs)
+    registry.counter("requests_total", "Requests", ("route",)).inc(route="/a")
+    registry.gauge("queued", "Queued", callback=lambda: 2)
+    registry.histogram("latency_seconds", "Latency", buckets=(0.1,)).observe(0.05)
+    return registry
+
+
+def test_render_without_worker_label():
+    assert registry().render().splitlines()[2:] == [
+        'requests_total{route="/a"} 1',
+        "# HELP queued Queued",
+        "# TYPE queued gauge",
+        "queued 2",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="+Inf"} 1',
+        "latency_seconds_sum 0.05",
+        "latency_seconds_count 1",
+    ]
+
+
+def test_every_sample_carries_the_worker_pid():
+    pid = f'worker_pid="{os.getpid()}"'
+    samples = [line for line in registry(worker_label="worker_pid").render().splitlines() if not line.startswith("#")]
+    assert samples[0] == f'requests_total{{route="/a",{pid}}} 1'
+    assert samples[1] == f"queued{{{pid}}} 2"
+    assert samples[2] == f'latency_seconds_bucket{{{pid},le="0.1"}} 1'
+    assert all(pid in sample for sample in samples)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_worker_pid_is_read_after_fork():
+    # the registry is built in the preloading master, so the pid must be the forked worker's
+    metrics = registry(worker_label="worker_pid")
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.write(write_fd, metrics.render().encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        rendered = f.read().decode()
+    os.waitpid(pid, 0)
+    assert f'worker_pid="{pid}"' in rendered
+    assert f'worker_pid="{os.getpid()}"' not in rendered
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+from sqlalchemy import MetaData, create_engine
+
+import roster_db
+from roster_db import RosterStore, define_roster_tables
+
+
+def agent(agent_id, name, system_start, edited_start):
+    return {
+        "agent_id": agent_id,
+        "name": name,
+        "system": {"start_time": system_start, "end_time": "10/15/2025 5:00:00 PM"},
+        "agent_disputed": {"start_time": edited_start, "end_time": "10/15/2025 5:00:00 PM"},
+    }
+
+
+def write_roster(path, agents):
+    path.write_text(json.dumps({"agents": agents}), encoding="utf-8")
+    # mtime alone can stay put between two quick writes; bump it so the signature changes
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+@pytest.fixture
+def store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'roster.db'}", connect_args={"check_same_thread": False})
+    metadata = MetaData()
+    tables = define_roster_tables(metadata)
+    metadata.create_all(engine)
+    path = tmp_path / "data.json"
+    write_roster(path, [agent("A1", "Ada", "10/15/2025 9:08:00 AM", "10/15/2025 8:30:00 AM")])
+    store = RosterStore(engine, tables, str(path), check_interval=0)
+    assert store.reload()
+    yield store, path
+    engine.dispose()
+
+
+def test_reload_imports_and_serves_the_new_generation(store):
+    store, path = store
+    assert store.get_by_name("ada")["agent_id"] == "A1"
+    generation, _ = store.version()
+
+    write_roster(path, [agent("A2", "Bea", "10/15/2025 9:00:00 AM", "10/15/2025 9:00:00 AM")])
+    assert store.reload()
+    assert store.version()[0] != generation
+    assert store.get_by_name("ada") is None
+    assert store.get_by_id("A2").name == "Bea"
+
+
+def test_failed_import_is_not_retried_until_the_file_changes(store, monkeypatch):
+    store, path = store
+    path.write_text('{"agents": [', encoding="utf-8")
+    assert not store.reload()
+    assert store.reload_errors == 1
+    # the old roster keeps being served
+    assert store.get_by_name("ada") is not None
+
+    started = []
+    monkeypatch.setattr(store, "_start_reload", lambda: started.append(True))
+    assert not store.maybe_reload()
+    assert started == []
+
+    write_roster(path, [agent("A1", "Ada", "10/15/2025 9:08:00 AM", "10/15/2025 8:30:00 AM")])
+    assert store.maybe_reload()
+    assert started == [True]
+
+
+def test_discrepancies_built_across_a_swap_are_not_kept(store, monkeypatch):
+    store, path = store
+    build = roster_db.DiscrepancyIndex
+
+    def swapping_build(*args):
+        index = build(*args)
+        # another import lands while this index is being built
+        write_roster(path, [agent("A2", "Bea", "10/15/2025 9:00:00 AM", "10/15/2025 9:00:00 AM")])
+        store.reload()
+        return index
+
+    monkeypatch.setattr(roster_db, "DiscrepancyIndex", swapping_build)
+    stale = store.discrepancies
+    assert store._discrepancies is None
+
+    monkeypatch.setattr(roster_db, "DiscrepancyIndex", build)
+    fresh = store.discrepancies
+    assert fresh is not stale
+    assert store.discrepancies is fresh
@@ -0,0 +1,100 @@
+import io
+import json
+
+import pytest
+
+from roster_loader import AgentRecord, JsonStream, load_agents
+
+ROSTER = {
+    "generated": 1760515200,
+    "agents": [
+        {
+            "agent_id": "A00000",
+            "name": "Zoë \"Z\" O'Neil",
+            "schedule": {"start_time": "10/15/2025 9:00:00 AM", "end_time": "10/15/2025 5:00:00 PM"},
+            "system": {"start_time": "10/15/2025 9:08:00 AM", "end_time": "10/15/2025 5:05:00 PM"},
+            "phone": {"start_time": "10/15/2025 8:36:00 AM", "end_time": None},
+            "agent_disputed": {"start_time": "10/15/2025 8:27:00 AM", "end_time": "10/15/2025 5:00:00 PM"},
+            "team": 123456789,
+            "remote": True,
+            "rating": -12.5e3,
+            "notes": None,
+        },
+        {"agent_id": "A00001", "name": "Agent 1", "system": {"start_time": "9:00", "shift": "B"}, "tags": ["a", {"b": []}]},
+        "not an agent",
+        {"name": "No Id", "phone": {}},
+    ],
+    "meta": {"source": "export\\v2", "count": 3},
+}
+
+
+class Trickle(io.StringIO):
+    """File that returns at most n characters per read, whatever size is asked for"""
+
+    def __init__(self, text, n):
+        super().__init__(text)
+        self.n = n
+
+    def read(self, size=-1):
+        return super().read(self.n if size is None or size < 0 else min(size, self.n))
+
+
+def expected_agents(data):
+    agents = data.get("agents") if isinstance(data, dict) else None
+    return [agent for agent in agents if isinstance(agent, dict)] if isinstance(agents, list) else []
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 7, 13, 64, 1 << 20])
+def test_load_agents_matches_json_load_at_any_chunk_size(indent, n):
+    text = json.dumps(ROSTER, indent=indent, ensure_ascii=False)
+    records = load_agents(Trickle(text, n))
+    assert all(isinstance(record, AgentRecord) for record in records)
+    assert [record.to_dict() for record in records] == expected_agents(ROSTER)
+
+
+@pytest.mark.parametrize("text", [
+    '{}',
+    '{"agents": []}',
+    ' \n{ "other" : [1, 2, {"agents": [{"name": "nested"}]}] } \n',
+    '{"agents": [{"name": "first"}], "agents": [{"name": "second"}]}',
+    '{"agents": [{"name": "dropped"}], "agents": null}',
+    '{"agents": {"name": "not a list"}}',
+    '[{"name": "top-level list"}]',
+    '12345',
+])
+def test_load_agents_shapes(text):
+    for n in (1, 4, 1 << 20):
+        assert [record.to_dict() for record in load_agents(Trickle(text, n))] == expected_agents(json.loads(text))
+
+
+@pytest.mark.parametrize("text", [
+    '{"agents": [{"name": "cut off"',
+    '{"agents": [{"name": "x"}]',
+    '{"agents": [{"name": "x"}] "more": 1}',
+    '{"agents": [{"name": "x"}]} trailing',
+    '',
+])
+def test_load_agents_rejects_broken_files(text):
+    for n in (1, 3, 1 << 20):
+        with pytest.raises(ValueError):
+            load_agents(Trickle(text, n))
+
+
+@pytest.mark.parametrize("n", [1, 2, 3])
+def test_values_ending_at_a_chunk_edge_are_read_whole(n):
+    # numbers and literals can be cut anywhere and still decode
+    stream = JsonStream(Trickle('12345 true -0.5e10 null "a\\"b" 7', n), chunk_size=2)
+    values = []
+    while stream.peek():
+        values.append(stream.value())
+    assert values == [12345, True, -0.5e10, None, 'a"b', 7]
+
+
+def test_peek_skips_whitespace_across_chunks():
+    stream = JsonStream(Trickle(" \n\t  \r\n  [ ]  ", 2), chunk_size=2)
+    stream.expect("[")
+    stream.expect("]")
+    assert stream.peek() == ""
+    with pytest.raises(ValueError):
+        stream.expect("}")
@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from time_values import TimeValue, display_time, minutes_between, parse_time
+
+
+def hms(hour, minute=0, second=0):
+    return hour * 3600 + minute * 60 + second
+
+
+@pytest.mark.parametrize("text, seconds, day", [
+    ("10/15/2025 9:08:00 AM", hms(9, 8), date(2025, 10, 15)),
+    ("10/15/2025 5:05:30 PM", hms(17, 5, 30), date(2025, 10, 15)),
+    ("2025-10-15T08:30:15", hms(8, 30, 15), date(2025, 10, 15)),
+    ("2025-10-15 17:45", hms(17, 45), date(2025, 10, 15)),
+    ("9:08", hms(9, 8), None),
+    ("  9:08 pm ", hms(21, 8), None),
+    ("12:00 AM", 0, None),
+    ("12:30 PM", hms(12, 30), None),
+    ("arrived around 8:15am", hms(8, 15), None),
+    ("830", hms(8, 30), None),
+    ("0830", hms(8, 30), None),
+    ("8", hms(8), None),
+    # not a real date: the time still parses
+    ("13/45/2025 9:00 AM", hms(9), None),
+])
+def test_parse_time_formats(text, seconds, day):
+    value = parse_time(text)
+    assert value.seconds == seconds
+    assert value.date == day
+
+
+@pytest.mark.parametrize("text", [None, "", "   ", "early", "25:00", "2500", "12345"])
+def test_parse_time_rejects_non_times(text):
+    assert parse_time(text) is None
+
+
+def test_display_is_zero_padded_twelve_hour():
+    assert parse_time("0:05").display() == "12:05:00 AM"
+    assert parse_time("8:36").display() == "08:36:00 AM"
+    assert parse_time("12:00").display() == "12:00:00 PM"
+    assert parse_time("17:02:09").display() == "05:02:09 PM"
+    assert display_time(None) == "unknown"
+
+
+def test_minutes_between_ignores_seconds_and_order():
+    system, edited = parse_time("9:08:59 AM"), parse_time("8:27:00 AM")
+    assert minutes_between(system, edited) == 41
+    assert minutes_between(edited, system) == 41
+    assert minutes_between(system, None) is None
+
+
+def test_ordering_agrees_with_equality():
+    earlier, later = TimeValue(hms(8), date(2025, 10, 15)), TimeValue(hms(9), date(2025, 10, 14))
+    same_time_other_day = TimeValue(hms(8), date(2025, 10, 16))
+    undated = TimeValue(hms(8))
+
+    # time of day first
+    assert earlier < later
+    # equal times on different dates are not equal, so one must sort before the other
+    assert earlier != same_time_other_day
+    assert earlier < same_time_other_day and not same_time_other_day < earlier
+    assert undated < earlier
+    assert sorted([same_time_other_day, later, earlier, undated]) == [undated, earlier, same_time_other_day, later]
+
+    twin = TimeValue(hms(8), date(2025, 10, 15))
+    assert twin == earlier and not twin < earlier and twin <= earlier
+    assert hash(twin) == hash(earlier)
+    assert TimeValue(hms(8)) == undated
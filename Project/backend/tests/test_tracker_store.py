@@ -0,0 +1,118 @@
+import json
+
+import tracker_store
+from tracker_store import TrackerStore, merge_tracker, tracker_from_payload
+
+
+class Table:
+    """Persisted tracker payloads with the compare-and-swap save the store expects"""
+
+    def __init__(self):
+        self.rows = {}
+        self.saves = []
+
+    def load(self, session_id):
+        row = self.rows.get(session_id)
+        return json.loads(row) if row else None
+
+    def save(self, session_id, payload, expected_rev):
+        stored = self.load(session_id)
+        if (stored["rev"] if stored else 0) != expected_rev:
+            return False
+        self.rows[session_id] = json.dumps(payload)
+        self.saves.append((session_id, expected_rev, payload["rev"]))
+        return True
+
+    def other_worker_saves(self, session_id, **changes):
+        payload = dict(self.load(session_id) or {}, **changes)
+        payload["rev"] = payload.get("rev", 0) + 1
+        self.rows[session_id] = json.dumps(payload)
+
+
+def tracker(asked=(), facts=(), issues=(), analyzed=0, rev=0):
+    return tracker_from_payload({
+        "asked_questions": list(asked), "established_facts": list(facts),
+        "unresolved_issues": list(issues), "analyzed_messages": analyzed, "rev": rev
+    })
+
+
+def test_persist_saves_against_the_revision_it_read():
+    table = Table()
+    store = TrackerStore(table.load, table.save)
+    t = store.get_or_create(1)
+    t["asked_questions"].append("q1")
+    assert store.persist(1)
+    assert store.persist(1)
+    assert table.saves == [(1, 0, 1), (1, 1, 2)]
+    assert table.load(1)["asked_questions"] == ["q1"]
+    assert t["rev"] == 2
+
+
+def test_two_workers_saving_the_same_session_merge_instead_of_overwriting():
+    table = Table()
+    worker_a, worker_b = TrackerStore(table.load, table.save), TrackerStore(table.load, table.save)
+    a, b = worker_a.get_or_create(1), worker_b.get_or_create(1)
+
+    a["asked_questions"].append("from a")
+    a["established_facts"].add("was_in_activity")
+    assert worker_a.persist(1)
+
+    b["asked_questions"].append("from b")
+    b["established_facts"].add("provided_duration")
+    assert worker_b.persist(1)
+    assert worker_b.stats()["conflicts"] == 1
+
+    stored = table.load(1)
+    assert stored["asked_questions"] == ["from a", "from b"]
+    assert stored["established_facts"] == ["provided_duration", "was_in_activity"]
+    assert stored["rev"] == 2 and b["rev"] == 2
+
+    # worker A now sees B's save on its next refresh
+    assert worker_a.get_or_create(1, refresh=True)["asked_questions"] == ["from a", "from b"]
+
+
+def test_persist_gives_up_when_it_keeps_losing():
+    table = Table()
+    store = TrackerStore(table.load, table.save)
+    store.get_or_create(1)
+    attempts = []
+
+    def save(session_id, payload, expected_rev):
+        attempts.append(expected_rev)
+        table.other_worker_saves(session_id)
+        return False
+
+    store.save_fn = save
+    assert not store.persist(1)
+    assert len(attempts) == tracker_store.PERSIST_ATTEMPTS
+    # each retry was against the revision it had just re-read
+    assert attempts == sorted(set(attempts))
+    assert store.stats()["save_failures"] == 1 and store.stats()["saves"] == 0
+
+
+def test_persist_without_a_cached_tracker_or_save_fn():
+    table = Table()
+    assert not TrackerStore(table.load, table.save).persist(1)
+    store = TrackerStore()
+    store.get_or_create(1)
+    assert not store.persist(1)
+
+
+def test_merge_keeps_questions_and_facts_and_drops_cleared_issues():
+    ours = tracker(asked=["q1", "q3"], facts=["a"], issues=["phone", "system"], analyzed=2, rev=1)
+    questions = ours["asked_questions"]
+    theirs = tracker(asked=["q1", "q2"], facts=["b"], issues=["system"], analyzed=3, rev=4)
+
+    merge_tracker(ours, theirs)
+    assert ours["asked_questions"] == ["q1", "q2", "q3"]
+    assert ours["asked_questions"] is questions
+    assert ours["established_facts"] == {"a", "b"}
+    assert ours["unresolved_issues"] == {"system"}
+    assert ours["analyzed_messages"] == 3
+    assert ours["rev"] == 4
+
+
+def test_merge_with_nothing_stored_starts_over_at_revision_zero():
+    ours = tracker(asked=["q1"], rev=5)
+    merge_tracker(ours, None)
+    assert ours["rev"] == 0 and ours["asked_questions"] == ["q1"]
@@ -0,0 +1,127 @@
+import re
+from datetime import date, datetime
+from functools import lru_cache, total_ordering
+
+CLOCK_PATTERN = re.compile(r'(\d{1,2}):(\d{2})(?::(\d{2}))?\s*(AM|PM|am|pm)?')
+BARE_DIGITS_PATTERN = re.compile(r'^\d{1,4}$')
+DATE_PREFIX_PATTERN = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})\b')
+
+
+@total_ordering
+class TimeValue:
+    """A parsed timestamp: seconds since midnight plus the calendar date when one was given.
+
+    Ordering and differences go by the time of day, which is what the
+    discrepancy checks compare (system vs phone vs edited start on one shift);
+    the date only breaks ties, with a missing date first, so that ordering
+    agrees with equality.
+    """
+    __slots__ = ("seconds", "date")
+
+    def __init__(self, seconds, date=None):
+        self.seconds = seconds
+        self.date = date
+
+    @property
+    def minutes(self):
+        return self.seconds // 60
+
+    def minutes_between(self, other):
+        return abs(self.minutes - other.minutes)
+
+    def display(self):
+        """h:mm:ss AM/PM, zero-padded, as standardize_time_format has always returned"""
+        hour, rest = divmod(self.seconds, 3600)
+        minute, second = divmod(rest, 60)
+        if hour == 0:
+            disp_hour, period = 12, "AM"
+        elif hour == 12:
+            disp_hour, period = 12, "PM"
+        elif hour > 12:
+            disp_hour, period = hour - 12, "PM"
+        else:
+            disp_hour, period = hour, "AM"
+        return f"{disp_hour:02d}:{minute:02d}:{second:02d} {period}"
+
+    def _key(self):
+        return (self.seconds, self.date is not None, self.date or date.min)
+
+    def __eq__(self, other):
+        if not isinstance(other, TimeValue):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __lt__(self, other):
+        if not isinstance(other, TimeValue):
+            return NotImplemented
+        return self._key() < other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"TimeValue({self.display()!r}, date={self.date})"
+
+
+def _parse_date_prefix(s):
+    m = DATE_PREFIX_PATTERN.match(s)
+    if not m:
+        return None
+    try:
+        return datetime(int(m.group(3)), int(m.group(1)), int(m.group(2))).date()
+    except ValueError:
+        return None
+
+
+def _parse(value):
+    if value is None:
+        return None
+    s = str(value).strip()
+    if not s:
+        return None
+
+    try:
+        dt = datetime.fromisoformat(s)
+        return TimeValue(dt.hour * 3600 + dt.minute * 60 + dt.second, dt.date())
+    except ValueError:
+        pass
+
+    m = CLOCK_PATTERN.search(s)
+    if m:
+        hour = int(m.group(1))
+        minute = int(m.group(2))
+        second = int(m.group(3)) if m.group(3) else 0
+        period = m.group(4)
+        if period:
+            period = period.upper()
+            if period == 'PM' and hour != 12:
+                hour += 12
+            if period == 'AM' and hour == 12:
+                hour = 0
+        elif hour > 23:
+            return None
+        return TimeValue(hour * 3600 + minute * 60 + second, _parse_date_prefix(s))
+
+    if BARE_DIGITS_PATTERN.match(s):
+        # "830" / "0830" are hhmm, "8" is a bare hour
+        hour, minute = (int(s[:-2]), int(s[-2:])) if len(s) > 2 else (int(s), 0)
+        if hour > 23:
+            return None
+        return TimeValue(hour * 3600 + minute * 60)
+
+    return None
+
+
+parse_time = lru_cache(maxsize=8192)(_parse)
+parse_time.__doc__ = "Parse a timestamp in any supported format to a TimeValue, or None if it is not a time"
+
+
+def display_time(value):
+    return value.display() if value is not None else 'unknown'
+
+
+def minutes_between(first, second):
+    """Minutes between two TimeValues, or None if either is missing"""
+    if first is None or second is None:
+        return None
+    return first.minutes_between(second)
@@ -0,0 +1,224 @@
+import time
+import threading
+from collections import OrderedDict
+
+# how many times persist re-reads and retries after losing a race to another worker
+PERSIST_ATTEMPTS = 3
+
+
+def new_tracker():
+    return {
+        "asked_questions": [],
+        "established_facts": set(),
+        "unresolved_issues": set(),
+        "analyzed_messages": 0,
+        "rev": 0
+    }
+
+
+def tracker_to_payload(tracker):
+    return {
+        "asked_questions": list(tracker.get("asked_questions", [])),
+        "established_facts": sorted(tracker.get("established_facts", [])),
+        "unresolved_issues": sorted(tracker.get("unresolved_issues", [])),
+        "analyzed_messages": tracker.get("analyzed_messages", 0),
+        "rev": tracker.get("rev", 0)
+    }
+
+
+def merge_tracker(tracker, persisted):
+    """Fold the persisted tracker into a cached one that failed to save over it.
+
+    Questions asked and facts established by either copy stay asked and established.
+    An issue survives only if both copies still have it: it is re-derived on every
+    analysis while it applies, so one cleared by either side is not brought back. The
+    revision becomes the persisted one, which is what the next save must replace.
+    """
+    if persisted is None:
+        tracker["rev"] = 0
+        return tracker
+    asked = list(persisted["asked_questions"])
+    seen = set(asked)
+    asked.extend(q for q in tracker["asked_questions"] if q not in seen)
+    # in place: callers keep references to the question list
+    tracker["asked_questions"][:] = asked
+    tracker["established_facts"] |= persisted["established_facts"]
+    tracker["unresolved_issues"] &= persisted["unresolved_issues"]
+    tracker["analyzed_messages"] = max(tracker.get("analyzed_messages", 0), persisted["analyzed_messages"])
+    tracker["rev"] = persisted["rev"]
+    return tracker
+
+
+def tracker_from_payload(payload):
+    return {
+        "asked_questions": list(payload.get("asked_questions", [])),
+        "established_facts": set(payload.get("established_facts", [])),
+        "unresolved_issues": set(payload.get("unresolved_issues", [])),
+        "analyzed_messages": payload.get("analyzed_messages", 0),
+        "rev": payload.get("rev", 0)
+    }
+
+
+class TrackerStore:
+    """Bounded LRU/TTL cache of per-session question trackers.
+
+    load_fn(session_id) returns the persisted tracker payload (or None) and
+    save_fn(session_id, payload, expected_rev) writes it back only if the stored
+    tracker is still at expected_rev, returning whether it did. Each persisted
+    payload carries a revision, so a worker whose cached copy is older than the
+    database picks up the newer one the next time the tracker is refreshed, and one
+    that saves over a revision it has not seen is refused and merges it first.
+    """
+
+    def __init__(self, load_fn=None, save_fn=None, max_entries=10000, ttl_seconds=3600):
+        self.load_fn = load_fn
+        self.save_fn = save_fn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.load_errors = 0
+        self.saves = 0
+        self.conflicts = 0
+        self.save_failures = 0
+
+    @staticmethod
+    def _key(session_id):
+        return str(session_id)
+
+    def _cached(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        tracker, stored_at = entry
+        if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return tracker
+
+    def _put(self, key, tracker):
+        self._entries[key] = (tracker, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load(self, session_id):
+        if self.load_fn is None:
+            return None
+        try:
+            payload = self.load_fn(session_id)
+        except Exception as e:
+            self.load_errors += 1
+            print(f"Tracker load failed for session {session_id}: {e}")
+            return None
+        return tracker_from_payload(payload) if payload else None
+
+    def get_or_create(self, session_id, refresh=False):
+        """Return the tracker for a session, loading or creating it as needed.
+
+        With refresh=True the persisted revision is checked even on a cache hit;
+        callers do this once at the start of a turn.
+        """
+        key = self._key(session_id)
+        with self._lock:
+            tracker = self._cached(key)
+            if tracker is not None and not refresh:
+                self.hits += 1
+                return tracker
+
+            persisted = self._load(session_id) if (tracker is None or refresh) else None
+            if tracker is not None and (persisted is None or persisted["rev"] <= tracker["rev"]):
+                self.hits += 1
+                return tracker
+
+            self.misses += 1
+            tracker = persisted or new_tracker()
+            self._put(key, tracker)
+            return tracker
+
+    def get(self, session_id, default=None):
+        key = self._key(session_id)
+        with self._lock:
+            tracker = self._cached(key)
+            if tracker is not None:
+                self.hits += 1
+                return tracker
+            tracker = self._load(session_id)
+            if tracker is None:
+                self.misses += 1
+                return default
+            self.misses += 1
+            self._put(key, tracker)
+            return tracker
+
+    def persist(self, session_id):
+        """Write the session's tracker through to persistent storage.
+
+        The save is a compare-and-swap on the revision this tracker was loaded or last
+        saved at. When another worker has saved since, the stored tracker is re-read,
+        merged into this one (see merge_tracker) and the save retried, up to
+        PERSIST_ATTEMPTS times. Returns whether the tracker was written.
+        """
+        key = self._key(session_id)
+        with self._lock:
+            tracker = self._cached(key)
+            if tracker is None or self.save_fn is None:
+                return False
+        for _ in range(PERSIST_ATTEMPTS):
+            with self._lock:
+                expected_rev = tracker.get("rev", 0)
+                payload = tracker_to_payload(tracker)
+                payload["rev"] = expected_rev + 1
+            if self.save_fn(session_id, payload, expected_rev):
+                with self._lock:
+                    tracker["rev"] = max(tracker.get("rev", 0), payload["rev"])
+                    self.saves += 1
+                return True
+            self.conflicts += 1
+            persisted = self._load(session_id)
+            with self._lock:
+                merge_tracker(tracker, persisted)
+        self.save_failures += 1
+        print(f"Tracker for session {session_id} not saved: still conflicting after {PERSIST_ATTEMPTS} attempts")
+        return False
+
+    def discard(self, session_id):
+        with self._lock:
+            self._entries.pop(self._key(session_id), None)
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return self._cached(self._key(session_id)) is not None
+
+    def __getitem__(self, session_id):
+        tracker = self.get(session_id)
+        if tracker is None:
+            raise KeyError(session_id)
+        return tracker
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "load_errors": self.load_errors,
+            "saves": self.saves,
+            "conflicts": self.conflicts,
+            "save_failures": self.save_failures
+        }
@@ -190,20 +190,12 @@ document.addEventListener("DOMContentLoaded", () => {
     gptMessages.push({ role: "user", content: text });
 
     try {
-      const res = await fetch(`${API_BASE}/chat_with_ai`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          messages: gptMessages,
-          session_id: sessionId,
-          agent_name: "Nabeel Ahmad"
-        }),
-      });
-
-      if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
-      
-      const data = await res.json();
-      const reply = data.response || "No response received.";
+      // only the new text is sent; the backend keeps the transcript
+      const reply = await streamReply({
+        message: text,
+        session_id: sessionId,
+        agent_name: "Nabeel Ahmad"
+      }) || "No response received.";
       
       console.log("Received reply:", reply);
       
@@ -224,6 +216,63 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   });
 
+  async function streamReply(payload) {
+    const res = await fetch(`${API_BASE}/chat_with_ai/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload),
+    });
+
+    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+
+    // tokens are shown in a temporary bubble; the final reply replaces it once validated
+    const liveDiv = document.createElement("div");
+    liveDiv.className = "assistant message";
+    liveDiv.innerHTML = "<b>QUARTZ AI:</b><br>";
+    const liveText = document.createElement("span");
+    liveDiv.appendChild(liveText);
+    chatBox.appendChild(liveDiv);
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let reply = "";
+
+    try {
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let eventName = "message";
+          let data = "";
+          rawEvent.split("\n").forEach(line => {
+            if (line.startsWith("event:")) eventName = line.slice(6).trim();
+            if (line.startsWith("data:")) data += line.slice(5).trim();
+          });
+          if (!data) continue;
+
+          const parsed = JSON.parse(data);
+          if (eventName === "token") {
+            liveText.textContent += parsed.content;
+            chatBox.scrollTop = chatBox.scrollHeight;
+          } else if (eventName === "done") {
+            reply = parsed.response;
+          }
+        }
+      }
+    } finally {
+      liveDiv.remove();
+    }
+
+    return reply;
+  }
+
   userInput.addEventListener("keypress", (e) => {
     if (e.key === "Enter") {
       sendBtn.click();